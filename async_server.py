@@ -0,0 +1,390 @@
+"""
+Smart TV (asyncio TCP Server)
+=============================
+
+Event-loop engine for the Smart TV server. Instead of one thread per
+remote, every connection is a coroutine on a single asyncio loop, so
+idle remotes cost a few KB each and no context switches.
+
+Usage:
+    python3 server.py --engine asyncio
+
+Notes:
+    - Command parsing/logic is still delegated to 'handle_command()' in handler.py
+    - Framing, pipelining and binary negotiation are shared with the
+      threaded engine (protocol.py)
+    - Notice semantics match the threaded engine: a state change is
+      published to every other remote subscribed to that topic on that
+      TV, through its outbound queue.
+    - As a replication follower, writes run on executor threads: a
+      write is answered only once the leader has run it, and that wait
+      must not hold up the other remotes. Reads still run on the loop.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+from time import perf_counter
+from typing import Optional
+import binproto
+import cluster
+import handler
+import lifecycle
+import metrics
+import profiling
+import replication
+import udp
+from config import DEFAULT_HOST, DEFAULT_PORT, RECV_BUFFER_SIZE
+from outbox import OutboundQueue
+from protocol import (TEXT_IDLE_TIMEOUT, TEXT_SERVER_FULL, TEXT_WELCOME, WireSession, format_notice,
+                      stamp)
+from subscriptions import SubscriberIndex
+
+# ---------------------------------------------------------------------
+#  Per-client connection with its own writer task
+# ---------------------------------------------------------------------
+class AsyncConnection:
+    """
+    A connected remote: its stream writer plus a bounded outbound queue
+    drained by a dedicated writer task (asyncio twin of server.Connection).
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self.wire = WireSession()
+        self._queue = OutboundQueue()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def send(self, data: bytes) -> bool:
+        """
+        Queue a direct reply, waiting while this client's queue is full.
+
+        Returns:
+            bool: False if the connection is already closed.
+        """
+        while len(self._queue) >= self._queue.limit and not self._closed:
+            self._space.clear()
+            await self._space.wait()
+        if self._closed:
+            return False
+        self._queue.push_reply(data)
+        self._ready.set()
+        return True
+
+    def notify(self, data: bytes, key: Optional[str] = None) -> None:
+        """
+        Queue a notice for this client (O(1), never blocks).
+        """
+        if self._closed:
+            return
+        if not self._queue.push_notice(data, key):
+            self._abort()
+            return
+        self._ready.set()
+
+    async def close(self, timeout: float = 1.0) -> None:
+        """
+        Flush what is already queued, then close the stream.
+        """
+        self._closed = True
+        self._ready.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except Exception:
+            self._task.cancel()
+        self.writer.close()
+
+    def _abort(self) -> None:
+        self._closed = True
+        self._queue.clear()
+        self._ready.set()
+        self._space.set()
+        self.writer.transport.abort()
+
+    async def _drain(self) -> None:
+        queue = self._queue
+        try:
+            while True:
+                if not queue.due():
+                    if self._closed:
+                        return
+                    # Sleep until something is queued or a held notice is due
+                    self._ready.clear()
+                    try:
+                        await asyncio.wait_for(self._ready.wait(), queue.wait_time())
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                chunks = queue.pop_chunks()
+                self._space.set()
+                # Scatter/gather where the transport supports it (no join)
+                self.writer.writelines(chunks)
+                await self.writer.drain()
+        except Exception:
+            self._abort()
+
+
+# ---------------------------------------------------------------------
+#  Connected clients (loop-confined), indexed by (attached TV id, topic)
+# ---------------------------------------------------------------------
+_clients: SubscriberIndex[AsyncConnection] = SubscriberIndex()
+
+
+def _register_client(conn: AsyncConnection) -> None:
+    # (Re-)attach to the session's TV and topics
+    session = conn.wire.session
+    _clients.attach(conn, session.tv_id, session.topics)
+
+
+def _unregister_client(conn: AsyncConnection) -> None:
+    _clients.detach(conn)
+
+
+def publish(tv_id: str, topic: str, value: int, seq: Optional[int] = None,
+            exclude: Optional[AsyncConnection] = None) -> None:
+    """
+    Queue a state-change notice for every remote subscribed to 'topic'
+    on 'tv_id', encoded once per form. A notice without its stream 'seq'
+    (relayed from another worker) is numbered on arrival.
+    """
+    timed = metrics.enabled
+    if timed:
+        start = perf_counter()
+    if seq is None:
+        seq = stamp(tv_id, topic, value)
+    text = format_notice(topic, value).encode()
+    frame = binproto.encode_notice(topic, value, tv_id)
+    streamed = None
+    sent = 0
+    for c in _clients.subscribers(tv_id, topic):
+        if c is exclude:
+            continue
+        if c.wire.binary:
+            data = frame
+        elif c.wire.session.stream:
+            if streamed is None:
+                streamed = format_notice(topic, value, seq).encode()
+            data = streamed
+        else:
+            data = text
+        c.notify(data, topic)
+        sent += 1
+    if timed:
+        metrics.observe_broadcast(perf_counter() - start, sent)
+
+
+class _IdleWatch:
+    """
+    Ends a connection's reads once it has been silent for 'timeout' seconds.
+
+    One timer per connection, re-armed at most once per timeout period
+    (reads only stamp the time), so busy remotes pay almost nothing.
+    """
+
+    __slots__ = ('_reader', '_transport', '_timeout', '_loop', '_handle', 'last', 'expired')
+
+    def __init__(self, reader: asyncio.StreamReader, transport: asyncio.BaseTransport,
+                 timeout: float) -> None:
+        self._reader = reader
+        self._transport = transport
+        self._timeout = timeout
+        self._loop = asyncio.get_running_loop()
+        self.last = self._loop.time()
+        self.expired = False
+        self._handle = self._loop.call_later(timeout, self._check)
+
+    def touch(self) -> None:
+        self.last = self._loop.time()
+
+    def cancel(self) -> None:
+        self._handle.cancel()
+
+    def _check(self) -> None:
+        remaining = self.last + self._timeout - self._loop.time()
+        if remaining > 0:
+            self._handle = self._loop.call_later(remaining, self._check)
+            return
+        # Stop reading, then end the pending read() as if the remote left
+        self.expired = True
+        self._transport.pause_reading()
+        self._reader.feed_eof()
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Per-connection coroutine.
+    Receives commands, queues responses, and publishes notices on state changes.
+    Remotes over the connection limit are rejected; silent ones time out.
+    """
+    if not lifecycle.admit():
+        metrics.connection_dropped('rejected')
+        writer.write(TEXT_SERVER_FULL)
+        writer.close()
+        return
+    try:
+        await _serve(reader, writer)
+    finally:
+        lifecycle.release()
+
+
+async def _follow(wire, requests: list, loop: asyncio.AbstractEventLoop
+                  ) -> tuple[bytes, list, bool]:
+    # Replication follower: writes wait for the leader's answer, so they
+    # run on an executor thread, off the loop. Everything else (reads,
+    # session and admin commands such as 'profile') stays on the loop:
+    # it never queues behind a round trip, and a trace is started and
+    # stopped on the one thread it profiles.
+    replies, notices, done = [], [], False
+    for forwards, run in wire.runs(requests) or [(False, requests)]:
+        if forwards:
+            reply, more, done = await loop.run_in_executor(None, wire.execute, run)
+        else:
+            reply, more, done = wire.execute(run)
+        replies.append(reply)
+        notices += more
+        if done:
+            break
+    return b''.join(replies), notices, done
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    addr = writer.get_extra_info('peername')
+    loop = asyncio.get_running_loop()
+    conn = AsyncConnection(writer)
+    session = conn.wire.session
+    idle = lifecycle.timeout()
+    watch = _IdleWatch(reader, writer.transport, idle) if idle else None
+    _register_client(conn)
+    metrics.client_connected()
+    try:
+        print(f'Server connection established with {addr}')
+        await conn.send(TEXT_WELCOME)
+        while True:
+            data = await reader.read(RECV_BUFFER_SIZE)
+            if not data:
+                if watch is not None and watch.expired:
+                    metrics.connection_dropped('idle')
+                    await conn.send(TEXT_IDLE_TIMEOUT)
+                break
+            if watch is not None:
+                watch.touch()
+
+            attached, topics = session.tv_id, session.topics
+            requests = conn.wire.feed(data)
+            if handler.forward is None:
+                reply, notices, done = conn.wire.execute(requests)
+            else:
+                reply, notices, done = await _follow(conn.wire, requests, loop)
+            if session.tv_id != attached or session.topics is not topics:
+                _register_client(conn)
+            if reply and not await conn.send(reply):
+                break
+
+            for tv_id, topic, value, seq in notices:
+                publish(tv_id, topic, value, seq, exclude=conn)
+                cluster.forward(tv_id, topic, value)
+            if done:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    except Exception as e:
+        print(f'Client handler error for {addr}: {e!r}')
+    finally:
+        if watch is not None:
+            watch.cancel()
+        _unregister_client(conn)
+        metrics.client_disconnected()
+        path = profiling.release(session)
+        if path is not None:
+            print(f'Profile started by {addr} written to {path}')
+        await conn.close()
+
+
+async def start(host: str, port: int, reuse_port: bool = False) -> asyncio.AbstractServer:
+    """
+    Bind the listening socket and start accepting connections.
+
+    Args:
+        host (str): The hostname or IP address to bind.
+        port (int): The port number to bind (0 picks a free port).
+        reuse_port (bool): Share the port with other workers (SO_REUSEPORT).
+
+    Returns:
+        asyncio.AbstractServer: The running server.
+    """
+    return await asyncio.start_server(handle_client, host, port, reuse_address=True,
+                                      reuse_port=reuse_port or None,
+                                      backlog=lifecycle.listen_backlog)
+
+
+async def serve(host: str, port: int, reuse_port: bool = False,
+                udp_port: Optional[int] = None, replication_port: Optional[int] = None,
+                follow: Optional[tuple[str, int]] = None) -> None:
+    """
+    Start the asyncio server and serve until cancelled.
+
+    Args:
+        host (str): The hostname or IP address to bind.
+        port (int): The port number to bind.
+        reuse_port (bool): Share the port with other workers (SO_REUSEPORT).
+        udp_port (int | None): Also take UDP key presses on this port (see udp.py).
+        replication_port (int | None): Lead replication on this port (see replication.py).
+        follow (tuple[str, int] | None): Follow the leader at this address.
+
+    Returns:
+        None
+    """
+    server = await start(host, port, reuse_port)
+    sockets = server.sockets or []
+    for s in sockets:
+        print(f'Server listening on {s.getsockname()}')
+    presses = None
+    if udp_port is not None:
+        presses = await udp.start(host, udp_port, publish)
+        print(f'UDP key presses on {presses.get_extra_info("sockname")}')
+    # Replication runs on threads; publishing goes back through the loop
+    loop = asyncio.get_running_loop()
+    leader = follower = None
+    if replication_port is not None:
+        leader = replication.Leader(host, replication_port, publish, loop.call_soon_threadsafe)
+        print(f'Replication leader on {leader.address}')
+    if follow is not None:
+        follower = replication.Follower(follow, publish, loop.call_soon_threadsafe)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if presses is not None:
+            presses.close()
+        if leader is not None:
+            leader.close()
+        if follower is not None:
+            follower.close()
+
+
+def main(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+         udp_port: Optional[int] = None, replication_port: Optional[int] = None,
+         follow: Optional[tuple[str, int]] = None) -> None:
+    """
+    Entry point of the asyncio engine.
+
+    Returns:
+        None
+    """
+    try:
+        asyncio.run(serve(host, port, udp_port=udp_port, replication_port=replication_port,
+                          follow=follow))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f'Server encountered an error & shut down: {e!r}')
+    finally:
+        print('Server closed')
+
+
+if __name__ == '__main__':
+    main()
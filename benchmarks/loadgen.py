@@ -0,0 +1,330 @@
+"""
+Smart TV Network Load Generator
+===============================
+
+Spawns many simulated remotes against a running Smart TV server and
+measures how it behaves under load. Sockets are created and connected
+with client.py's helpers (so connection setup is timed exactly as a
+real remote does it, concurrently on executor threads), then driven
+concurrently from one asyncio loop. The timed window starts once every
+remote has connected, selected its TV and switched it on.
+
+Reported (as JSON, so runs can be stored and compared):
+    - throughput (commands/s)
+    - command latency p50/p99/p999
+    - broadcast delivery lag (set_ch response -> notice at other remotes);
+      set_ch walks each TV's channels in order, so every change within
+      --channels sends has its own channel and its notice is matched
+      to that one send
+    - connection setup time
+    - connection errors and ERROR replies
+
+Usage:
+    python3 -m benchmarks.loadgen --remotes 2000 --mix read --duration 10
+    python3 -m benchmarks.loadgen --spawn asyncio --remotes 5000 --mix zap -o run.json
+    python3 -m benchmarks.loadgen --compare run.json --mix zap
+
+Mixes (name=weight, comma separated, or a preset):
+    read   - get_ch=6,status=3,get_c=1   (read-heavy polling)
+    zap    - set_ch=8,get_ch=2           (zapping storm)
+    churn  - on=4,off=4,status=2         (on/off churn)
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+from client import connect_to_server, create_client_socket
+from config import DEFAULT_HOST, DEFAULT_PORT
+
+MIXES = {
+    'read':  {'get_ch': 6, 'status': 3, 'get_c': 1},
+    'zap':   {'set_ch': 8, 'get_ch': 2},
+    'churn': {'on': 4, 'off': 4, 'status': 2},
+}
+
+NOTICE = b'[Notice] '
+NOTICE_PREFIX = b'[Notice] Channel changed to '
+SPAWN_CHANNELS = 100_000   # catalog size a spawned server is started with
+
+
+def parse_mix(spec: str) -> dict[str, int]:
+    """
+    Parse a preset name or 'cmd=weight,...' into a weight table.
+
+    Raises:
+        ValueError: If the spec is malformed.
+    """
+    if spec in MIXES:
+        return dict(MIXES[spec])
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = int(weight or 1)
+    if not mix or any(w < 0 for w in mix.values()) or not any(mix.values()):
+        raise ValueError(f'Invalid mix {spec!r}')
+    return mix
+
+
+def percentile(samples: list[float], p: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of already sorted samples (None if empty).
+    """
+    if not samples:
+        return None
+    k = min(len(samples) - 1, max(0, int(round(p / 100 * len(samples) + 0.5)) - 1))
+    return samples[k]
+
+
+def summarize(samples: list[float]) -> dict[str, Optional[float]]:
+    """
+    Summary statistics in milliseconds.
+    """
+    samples = sorted(samples)
+    ms = lambda v: None if v is None else round(v * 1000, 3)
+    return {
+        'count': len(samples),
+        'p50_ms': ms(percentile(samples, 50)),
+        'p99_ms': ms(percentile(samples, 99)),
+        'p999_ms': ms(percentile(samples, 99.9)),
+        'max_ms': ms(samples[-1] if samples else None),
+    }
+
+
+class Stats:
+    """
+    Shared measurement sink for all simulated remotes.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: list[float] = []
+        self.lags: list[float] = []
+        self.connects: list[float] = []
+        self.errors = 0
+        self.error_replies = 0
+        self.commands = 0
+        # (tv_id, channel) -> time the change was acknowledged
+        self.changes: dict[tuple[str, int], float] = {}
+        self._sent: dict[str, int] = {}
+
+    def next_channel(self, tv_id: str, channels: int) -> int:
+        """
+        The channel for the next set_ch on 'tv_id': the TV's channels in
+        order, so a channel only repeats after 'channels' changes.
+        """
+        n = self._sent.get(tv_id, 0)
+        self._sent[tv_id] = n + 1
+        return n % channels + 1
+
+
+def open_remote(host: str, port: int, stats: Stats) -> socket.socket:
+    """
+    Create and connect one remote with client.py's helpers, timing the setup.
+    """
+    sock = create_client_socket()
+    start = time.perf_counter()
+    connect_to_server(sock, host, port, quiet=True)
+    stats.connects.append(time.perf_counter() - start)
+    sock.setblocking(False)
+    return sock
+
+
+async def attach(sock: socket.socket, tv_id: str, stats: Stats
+                 ) -> Optional[tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+    """
+    Ramp-up, outside the timed window: read the welcome, select the TV
+    and switch it on. None if the connection failed (counted).
+    """
+    reader, writer = await asyncio.open_connection(sock=sock)
+    try:
+        await reader.readline()  # welcome
+        writer.write(f'select {tv_id}\non\n'.encode())
+        for _ in range(2):
+            if not await reader.readline():
+                raise ConnectionError('server closed the connection')
+    except (ConnectionError, OSError):
+        stats.errors += 1
+        writer.close()
+        return None
+    return reader, writer
+
+
+async def run_remote(stream: tuple[asyncio.StreamReader, asyncio.StreamWriter], tv_id: str,
+                     mix: dict[str, int], deadline: float, stats: Stats, rng: random.Random,
+                     channels: int) -> None:
+    """
+    Drive one remote: send weighted random commands until the deadline,
+    timing each response and every notice that arrives in between.
+    """
+    reader, writer = stream
+    names, weights = list(mix), list(mix.values())
+    try:
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            if name == 'set_ch':
+                line = f'set_ch {stats.next_channel(tv_id, channels)}'
+            else:
+                line = name
+            start = time.perf_counter()
+            writer.write(line.encode() + b'\n')
+            while True:
+                reply = await reader.readline()
+                if not reply:
+                    raise ConnectionError('server closed the connection')
+                now = time.perf_counter()
+                if reply.startswith(NOTICE):
+                    if reply.startswith(NOTICE_PREFIX):
+                        changed = stats.changes.get((tv_id, int(reply[len(NOTICE_PREFIX):])))
+                        if changed is not None:
+                            stats.lags.append(now - changed)
+                    continue
+                break
+            stats.latencies.append(now - start)
+            stats.commands += 1
+            if reply.startswith(b'ERROR'):
+                stats.error_replies += 1
+            elif name == 'set_ch':
+                stats.changes[(tv_id, int(line.split()[1]))] = now
+    except (ConnectionError, OSError):
+        stats.errors += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, remotes: int, tvs: int, mix: dict[str, int],
+                   duration: float, seed: int, channels: int) -> dict:
+    """
+    Connect all remotes, run the mix for 'duration' seconds and summarize.
+    """
+    stats = Stats()
+    loop = asyncio.get_running_loop()
+    setup_start = time.perf_counter()
+    socks = await asyncio.gather(*(loop.run_in_executor(None, open_remote, host, port, stats)
+                                   for _ in range(remotes)))
+    streams = await asyncio.gather(*(attach(s, str(i % tvs + 1), stats)
+                                     for i, s in enumerate(socks)))
+    setup_total = time.perf_counter() - setup_start
+
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_remote(stream, str(i % tvs + 1), mix, deadline, stats, random.Random(seed + i),
+                   channels)
+        for i, stream in enumerate(streams) if stream is not None
+    ))
+    elapsed = time.perf_counter() - started
+    return {
+        'config': {'host': host, 'port': port, 'remotes': remotes, 'tvs': tvs,
+                   'mix': mix, 'duration_s': duration, 'seed': seed, 'channels': channels},
+        'throughput_ops': round(stats.commands / elapsed, 1) if elapsed else 0.0,
+        'commands': stats.commands,
+        'errors': stats.errors,
+        'error_replies': stats.error_replies,
+        'latency': summarize(stats.latencies),
+        'broadcast_lag': summarize(stats.lags),
+        'connect': {**summarize(stats.connects), 'total_s': round(setup_total, 3)},
+    }
+
+
+def spawn_server(engine: str, tvs: int, catalog: Optional[str] = None
+                 ) -> tuple[subprocess.Popen, int]:
+    """
+    Start server.py on a free localhost port and wait until it accepts.
+    """
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, os.path.join(root, 'server.py'), '--host', '127.0.0.1',
+               '--port', str(port), '--engine', engine, '--tvs', str(tvs)]
+    if catalog is not None:
+        command += ['--channels', catalog]
+    proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError('Spawned server did not start listening')
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """
+    Relative change of the headline numbers against a stored run
+    (positive means bigger; for latencies bigger is worse).
+    """
+    def rel(a, b):
+        return None if not a or b is None else round((b - a) / a * 100, 1)
+    return {
+        'throughput_pct': rel(baseline['throughput_ops'], current['throughput_ops']),
+        **{f'{section}_{key}_pct': rel(baseline[section][key], current[section][key])
+           for section in ('latency', 'broadcast_lag', 'connect')
+           for key in ('p50_ms', 'p99_ms', 'p999_ms')},
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Smart TV load generator')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--remotes', type=int, default=100)
+    parser.add_argument('--tvs', type=int, default=1, help='spread remotes over TV ids 1..N')
+    parser.add_argument('--mix', default='read', help='preset (read, zap, churn) or cmd=weight,...')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of load')
+    parser.add_argument('--channels', type=int,
+                        help=f'channels set_ch walks through (default 10, the server default; '
+                             f'{SPAWN_CHANNELS} with --spawn, which loads a catalog that size)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--spawn', metavar='ENGINE', help='start server.py with this engine first')
+    parser.add_argument('-o', '--output', help='write the JSON result to this file')
+    parser.add_argument('--compare', metavar='FILE', help='include deltas against a stored result')
+    args = parser.parse_args(argv)
+
+    proc = catalog = None
+    host, port = args.host, args.port
+    channels = args.channels
+    if args.spawn:
+        # A big lineup keeps every set_ch of the run on its own channel
+        channels = channels or SPAWN_CHANNELS
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.writelines(f'Channel {n}\n' for n in range(1, channels + 1))
+        catalog = f.name
+        proc, port = spawn_server(args.spawn, args.tvs, catalog)
+        host = '127.0.0.1'
+    try:
+        result = asyncio.run(run_load(host, port, args.remotes, args.tvs, parse_mix(args.mix),
+                                      args.duration, args.seed, channels or 10))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if catalog is not None:
+            os.unlink(catalog)
+    if args.spawn:
+        result['config']['engine'] = args.spawn
+    if args.compare:
+        with open(args.compare) as f:
+            result['compare'] = compare(result, json.load(f))
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+Smart TV Microbenchmarks
+========================
+
+In-process benchmarks of the hot paths, each isolated from the network,
+with stored baselines and a regression gate.
+
+Suites (case names are '<suite>.<case>', times are ns per operation):
+    - dispatch:  handle_command / handle_raw / execute_lines on hot commands
+    - handlers:  every COMMANDS handler called directly on a TV that is ON
+                 (with a small catalog; 'on' and 'off' are timed as a pair)
+    - tv:        SmartTV methods
+    - locks:     one TV-lock acquisition (as the handlers take it) while
+                 1..N threads contend for the same lock
+    - broadcast: one publish() to N connected in-process socketpairs
+                 (enqueue cost; the peers are drained in the background)
+
+Every case reports the best of several repeats, which is the most
+stable estimate on a busy machine.
+
+Baselines and the gate:
+    --save FILE stores the results (plus the threshold, the machine and
+    a --note) as JSON.
+    --check FILE compares against a stored baseline and exits with
+    status 1 if any case got slower than baseline * (1 + threshold).
+    The threshold comes from --threshold, else from the baseline file,
+    else DEFAULT_THRESHOLD. Baselines are only comparable on the same
+    machine and Python version.
+
+    benchmarks/baseline.json is a reference baseline from a shared CI
+    container where repeated runs differed by up to ~80% per case, so
+    it is stored with a threshold of 1.0 (a case must double to fail);
+    on a quiet machine save your own baseline and keep the default 25%.
+
+Usage:
+    python3 -m benchmarks.microbench --save benchmarks/baseline.json
+    python3 -m benchmarks.microbench --check benchmarks/baseline.json [--threshold 0.25]
+    python3 -m benchmarks.microbench --suite dispatch --suite locks
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import argparse
+import json
+import os
+import platform
+import selectors
+import socket
+import sys
+import threading
+import timeit
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Optional
+import handler
+import server
+from logic.catalog import ChannelCatalog
+from logic.registry import TVRegistry
+from logic.tv import SmartTV
+from metrics import TV_LOCK, locked
+from protocol import execute_lines
+
+DEFAULT_THRESHOLD = 0.25   # fail when a case is more than 25% slower
+REPEAT = 5
+LOCK_THREADS = (1, 2, 4, 8)
+BROADCAST_SIZES = (1, 10, 100)
+
+HOT_COMMANDS = ('get_ch', 'status', 'set_ch 3')
+# Arguments used when calling a handler directly
+HANDLER_ARGS = {'set_ch': ('3',), 'set_ch_name': ('news',), 'find': ('ch',), 'list': ()}
+
+
+def bench(fn: Callable[[], object], number: int, repeat: int = REPEAT) -> float:
+    """
+    Best-of-'repeat' time of one call to 'fn', in nanoseconds.
+    """
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e9
+
+
+@contextmanager
+def isolated_tvs():
+    """
+    Serve a fresh registry (TV '1', ON, with a 1000-channel catalog) for
+    the duration of the block, then restore the previous one.
+    """
+    saved = handler.registry
+    registry = TVRegistry()
+    registry.add('1', SmartTV(catalog=ChannelCatalog(
+        [('News', '')] + [(f'Ch {n}', '') for n in range(2, 1001)])))
+    handler.use_registry(registry)
+    handler.tv.turn_on()
+    try:
+        yield registry
+    finally:
+        handler.use_registry(saved)
+
+
+# ---------------------------------------------------------------------
+#  Suites: each returns {case: ns per operation}
+# ---------------------------------------------------------------------
+def dispatch_cases(number: int) -> dict[str, float]:
+    results = {}
+    with isolated_tvs():
+        for command in HOT_COMMANDS:
+            raw = command.encode()
+            results[f'handle_command[{command}]'] = bench(
+                lambda: handler.handle_command(command), number)
+            results[f'handle_raw[{command}]'] = bench(lambda: handler.handle_raw(raw), number)
+            lines = [raw]
+            results[f'execute_lines[{command}]'] = bench(lambda: execute_lines(lines), number)
+    return results
+
+
+def handler_cases(number: int) -> dict[str, float]:
+    results = {}
+    with isolated_tvs():
+        tv = handler.tv
+        on, off = handler.COMMANDS['on'][1], handler.COMMANDS['off'][1]
+        results['on+off'] = bench(lambda: (off(tv, ()), on(tv, ())), number)
+        for name, (_, fn) in handler.COMMANDS.items():
+            if name in ('on', 'off'):
+                continue
+            args = HANDLER_ARGS.get(name, ())
+            results[name] = bench(lambda: fn(tv, args), number)
+    return results
+
+
+def tv_cases(number: int) -> dict[str, float]:
+    tv = SmartTV()
+    tv.turn_on()
+    return {
+        'turn_off+turn_on': bench(lambda: (tv.turn_off(), tv.turn_on()), number),
+        'set_channel': bench(lambda: tv.set_channel(3), number),
+        'get_channel': bench(tv.get_channel, number),
+        'is_on': bench(tv.is_on, number),
+        'snapshot': bench(tv.snapshot, number),
+    }
+
+
+def _contend(lock, threads: int, per_thread: int) -> float:
+    # Wall time per acquisition while 'threads' threads hammer one lock
+    start_line = threading.Barrier(threads + 1)
+
+    def worker():
+        start_line.wait()
+        for _ in range(per_thread):
+            with locked(lock, TV_LOCK):
+                pass
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    start_line.wait()
+    start = perf_counter()
+    for t in workers:
+        t.join()
+    return (perf_counter() - start) / (threads * per_thread) * 1e9
+
+
+def lock_cases(number: int) -> dict[str, float]:
+    with isolated_tvs() as registry:
+        lock = registry.lock('1')
+        return {f'contended[{n}]': min(_contend(lock, n, max(1, number // n))
+                                       for _ in range(REPEAT))
+                for n in LOCK_THREADS}
+
+
+@contextmanager
+def connected_remotes(count: int):
+    """
+    'count' server.Connection objects on socketpairs, registered for
+    channel notices on TV '1', with a thread draining their peers.
+    """
+    pairs = [socket.socketpair() for _ in range(count)]
+    conns = [server.Connection(a, ('pair', i)) for i, (a, _) in enumerate(pairs)]
+    for conn in conns:
+        server._register_client(conn)
+    stop = threading.Event()
+
+    def drain():
+        with selectors.DefaultSelector() as sel:
+            for _, peer in pairs:
+                peer.setblocking(False)
+                sel.register(peer, selectors.EVENT_READ)
+            while not stop.is_set():
+                for key, _ in sel.select(0.05):
+                    try:
+                        key.fileobj.recv(65536)
+                    except BlockingIOError:
+                        pass
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    try:
+        yield conns
+    finally:
+        for conn in conns:
+            server._unregister_client(conn)
+            conn.close(timeout=0.5)
+        stop.set()
+        reader.join()
+        for _, peer in pairs:
+            peer.close()
+
+
+def broadcast_cases(number: int) -> dict[str, float]:
+    results = {}
+    with isolated_tvs():
+        for size in BROADCAST_SIZES:
+            with connected_remotes(size):
+                values = iter(range(1 << 62))
+                results[f'publish[{size}]'] = bench(
+                    lambda: server.publish('1', 'channel', next(values) % 100),
+                    max(1, number // (10 * size)))
+    return results
+
+
+SUITES = {
+    'dispatch': dispatch_cases,
+    'handlers': handler_cases,
+    'tv': tv_cases,
+    'locks': lock_cases,
+    'broadcast': broadcast_cases,
+}
+
+
+def run(number: int, suites: Optional[list[str]] = None) -> dict[str, float]:
+    """
+    Run the selected suites (all by default).
+
+    Returns:
+        dict: '<suite>.<case>' -> nanoseconds per operation.
+    """
+    results = {}
+    for suite in suites or SUITES:
+        for case, ns in SUITES[suite](number).items():
+            results[f'{suite}.{case}'] = round(ns, 1)
+    return results
+
+
+def regressions(results: dict[str, float], baseline: dict[str, float],
+                threshold: float) -> dict[str, float]:
+    """
+    Cases slower than their baseline by more than 'threshold' (a fraction).
+
+    Returns:
+        dict: case -> relative slowdown (0.5 = 50% slower). Cases
+        missing from either side are not compared.
+    """
+    return {case: ns / baseline[case] - 1
+            for case, ns in results.items()
+            if baseline.get(case) and ns > baseline[case] * (1 + threshold)}
+
+
+def machine() -> dict[str, object]:
+    """
+    Where a baseline was measured (stored with it; baselines are only
+    comparable on the same machine and Python version).
+    """
+    return {'system': platform.system(), 'release': platform.release(),
+            'arch': platform.machine(), 'cpus': os.cpu_count(),
+            'implementation': platform.python_implementation()}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Smart TV microbenchmarks')
+    parser.add_argument('--number', type=int, default=20_000,
+                        help='operations per repeat (broadcast and locks scale it down)')
+    parser.add_argument('--suite', action='append', choices=list(SUITES),
+                        help='run only this suite (repeatable; default: all)')
+    parser.add_argument('--save', metavar='FILE', help='store the results as a baseline')
+    parser.add_argument('--check', metavar='FILE', help='fail on regressions against a baseline')
+    parser.add_argument('--note', default='',
+                        help='free-form note stored with --save (e.g. how quiet the machine was)')
+    parser.add_argument('--threshold', type=float,
+                        help=f'allowed slowdown as a fraction (default: from the baseline '
+                             f'file, else {DEFAULT_THRESHOLD})')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    threshold = args.threshold
+    if args.check:
+        with open(args.check) as f:
+            stored = json.load(f)
+        baseline = stored['results']
+        if threshold is None:
+            threshold = stored.get('threshold', DEFAULT_THRESHOLD)
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLD
+
+    results = run(args.number, args.suite)
+    slower = regressions(results, baseline, threshold)
+    print(f'{"case":<40} {"ns/op":>10} {"baseline":>10} {"change":>8}')
+    for case, ns in results.items():
+        base = baseline.get(case)
+        change = f'{(ns / base - 1) * 100:+.1f}%' if base else '-'
+        flag = '  REGRESSION' if case in slower else ''
+        print(f'{case:<40} {ns:>10.1f} {base if base else "-":>10} {change:>8}{flag}')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'threshold': threshold, 'python': platform.python_version(),
+                       'machine': machine(), 'note': args.note, 'results': results},
+                      f, indent=2)
+            f.write('\n')
+    if slower:
+        print(f'{len(slower)} case(s) slower than the baseline by more than '
+              f'{threshold:.0%}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+Smart TV Binary Protocol
+========================
+
+Compact fixed-width framing for machine remotes. It shares the port
+with the text protocol and is negotiated right after the welcome line:
+a remote that sends BINARY_MAGIC as the very first byte of the
+connection is answered with a HELLO frame and speaks binary from then
+on. Text commands are ASCII, so the two can never be confused.
+
+Frames (network byte order):
+    request:  opcode u8 | tag u16 | arg i32                  (7 bytes)
+    response: opcode u8 | status u8 | tag u16 | value i32    (8 bytes)
+
+    - 'tag' is echoed back so a remote can match responses to requests.
+    - 'value' is the command's integer result (channel, channel count,
+      power state). For text results (help, version) it is the length
+      of the UTF-8 payload that directly follows the response frame.
+    - Notices use opcode OP_NOTICE, the topic code as status, the TV's
+      id as tag (0 if the id is not a number below 65536) and the new value.
+    - 'select' of an unknown TV answers ST_UNKNOWN_TV and leaves the
+      connection on no TV: TV commands answer ST_UNKNOWN_TV until a
+      select succeeds, so requests pipelined behind a failed select
+      never run on the TV selected before it.
+    - 'subscribe' / 'unsubscribe' take a topic code (TOPICS) as 'arg'.
+    - 'ping' echoes 'arg' as its value (a heartbeat that never touches a TV).
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import struct
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Optional
+import handler
+import metrics
+import ratelimit
+import statestream
+from handler import (COMMANDS, READ_COMMANDS, TEXT_ALREADY_OFF, TEXT_ALREADY_ON, TEXT_INVALID_NUMBER,
+                     TEXT_OUT_OF_RANGE, TEXT_TV_OFF, Session, cmd_select, cmd_subscribe, cmd_unsubscribe)
+
+BINARY_MAGIC = b'\xb1'
+PROTOCOL_VERSION = 1
+
+REQUEST = struct.Struct('>BHi')
+RESPONSE = struct.Struct('>BBHi')
+
+# ---------------------------------------------------------------------
+#  Opcodes (one per COMMANDS entry, plus protocol-level frames)
+# ---------------------------------------------------------------------
+OP_HELLO = 0x00
+OPCODES = {
+    'help':    0x01,
+    'version': 0x02,
+    'on':      0x03,
+    'off':     0x04,
+    'status':  0x05,
+    'get_c':   0x06,
+    'get_ch':  0x07,
+    'set_ch':  0x08,
+    'quit':    0x09,
+    'select':  0x0A,
+    'subscribe':   0x0B,
+    'unsubscribe': 0x0C,
+    'ping':        0x0D,
+}
+OPCODE_NAMES = {op: name for name, op in OPCODES.items()}
+OP_NOTICE = 0x80
+
+# ---------------------------------------------------------------------
+#  Status codes
+# ---------------------------------------------------------------------
+ST_OK = 0
+ST_ALREADY = 1
+ST_TV_OFF = 2
+ST_UNKNOWN_COMMAND = 3
+ST_BAD_ARGS = 4
+ST_OUT_OF_RANGE = 5
+ST_UNKNOWN_TV = 6
+ST_THROTTLED = 7
+ST_BUSY = 8
+ST_ERROR = 255
+STATUS_NAMES = {
+    ST_OK: 'ok',
+    ST_ALREADY: 'already',
+    ST_TV_OFF: 'tv_off',
+    ST_UNKNOWN_COMMAND: 'unknown_command',
+    ST_BAD_ARGS: 'bad_args',
+    ST_OUT_OF_RANGE: 'out_of_range',
+    ST_UNKNOWN_TV: 'unknown_tv',
+    ST_THROTTLED: 'throttled',
+    ST_BUSY: 'busy',
+    ST_ERROR: 'error',
+}
+
+# Topic codes carried in the status byte of OP_NOTICE frames
+TOPICS = {
+    'channel': 1,
+    'power':   2,
+}
+TOPIC_NAMES = {code: name for name, code in TOPICS.items()}
+
+# Handler texts that map to a non-OK status (matched by identity or prefix)
+_STATUS_BY_TEXT = {
+    TEXT_ALREADY_ON: ST_ALREADY,
+    TEXT_ALREADY_OFF: ST_ALREADY,
+    TEXT_TV_OFF: ST_TV_OFF,
+}
+_STATUS_BY_PREFIX = (
+    (TEXT_OUT_OF_RANGE.split('{', 1)[0], ST_OUT_OF_RANGE),
+    (TEXT_INVALID_NUMBER, ST_BAD_ARGS),
+)
+
+# Integer result of each command, read from the TV under the same lock
+_VALUES = {
+    'on':     lambda tv: int(tv.is_on()),
+    'off':    lambda tv: int(tv.is_on()),
+    'status': lambda tv: int(tv.is_on()),
+    'get_c':  lambda tv: tv.get_channel_count(),
+    'get_ch': lambda tv: tv.get_channel(),
+    'set_ch': lambda tv: tv.get_channel(),
+}
+# Commands whose result is text, sent as a payload after the frame
+_TEXT_RESULTS = frozenset(('help', 'version'))
+
+# Opcodes whose response frame is followed by a 'value'-byte payload
+PAYLOAD_OPCODES = frozenset(OPCODES[name] for name in _TEXT_RESULTS)
+# Encoded payloads by text (the text results are fixed, so this stays tiny)
+_PAYLOADS: dict[str, bytes] = {}
+
+# Session commands taking a topic code
+_TOPIC_COMMANDS = {
+    'subscribe':   cmd_subscribe,
+    'unsubscribe': cmd_unsubscribe,
+}
+
+# Opcodes that act on the connection rather than on a TV
+_SESSION_OPS = frozenset(('select', 'ping', *_TOPIC_COMMANDS))
+
+# Read-only commands run against a snapshot and need no lock
+_UNLOCKED = nullcontext()
+
+
+class FrameDecoder:
+    """
+    Per-connection receive buffer that splits a byte stream into request frames.
+    """
+
+    __slots__ = ('_buf',)
+
+    def __init__(self) -> None:
+        self._buf = b''
+
+    def feed(self, data: bytes) -> list[tuple[int, int, int]]:
+        """
+        Append received bytes and return every complete request.
+
+        Returns:
+            list[tuple[int, int, int]]: (opcode, tag, arg) in arrival order.
+        """
+        buf = self._buf + data if self._buf else data
+        usable = len(buf) - len(buf) % REQUEST.size
+        self._buf = buf[usable:]
+        return list(REQUEST.iter_unpack(buf[:usable]))
+
+
+class ResponseDecoder:
+    """
+    Client-side receive buffer that splits a byte stream into response
+    frames, collecting the text payload of 'help' and 'version'.
+    """
+
+    __slots__ = ('_buf',)
+
+    def __init__(self) -> None:
+        self._buf = b''
+
+    def feed(self, data: bytes) -> list[tuple[int, int, int, int, bytes]]:
+        """
+        Append received bytes and return every complete response.
+
+        Returns:
+            list[tuple]: (opcode, status, tag, value, payload) in arrival order.
+        """
+        buf = self._buf + data if self._buf else data
+        out = []
+        pos = 0
+        size = RESPONSE.size
+        while len(buf) - pos >= size:
+            opcode, status, tag, value = RESPONSE.unpack_from(buf, pos)
+            end = pos + size
+            payload = b''
+            if opcode in PAYLOAD_OPCODES:
+                if len(buf) - end < value:
+                    break
+                payload = buf[end:end + value]
+                end += value
+            out.append((opcode, status, tag, value, payload))
+            pos = end
+        self._buf = buf[pos:]
+        return out
+
+
+def encode_request(opcode: int, arg: int = 0, tag: int = 0) -> bytes:
+    """
+    Encode one request frame (client side).
+    """
+    return REQUEST.pack(opcode, tag, arg)
+
+
+def encode_notice(topic: str, value: int, tv_id: str = '') -> bytes:
+    """
+    Encode a notice frame for 'topic' on TV 'tv_id'.
+    """
+    tag = int(tv_id) if tv_id.isdigit() and int(tv_id) <= 0xFFFF else 0
+    return RESPONSE.pack(OP_NOTICE, TOPICS[topic], tag, value)
+
+
+def hello() -> bytes:
+    """
+    The frame acknowledging a switch to the binary protocol.
+    """
+    return RESPONSE.pack(OP_HELLO, ST_OK, 0, PROTOCOL_VERSION)
+
+
+def _classify(response: str) -> int:
+    status = _STATUS_BY_TEXT.get(response)
+    if status is not None:
+        return status
+    if response.startswith('ERROR'):
+        for prefix, code in _STATUS_BY_PREFIX:
+            if response.startswith(prefix):
+                return code
+        return ST_ERROR
+    return ST_OK
+
+
+def execute_frame(opcode: int, tag: int, arg: int,
+                  session: Session) -> tuple[bytes, Optional[tuple[str, str, int, int]]]:
+    """
+    Execute one request frame.
+
+    Args:
+        opcode (int): Request opcode.
+        tag (int): Request tag, echoed in the response.
+        arg (int): Integer argument (ignored by zero-arg commands).
+        session (Session): The connection's session (selected TV).
+
+    Returns:
+        tuple:
+            - reply (bytes): Response frame (plus payload for text results).
+            - notice (tuple | None): (tv_id, topic, value, seq) if the
+              command changed state other remotes should hear about.
+    """
+    name = OPCODE_NAMES.get(opcode)
+    if name is None or (name not in COMMANDS and name not in _SESSION_OPS):
+        return RESPONSE.pack(opcode, ST_UNKNOWN_COMMAND, tag, 0), None
+
+    if name == 'ping':
+        return RESPONSE.pack(opcode, ST_OK, tag, arg), None
+
+    if name == 'select':
+        tv_id = str(arg)
+        if tv_id in handler.registry:
+            status = ST_OK
+            cmd_select(session, [tv_id])
+        else:
+            status = ST_UNKNOWN_TV
+            session.tv_id = tv_id  # detached: see the module docstring
+        return RESPONSE.pack(opcode, status, tag, arg), None
+
+    if name in _TOPIC_COMMANDS:
+        topic = TOPIC_NAMES.get(arg)
+        if topic is None:
+            return RESPONSE.pack(opcode, ST_BAD_ARGS, tag, arg), None
+        _TOPIC_COMMANDS[name](session, [topic])
+        return RESPONSE.pack(opcode, ST_OK, tag, arg), None
+
+    if session.tv_id not in handler.registry:
+        return RESPONSE.pack(opcode, ST_UNKNOWN_TV, tag, 0), None
+    expected_args, fn = COMMANDS[name]
+    target, lock = handler.resolve(session)
+    reading = name in READ_COMMANDS
+    if reading:
+        target = target.snapshot()
+    elif handler.forward is not None:
+        # Replication follower: the leader runs changes (see replication.py)
+        response = handler.forward(f'{name} {arg}' if expected_args else name, session.tv_id)
+        return _forwarded(opcode, tag, name, response, session, target)
+    with _UNLOCKED if reading else metrics.locked(lock, metrics.TV_LOCK):
+        if name != 'on' and not target.is_on():
+            return RESPONSE.pack(opcode, ST_TV_OFF, tag, 0), None
+        response = fn(target, (str(arg),) if expected_args else ())
+        status = _classify(response)
+        value = _VALUES[name](target) if name in _VALUES else 0
+        notice = _notice(name, status, value, session)
+
+    if name in _TEXT_RESULTS:
+        payload = _PAYLOADS.get(response)
+        if payload is None:
+            payload = _PAYLOADS.setdefault(response, response.encode())
+        return RESPONSE.pack(opcode, status, tag, len(payload)) + payload, None
+    return RESPONSE.pack(opcode, status, tag, value), notice
+
+
+def _forwarded(opcode: int, tag: int, name: str, response: str, session: Session,
+               target) -> tuple[bytes, Optional[tuple[str, str, int, int]]]:
+    # Response frame for a change the leader ran; once its answer is in,
+    # the change has been applied here too, so 'target' shows the result
+    status = _classify(response)
+    value = _VALUES[name](target) if name in _VALUES and status != ST_TV_OFF else 0
+    return RESPONSE.pack(opcode, status, tag, value), _notice(name, status, value, session)
+
+
+def _notice(name: str, status: int, value: int,
+            session: Session) -> Optional[tuple[str, str, int, int]]:
+    # The change a command made, stamped in the state stream (see
+    # protocol.stamp(); called with the TV still locked)
+    if status != ST_OK:
+        return None
+    if name == 'set_ch':
+        topic = 'channel'
+    elif name == 'on' or name == 'off':
+        topic = 'power'
+    else:
+        return None
+    return session.tv_id, topic, value, statestream.stream.record(session.tv_id, topic, value)
+
+
+def execute_frames(frames: list[tuple[int, int, int]], session: Session,
+                   limiter: Optional[ratelimit.ClientLimiter] = None
+                   ) -> tuple[bytes, list[tuple[str, str, int, int]], bool]:
+    """
+    Execute a run of pipelined request frames in order.
+
+    Over the connection's rate limit a frame is answered with
+    ST_THROTTLED, and while the server sheds load with ST_BUSY.
+
+    Returns:
+        tuple:
+            - reply (bytes): All response frames, coalesced for a single send.
+            - notices (list[tuple[str, str, int, int]]): (tv_id, topic, value, seq).
+            - close (bool): True if the client sent 'quit'.
+    """
+    out: list[bytes] = []
+    notices: list[tuple[str, str, int, int]] = []
+    timed = metrics.enabled
+    for opcode, tag, arg in frames:
+        if opcode == OPCODES['quit']:
+            out.append(RESPONSE.pack(opcode, ST_OK, tag, 0))
+            return b''.join(out), notices, True
+        measured = False
+        if limiter is not None or ratelimit.latency_target:
+            cls = ratelimit.classify(OPCODE_NAMES.get(opcode, ''))
+            if limiter is not None and not limiter.allow(cls):
+                metrics.command_rejected('throttled')
+                out.append(RESPONSE.pack(opcode, ST_THROTTLED, tag, 0))
+                continue
+            measured = cls != 'read' and ratelimit.latency_target > 0
+            if measured and ratelimit.shedder.reject():
+                metrics.command_rejected('shed')
+                out.append(RESPONSE.pack(opcode, ST_BUSY, tag, 0))
+                continue
+        if timed or measured:
+            start = perf_counter()
+            reply, notice = execute_frame(opcode, tag, arg, session)
+            elapsed = perf_counter() - start
+            if timed:
+                metrics.observe_command(OPCODE_NAMES.get(opcode, 'other'), elapsed)
+            if measured:
+                ratelimit.shedder.observe(elapsed)
+        else:
+            reply, notice = execute_frame(opcode, tag, arg, session)
+        out.append(reply)
+        if notice is not None:
+            notices.append(notice)
+    return b''.join(out), notices, False
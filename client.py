@@ -42,7 +42,7 @@ def create_client_socket() -> socket.socket:
     return socket.socket(socket.AF_INET,socket.SOCK_STREAM)
 
 
-def connect_to_server(sock: socket.socket, host: str, port: int) -> None:
+def connect_to_server(sock: socket.socket, host: str, port: int, quiet: bool = False) -> None:
     """
     Establish a TCP connection to the Smart TV server.
 
@@ -50,12 +50,14 @@ def connect_to_server(sock: socket.socket, host: str, port: int) -> None:
         sock (socket.socket): The client socket.
         host (str): The server hostname or IP address.
         port (int): The TCP port number for the server.
+        quiet (bool): Skip the 'Connected' message (e.g. for load generators).
 
     Returns:
         socket.socket: An active socket connection.
     """
     sock.connect((host,port))
-    print('Connected to server')
+    if not quiet:
+        print('Connected to server')
 
 def _receiver(sock: socket.socket) -> None:
     """
@@ -85,7 +87,7 @@ def read_send_command(sock: socket.socket) -> None:
             print('No command entered (type \'help\' for options).')
             continue
 
-        sock.sendall((command).encode())
+        sock.sendall((command + '\n').encode())
 
         if command.lower() == 'quit':
             break
@@ -0,0 +1,227 @@
+"""
+Smart TV Multi-Process Mode
+===========================
+
+Runs N worker processes that share one listening port and one set of
+TVs, so parsing, encoding and sending scale past a single core.
+
+How it fits together:
+    - Every worker binds the port with SO_REUSEPORT; the kernel spreads
+      new connections across them. Each worker runs the normal engine
+      ('threads' or 'asyncio').
+    - TV state lives in a shared-memory segment (logic/shared.py) that
+      the parent creates and every worker attaches to. Commands take the
+      TV's process-shared lock; read-only commands read a lock-free
+      seqlock snapshot.
+    - Channel-change notices are published to the worker's own remotes
+      as usual and forwarded over a NoticeBus (one Unix datagram socket
+      per worker) to every other worker, which publishes them to its
+      remotes. Forwarding is best-effort, like notices themselves.
+
+Usage:
+    python3 server.py --workers 4 [--engine asyncio]
+
+Notes:
+    - Metrics ('stats') are per worker: a remote sees the numbers of the
+      worker it is connected to.
+    - '--max-connections' applies per worker.
+    - Requires SO_REUSEPORT and Unix sockets (Linux, BSD, macOS).
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import select
+import shutil
+import socket
+import tempfile
+import threading
+from typing import Callable, Optional
+import handler
+import lifecycle
+import metrics
+import outbox
+import profiling
+import ratelimit
+from logic.registry import TVRegistry
+from logic.shared import LOCK_STRIPES, SharedFleet
+
+# The current worker's bus (None when running a single process)
+bus: Optional['NoticeBus'] = None
+
+_MAX_MESSAGE = 512
+
+
+class NoticeBus:
+    """
+    Best-effort notice fan-out between worker processes.
+
+    Every worker binds one Unix datagram socket; send() writes one
+    datagram per peer without ever blocking (a peer that is not up yet
+    or whose buffer is full simply misses that notice).
+    """
+
+    def __init__(self, paths: list[str], index: int) -> None:
+        """
+        Args:
+            paths (list[str]): Socket path of every worker.
+            index (int): This worker's position in 'paths'.
+        """
+        self._rx = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._rx.bind(paths[index])
+        self._rx.setblocking(False)
+        self._tx = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._tx.setblocking(False)
+        self._peers = [p for i, p in enumerate(paths) if i != index]
+        self.dropped = 0
+
+    def fileno(self) -> int:
+        return self._rx.fileno()
+
+    def send(self, tv_id: str, topic: str, value: int) -> None:
+        """
+        Forward one notice to every other worker.
+        """
+        data = f'{tv_id} {topic} {value}'.encode()
+        for peer in self._peers:
+            try:
+                self._tx.sendto(data, peer)
+            except OSError:
+                self.dropped += 1
+
+    def receive(self) -> list[tuple[str, str, int]]:
+        """
+        Drain every notice that has arrived (never blocks).
+
+        Returns:
+            list[tuple[str, str, int]]: (tv_id, topic, value).
+        """
+        out = []
+        while True:
+            try:
+                data = self._rx.recv(_MAX_MESSAGE)
+            except (BlockingIOError, InterruptedError):
+                return out
+            try:
+                tv_id, topic, value = data.decode().split()
+                out.append((tv_id, topic, int(value)))
+            except ValueError:
+                continue
+
+    def close(self) -> None:
+        self._rx.close()
+        self._tx.close()
+
+
+def forward(tv_id: str, topic: str, value: int) -> None:
+    """
+    Send a notice to the other workers (no-op in single-process mode).
+    """
+    if bus is not None:
+        bus.send(tv_id, topic, value)
+
+
+def deliver(publish: Callable[[str, str, int], None]) -> None:
+    """
+    Publish every notice that arrived from other workers locally.
+    """
+    for tv_id, topic, value in bus.receive():
+        publish(tv_id, topic, value)
+
+
+def _listen(publish: Callable[[str, str, int], None]) -> None:
+    # Threaded engine: a daemon thread waits for bus traffic
+    while True:
+        select.select([bus], [], [])
+        deliver(publish)
+
+
+def shared_registry(fleet: SharedFleet) -> TVRegistry:
+    """
+    A registry of the fleet's TVs with ids '1'..N and their shared locks.
+    """
+    registry = TVRegistry()
+    for i in range(fleet.size):
+        registry.add(str(i + 1), fleet.view(i), fleet.lock(i))
+    return registry
+
+
+def _worker(index: int, args: argparse.Namespace, fleet_name: str,
+            locks: list, paths: list[str]) -> None:
+    """
+    Entry point of one worker process.
+    """
+    global bus
+    outbox.configure(limit=args.queue_limit, policy=args.overflow, window=args.notice_window)
+    metrics.configure(enable=args.metrics)
+    lifecycle.configure(idle=args.idle_timeout, max_conns=args.max_connections,
+                        backlog=args.backlog)
+    ratelimit.configure(limits=args.rate, target=args.latency_target)
+    profiling.configure(directory=args.profile_dir, interval=args.profile_interval)
+    fleet = SharedFleet(args.tvs, locks=locks, name=fleet_name)
+    handler.use_registry(shared_registry(fleet))
+    bus = NoticeBus(paths, index)
+    try:
+        # Imported lazily: both engines import this module
+        if args.engine == 'asyncio':
+            _run_async(args.host, args.port)
+        else:
+            import server
+            threading.Thread(target=_listen, args=(server.publish,), daemon=True).start()
+            server.serve_threads(args.host, args.port, reuse_port=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.close()
+
+
+def _run_async(host: str, port: int) -> None:
+    import async_server
+
+    async def serve() -> None:
+        loop = asyncio.get_running_loop()
+        loop.add_reader(bus.fileno(), deliver, async_server.publish)
+        await async_server.serve(host, port, reuse_port=True)
+
+    asyncio.run(serve())
+
+
+def serve_workers(args: argparse.Namespace) -> None:
+    """
+    Create the shared TV state, start 'args.workers' workers and wait.
+
+    Args:
+        args (argparse.Namespace): Parsed server options (see server.parse_args).
+
+    Returns:
+        None
+    """
+    ctx = multiprocessing.get_context()
+    locks = [ctx.RLock() for _ in range(min(args.tvs, LOCK_STRIPES))]
+    fleet = SharedFleet(args.tvs, locks=locks)
+    tmp = tempfile.mkdtemp(prefix='smarttv-')
+    paths = [os.path.join(tmp, f'worker-{i}.sock') for i in range(args.workers)]
+    procs = [ctx.Process(target=_worker, args=(i, args, fleet.name, locks, paths),
+                         name=f'smarttv-worker-{i}', daemon=True)
+             for i in range(args.workers)]
+    try:
+        for p in procs:
+            p.start()
+        print(f'Started {len(procs)} workers sharing {args.host}:{args.port}')
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        fleet.close()
+        fleet.unlink()
+        shutil.rmtree(tmp, ignore_errors=True)
+        print('Server closed')
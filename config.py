@@ -9,4 +9,62 @@ APP_VERSION = '1.0'
 
 # Default server settings
 DEFAULT_HOST = '127.0.0.1'
-DEFAULT_PORT = 1238
\ No newline at end of file
+DEFAULT_PORT = 1238
+
+# Connection engine used by server.py: 'threads' or 'asyncio'
+SERVER_ENGINE = 'threads'
+
+# Wire protocol limits
+RECV_BUFFER_SIZE = 65536   # bytes read per recv() call
+MAX_LINE_BYTES = 4096      # longest accepted command line
+
+# Per-client outbound queues (see outbox.py)
+OUTBOUND_QUEUE_LIMIT = 256             # max queued notices per client
+OUTBOUND_OVERFLOW_POLICY = 'drop_oldest'  # 'drop_oldest', 'disconnect' or 'coalesce'
+NOTICE_WINDOW = 0.0                    # seconds between notices per topic per client (0 = off)
+
+# Connection lifecycle (see lifecycle.py); limits are off unless set with
+# 'server.py --idle-timeout' / '--max-connections'
+IDLE_TIMEOUT = 0.0         # seconds without input before a remote is dropped (0 = never)
+MAX_CONNECTIONS = 0        # concurrent remotes; more are rejected with a message (0 = unlimited)
+LISTEN_BACKLOG = 128       # pending connections queued by the kernel
+
+# Command admission (see ratelimit.py); off by default
+# class -> (commands per second per client, burst); rate 0 = unlimited
+RATE_LIMITS = {
+    'read':      (0.0, 0.0),
+    'write':     (0.0, 0.0),
+    'broadcast': (0.0, 0.0),
+}
+LATENCY_TARGET = 0.0       # seconds; shed writes while slower than this (0 = off)
+
+# Channel catalog commands (see logic/catalog.py)
+CHANNEL_PAGE_SIZE = 20     # channels per 'list' page
+FIND_LIMIT = 20            # most matches shown by 'find'
+
+# TV registry (see logic/registry.py): ids '1'..TV_COUNT are created at startup
+DEFAULT_TV_ID = '1'
+TV_COUNT = 1
+
+# Built-in metrics (see metrics.py); disable with 'server.py --no-metrics'
+METRICS_ENABLED = True
+
+# State journal (see journal.py); off unless 'server.py --journal DIR' is given
+JOURNAL_COMMIT_INTERVAL = 0.005   # seconds per group commit (0 = fsync every change)
+JOURNAL_SNAPSHOT_EVERY = 10000    # journal records between snapshots
+
+# Runtime profiling (see profiling.py); off unless 'server.py --profile-dir DIR' is given
+PROFILE_DIR = None                # directory profiles are written to
+PROFILE_SAMPLE_INTERVAL = 0.005   # seconds between stack samples in 'sample' mode
+
+# State stream for 'resume <seq>' (see statestream.py)
+STATE_STREAM_SIZE = 4096   # recent changes kept; older resumes get a full snapshot
+
+# UDP key presses (see udp.py); off unless 'server.py --udp-port PORT' is given
+UDP_MAX_SENDERS = 4096     # senders whose last seq is remembered
+
+# Replication (see replication.py); off unless 'server.py --replication-port PORT'
+# (leader) or '--follow HOST:PORT' (follower) is given
+REPLICATION_HEARTBEAT = 0.1   # seconds between leader heartbeats (lag is measured on them)
+REPLICATION_TIMEOUT = 2.0     # seconds of leader silence before a follower reconnects
+REPLICATION_MAX_LAG = 10000   # changes queued for a follower before the leader drops it
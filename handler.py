@@ -3,27 +3,45 @@ Smart TV Command Handler
 ========================
 
 Centralized command table with expected argument counts + handlers.
-One SmartTV instance holds state (power + channel).
+A registry of SmartTV instances holds state (power + channel); each
+connection controls one TV at a time, chosen with 'select <id>', and
+hears about changes to it on the topics it 'subscribe'd to.
+
+Read-only commands never take a TV lock: they are answered from the
+TV's immutable snapshot, and each answer is memoized on that snapshot
+until the next state change replaces it.
 
 Author: dotDennis
 Course: IDATA2304
 '''
 
-from config import APP_NAME, APP_VERSION
-import threading
-from logic.tv import SmartTV
+import metrics
+import profiling
+import statestream
+from config import APP_NAME, APP_VERSION, CHANNEL_PAGE_SIZE, DEFAULT_TV_ID, FIND_LIMIT, TV_COUNT
+from logic.registry import TVRegistry
+from metrics import TV_LOCK, locked
 
 # ---------------------------------------------------------------------
-#  Shared TV instance (state persists across requests)
+#  Shared TV registry (state persists across requests)
 # ---------------------------------------------------------------------
-tv = SmartTV()
-# Synchronize access to the shared SmartTV instance across threads
-_tv_lock = threading.RLock()
+# Every TV has its own lock, so commands against different TVs never contend
+registry = TVRegistry()
+registry.add(DEFAULT_TV_ID)
+for _n in range(2, TV_COUNT + 1):
+    registry.ensure(str(_n))
+
+# The default TV and its lock (what a connection controls until 'select')
+tv, _tv_lock = registry.entry(DEFAULT_TV_ID)
+
+# Set on a replication follower (see replication.py): forward(command, tv_id)
+# runs a command that may change a TV on the leader and returns its response
+forward = None
 
 # ---------------------------------------------------------------------
 #  User-facing static texts
 # ---------------------------------------------------------------------
-TEXT_EMPTY_COMMAND = 'ERROR: Unknown command \'{cmd}\'. See \'help\' for available commands.'
+TEXT_EMPTY_COMMAND = 'ERROR: Empty command. See \'help\' for available commands.'
 TEXT_UNKNOWN = 'ERROR: Unknown command \'{cmd}\'. See \'help\' for available commands.'
 TEXT_TV_OFF = 'ERROR: TV is switched OFF. Turn it ON first.'
 TEXT_ALREADY_ON = 'TV is already ON'
@@ -36,6 +54,54 @@ TEXT_INVALID_NUMBER = 'ERROR: Invalid channel number (must be an integer)'
 TEXT_GOODBYE = 'Goodbye!'
 TEXT_WRONG_ARGS = 'ERROR: Command \'{cmd}\' expected {expected} argument(s), but received {got}.'
 TEXT_OUT_OF_RANGE = 'ERROR: Channel out of range (valid: 1-{max_ch})'
+TEXT_CHANNEL_SET = 'Channel set to '
+TEXT_EMPTY_BATCH = 'ERROR: Command \'batch\' expected at least 1 command.'
+TEXT_NESTED_BATCH = 'ERROR: Command \'batch\' cannot be nested.'
+TEXT_SELECTED = 'Selected TV {tv_id}'
+TEXT_UNKNOWN_TV = 'ERROR: Unknown TV \'{tv_id}\'.'
+TEXT_SESSION_IN_BATCH = 'ERROR: Command \'{cmd}\' cannot be used inside a batch.'
+TEXT_METRICS_DISABLED = 'Metrics are disabled on this server.'
+TEXT_STATS_USAGE = 'ERROR: Usage: stats [scrape]'
+TEXT_SUBSCRIBED = 'Subscribed to {topic} notices'
+TEXT_UNSUBSCRIBED = 'Unsubscribed from {topic} notices'
+TEXT_PONG = 'PONG'
+TEXT_NO_CATALOG = 'ERROR: No channel catalog is loaded for this TV.'
+TEXT_UNKNOWN_CHANNEL = 'ERROR: No channel named \'{name}\'.'
+TEXT_INVALID_PAGE = 'ERROR: Invalid page (valid: 1-{pages})'
+TEXT_FOUND = 'Found {count} channel(s) matching \'{prefix}\''
+TEXT_FOUND_MORE = '... and {more} more'
+TEXT_PAGE = 'Channels {first}-{last} of {total} (page {page}/{pages})'
+TEXT_UNKNOWN_TOPIC = 'ERROR: Unknown topic \'{topic}\' (topics: {topics}).'
+TEXT_PROFILING_DISABLED = 'ERROR: Profiling is disabled on this server (see --profile-dir).'
+TEXT_PROFILE_USAGE = 'ERROR: Usage: profile [start [sample [all|self] | trace] | stop]'
+TEXT_PROFILE_BUSY = 'ERROR: A profile is already running.'
+TEXT_PROFILE_NOT_RUNNING = 'ERROR: No profile is running.'
+TEXT_PROFILE_NOT_OWNER = 'ERROR: A trace can only be stopped from the connection that started it.'
+TEXT_PROFILE_TRACE_SCOPE = 'ERROR: A trace only covers this connection\'s thread; ' \
+                           'use \'profile start sample all\' for every thread.'
+TEXT_PROFILE_FAILED = 'ERROR: Could not write the profile ({reason}).'
+TEXT_PROFILE_OFF = 'Profiler is off'
+TEXT_PROFILE_STARTED = 'Profiling started ({mode}, scope {scope})'
+TEXT_PROFILE_RUNNING = 'Profiling ({mode}, scope {scope}) for {seconds:.1f}s'
+TEXT_PROFILE_WRITTEN = 'Profile written to {path}'
+TEXT_INVALID_SEQ = 'ERROR: Invalid sequence number (must be a non-negative integer)'
+TEXT_RESUMED = 'Resumed at seq {seq} ({count} change(s) missed)'
+TEXT_RESUME_SNAPSHOT = 'Snapshot at seq {seq}: TV {tv_id} is {power}, channel {channel}'
+TEXT_LEADER_UNAVAILABLE = 'ERROR: Leader unavailable. Try again later.'
+
+# Wire syntax: 'batch on; set_ch 5; get_ch'
+BATCH_COMMAND = 'batch'
+BATCH_SEPARATOR = ';'
+
+# Notice topics a connection can subscribe to; new connections get
+# channel notices only (what every remote received before topics existed)
+NOTICE_TOPICS = ('channel', 'power')
+DEFAULT_TOPICS = frozenset(('channel',))
+NOTICE_TEXTS = {
+    'channel': '[Notice] Channel changed to {value}',
+    'power':   '[Notice] TV switched {state}',
+}
+NOTICE_SEQ_SUFFIX = ' (seq {seq})'
 
 HELP_TEXT = (
     '———————————————————————————————————————————————————\n'
@@ -48,6 +114,17 @@ HELP_TEXT = (
     'get_c          - displays number of available channels.\n'
     'get_ch         - displays current active channel.\n'
     'set_ch <n>     - sets channel to <n>.\n'
+    'set_ch_name <name> - sets channel by name (needs a catalog).\n'
+    'find <prefix>  - channels whose name starts with <prefix>.\n'
+    'list [page]    - lists the channel lineup, one page at a time.\n'
+    'batch a; b; .. - runs commands atomically, one reply line each.\n'
+    'select <id>    - controls TV <id> from this connection.\n'
+    'subscribe <t>  - get notices on topic <t> (channel, power).\n'
+    'unsubscribe <t> - stop notices on topic <t>.\n'
+    'ping           - answers PONG (keeps an idle connection open).\n'
+    'resume <seq>   - changes missed since <seq> (or a snapshot); seq on notices.\n'
+    'stats [scrape] - server metrics (summary or scrape format).\n'
+    'profile start|stop - runtime profiler (needs --profile-dir; trace: own thread only).\n'
     'quit           - disconnect (handled by server).\n'
     '———————————————————————————————————————————————————\n'
 )
@@ -56,50 +133,134 @@ HELP_TEXT = (
 #  Helpers
 # ---------------------------------------------------------------------
 def err_wrong_args(cmd, expected, got):
+    if isinstance(expected, tuple):
+        low, high = expected
+        expected = f'at least {low}' if high is None else f'{low}-{high}'
     return TEXT_WRONG_ARGS.format(cmd=cmd, expected=expected, got=got)
 
+
+def args_ok(expected, got):
+    '''
+    Check an argument count against a spec: an exact count, or a
+    (min, max) range where max None means "the rest of the line".
+    '''
+    if isinstance(expected, tuple):
+        low, high = expected
+        return got >= low and (high is None or got <= high)
+    return got == expected
+
+
+def _channel_line(number, name, info):
+    return f'{number} {name} [{info}]' if info else f'{number} {name}'
+
+
+def format_notice(topic, value, seq=None):
+    '''
+    Render a notice for text-protocol remotes (newline-terminated),
+    tagged with its stream seq when one is given.
+    '''
+    text = NOTICE_TEXTS[topic].format(value=value, state=TEXT_STATUS_ON if value else TEXT_STATUS_OFF)
+    if seq is not None:
+        text += NOTICE_SEQ_SUFFIX.format(seq=seq)
+    return text + '\n'
+
+
+class Session:
+    '''
+    Per-connection command context: which TV this remote controls and
+    which notice topics it wants. 'topics' is a frozenset that is replaced
+    (never mutated) on change, so engines can spot changes by identity.
+    'stream' is set once the remote has used 'resume'; its notices then
+    carry their stream seq.
+    '''
+    __slots__ = ('tv_id', 'topics', 'stream')
+
+    def __init__(self, tv_id=DEFAULT_TV_ID, topics=DEFAULT_TOPICS):
+        self.tv_id = tv_id
+        self.topics = topics
+        self.stream = False
+
 # ---------------------------------------------------------------------
 #  Per-command handlers (no arg-count checks here)
+#  Each receives the target TV (its lock already held) and the args.
 # ---------------------------------------------------------------------
-def cmd_help(_):
+def cmd_help(tv, _):
     return HELP_TEXT
 
-def cmd_version(_):
+def cmd_version(tv, _):
     return f'{APP_NAME}-{APP_VERSION}'
 
-def cmd_on(_):
+def cmd_on(tv, _):
     if tv.is_on():
         return TEXT_ALREADY_ON
     tv.turn_on()
     return TEXT_ON
 
-def cmd_off(_):
+def cmd_off(tv, _):
     if not tv.is_on():
         return TEXT_ALREADY_OFF
     tv.turn_off()
     return TEXT_OFF
 
-def cmd_status(_):
+def cmd_status(tv, _):
     return TEXT_STATUS_ON if tv.is_on() else TEXT_STATUS_OFF
 
-def cmd_get_c(_):
+def cmd_get_c(tv, _):
     return str(tv.get_channel_count())
 
-def cmd_get_ch(_):
+def cmd_get_ch(tv, _):
     return str(tv.get_channel())
 
-def cmd_set_ch(args):
+def cmd_set_ch(tv, args):
     try:
         n = int(args[0])
     except ValueError:
         return TEXT_INVALID_NUMBER
     try:
         tv.set_channel(n)
-        return f'Channel set to {n}'
+        return f'{TEXT_CHANNEL_SET}{n}'
     except ValueError:
         return TEXT_OUT_OF_RANGE.format(max_ch=tv.get_channel_count())
 
-def cmd_quit(_):
+def cmd_set_ch_name(tv, args):
+    catalog = getattr(tv, 'catalog', None)
+    if catalog is None:
+        return TEXT_NO_CATALOG
+    name = ' '.join(args)
+    n = catalog.lookup(name)
+    if n is None:
+        return TEXT_UNKNOWN_CHANNEL.format(name=name)
+    tv.set_channel(n)
+    return f'{TEXT_CHANNEL_SET}{n}'
+
+def cmd_find(tv, args):
+    catalog = getattr(tv, 'catalog', None)
+    if catalog is None:
+        return TEXT_NO_CATALOG
+    prefix = ' '.join(args)
+    count = catalog.count_prefix(prefix)
+    lines = [TEXT_FOUND.format(count=count, prefix=prefix)]
+    lines.extend(_channel_line(*c) for c in catalog.find(prefix, FIND_LIMIT))
+    if count > FIND_LIMIT:
+        lines.append(TEXT_FOUND_MORE.format(more=count - FIND_LIMIT))
+    return '\n'.join(lines)
+
+def cmd_list(tv, args):
+    catalog = getattr(tv, 'catalog', None)
+    if catalog is None:
+        return TEXT_NO_CATALOG
+    pages = -(-len(catalog) // CHANNEL_PAGE_SIZE)
+    page = args[0] if args else '1'
+    if not page.isdigit() or not (1 <= int(page) <= pages):
+        return TEXT_INVALID_PAGE.format(pages=pages)
+    page = int(page)
+    channels = catalog.page((page - 1) * CHANNEL_PAGE_SIZE + 1, CHANNEL_PAGE_SIZE)
+    lines = [TEXT_PAGE.format(first=channels[0][0], last=channels[-1][0], total=len(catalog),
+                              page=page, pages=pages)]
+    lines.extend(_channel_line(*c) for c in channels)
+    return '\n'.join(lines)
+
+def cmd_quit(tv, _):
     return TEXT_GOODBYE
 
 # ---------------------------------------------------------------------
@@ -114,36 +275,392 @@ COMMANDS = {
     'get_c':   (0, cmd_get_c),
     'get_ch':  (0, cmd_get_ch),
     'set_ch':  (1, cmd_set_ch),
+    'set_ch_name': ((1, None), cmd_set_ch_name),
+    'find':    ((1, None), cmd_find),
+    'list':    ((0, 1), cmd_list),
     'quit':    (0, cmd_quit),
 }
 
+# Zero-arg commands that only query state (served lock-free from snapshots)
+READ_COMMANDS = frozenset(('help', 'version', 'status', 'get_c', 'get_ch'))
+
 # ---------------------------------------------------------------------
-#  Public entrypoint
+#  Session commands (act on the connection, not on a TV; never gated)
 # ---------------------------------------------------------------------
-def handle_command(command):
+def cmd_select(session, args):
+    tv_id = args[0]
+    if tv_id not in registry:
+        return TEXT_UNKNOWN_TV.format(tv_id=tv_id)
+    session.tv_id = tv_id
+    return TEXT_SELECTED.format(tv_id=tv_id)
+
+def cmd_subscribe(session, args):
+    topic = args[0]
+    if topic not in NOTICE_TOPICS:
+        return TEXT_UNKNOWN_TOPIC.format(topic=topic, topics=', '.join(NOTICE_TOPICS))
+    if topic not in session.topics:
+        session.topics = session.topics | {topic}
+    return TEXT_SUBSCRIBED.format(topic=topic)
+
+def cmd_unsubscribe(session, args):
+    topic = args[0]
+    if topic not in NOTICE_TOPICS:
+        return TEXT_UNKNOWN_TOPIC.format(topic=topic, topics=', '.join(NOTICE_TOPICS))
+    if topic in session.topics:
+        session.topics = session.topics - {topic}
+    return TEXT_UNSUBSCRIBED.format(topic=topic)
+
+def cmd_ping(session, args):
+    return TEXT_PONG
+
+def cmd_resume(session, args):
+    if not args[0].isdigit():
+        return TEXT_INVALID_SEQ
+    session.stream = True
+    stream = statestream.stream
+    head = stream.seq
+    missed = stream.since(int(args[0]), session.tv_id, session.topics)
+    if missed is None:
+        # Seq first, then state: the snapshot is at least as new as the seq
+        seq = stream.seq
+        snap = registry.get(session.tv_id).snapshot()
+        return TEXT_RESUME_SNAPSHOT.format(
+            seq=seq, tv_id=session.tv_id, channel=snap.get_channel(),
+            power=TEXT_STATUS_ON if snap.is_on() else TEXT_STATUS_OFF)
+    lines = [TEXT_RESUMED.format(seq=max(head, missed[-1][0] if missed else head),
+                                 count=len(missed))]
+    lines.extend(format_notice(topic, value, seq).rstrip('\n')
+                 for seq, _, topic, value in missed)
+    return '\n'.join(lines)
+
+SESSION_COMMANDS = {
+    'select':      (1, cmd_select),
+    'ping':        (0, cmd_ping),
+    'resume':      (1, cmd_resume),
+    'subscribe':   (1, cmd_subscribe),
+    'unsubscribe': (1, cmd_unsubscribe),
+}
+
+# ---------------------------------------------------------------------
+#  Admin commands (act on the server; never gated, validate own args)
+# ---------------------------------------------------------------------
+def cmd_stats(_, args):
+    if not metrics.enabled:
+        return TEXT_METRICS_DISABLED
+    if not args:
+        return metrics.summary()
+    if args == ['scrape']:
+        return metrics.render()
+    return TEXT_STATS_USAGE
+
+def cmd_profile(session, args):
+    if profiling.profile_dir is None:
+        return TEXT_PROFILING_DISABLED
+    if not args:
+        run = profiling.current()
+        if run is None:
+            return TEXT_PROFILE_OFF
+        return TEXT_PROFILE_RUNNING.format(mode=run.mode, scope=run.scope, seconds=run.elapsed())
+    if args[0] == 'start' and len(args) <= 3:
+        mode = args[1] if len(args) > 1 else 'sample'
+        scope = args[2] if len(args) > 2 else ('self' if mode == 'trace' else 'all')
+        if (mode, scope) == ('trace', 'all'):
+            return TEXT_PROFILE_TRACE_SCOPE
+        try:
+            if not profiling.start(mode, scope, session):
+                return TEXT_PROFILE_BUSY
+        except ValueError:
+            return TEXT_PROFILE_USAGE
+        return TEXT_PROFILE_STARTED.format(mode=mode, scope=scope)
+    if args == ['stop']:
+        try:
+            path = profiling.stop(session)
+        except RuntimeError:
+            return TEXT_PROFILE_NOT_OWNER
+        except OSError as e:
+            return TEXT_PROFILE_FAILED.format(reason=e.strerror or e)
+        if path is None:
+            return TEXT_PROFILE_NOT_RUNNING
+        return TEXT_PROFILE_WRITTEN.format(path=path)
+    return TEXT_PROFILE_USAGE
+
+ADMIN_COMMANDS = {
+    'stats':   cmd_stats,
+    'profile': cmd_profile,
+}
+
+# ---------------------------------------------------------------------
+#  Dispatch (caller must hold the target TV's lock)
+# ---------------------------------------------------------------------
+def _dispatch(parts, tv):
+    '''
+    Run one already-split command against the COMMANDS table.
+    '''
+    if not parts:
+        return TEXT_EMPTY_COMMAND
+
+    cmd, *args = parts
+
+    # Strict OFF gate: ONLY 'on' is accepted while TV is OFF
+    if not tv.is_on() and cmd != 'on':
+        return TEXT_TV_OFF
+
+    if cmd == BATCH_COMMAND:
+        return TEXT_NESTED_BATCH
+    if cmd in SESSION_COMMANDS or cmd in ADMIN_COMMANDS:
+        return TEXT_SESSION_IN_BATCH.format(cmd=cmd)
+
+    spec = COMMANDS.get(cmd)
+    if spec is None:
+        return TEXT_UNKNOWN.format(cmd=cmd)
+
+    expected_args, handler = spec
+    if not args_ok(expected_args, len(args)):
+        return err_wrong_args(cmd, expected_args, len(args))
+
+    return handler(tv, args)
+
+# ---------------------------------------------------------------------
+#  Public entrypoints
+# ---------------------------------------------------------------------
+def split_batch(command):
+    '''
+    Split a 'batch a; b; c' line into its sub-commands.
+
+    Returns None if the line is not a batch command.
+    '''
+    parts = command.split(None, 1)
+    if not parts or parts[0].lower() != BATCH_COMMAND:
+        return None
+    rest = parts[1] if len(parts) > 1 else ''
+    return [c.strip() for c in rest.split(BATCH_SEPARATOR) if c.strip()]
+
+
+def use_registry(new_registry):
+    '''
+    Serve the TVs of another registry (e.g. shared-memory TVs in a worker).
+    '''
+    global registry, tv, _tv_lock
+    registry = new_registry
+    tv, _tv_lock = registry.entry(DEFAULT_TV_ID)
+
+
+def use_leader(send):
+    '''
+    Run every command that may change a TV through 'send(command, tv_id)'
+    instead of locally (None serves locally again). Read-only commands
+    are still answered from the local snapshots.
+    '''
+    global forward
+    forward = send
+
+
+def use_catalog(catalog):
+    '''
+    Give every registered TV the same channel lineup (TVs without
+    catalog support, e.g. shared-memory views, are left as they are).
+    '''
+    for tv_id in registry.ids():
+        target, lock = registry.entry(tv_id)
+        if hasattr(target, 'set_catalog'):
+            with lock:
+                target.set_catalog(catalog)
+
+
+def _tv_id(session):
+    return DEFAULT_TV_ID if session is None else session.tv_id
+
+
+def resolve(session):
+    '''
+    Get the (tv, lock) pair a session currently controls.
+    '''
+    if session is None:
+        return tv, _tv_lock
+    return registry.entry(session.tv_id)
+
+
+def read(target, name, handler):
+    '''
+    Answer a read-only command from the target's current snapshot.
+
+    - No lock is taken: writers publish a new snapshot per change, so a
+      reader never blocks behind them or behind other readers.
+    - The answer (including the OFF-gate error) is memoized on the
+      snapshot, so repeated polls of an unchanged TV reuse the string.
+    '''
+    return _answer(target.snapshot(), name, handler)
+
+
+def _answer(snap, name, handler):
+    # Memoized answer to a read-only command for one snapshot
+    memo = snap.responses
+    response = memo.get(name)
+    if response is None:
+        response = handler(snap, _NO_ARGS) if snap.is_on() else TEXT_TV_OFF
+        memo[name] = response
+    return response
+
+
+def read_frame(raw, session, frame):
+    '''
+    Encoded reply to an exact read-only command line ('get_ch', 'help', ...),
+    or None for any other line.
+
+    - Answers like handle_raw() would, but the bytes produced by
+      'frame(response)' are memoized on the snapshot next to the string,
+      so polling an unchanged TV costs two dict lookups and no encoding.
+    - A state change publishes a new snapshot, which drops the old bytes.
+    '''
+    entry = _RAW_EXACT.get(raw)
+    if entry is None or entry[2] is None:
+        return None
+    name = entry[2]
+    snap = resolve(session)[0].snapshot()
+    frames = snap.frames
+    data = frames.get(name)
+    if data is None:
+        data = frames[name] = frame(_answer(snap, name, entry[1]))
+    return data
+
+
+def handle_command(command, session=None):
     '''
     Parse a raw command string and return a response string.
 
-    - Stateful via a shared SmartTV instance.
+    - Stateful via the shared TV registry; 'session' picks the TV
+      (None means the default TV).
+    - A 'batch' line is run through handle_batch(); its results are
+      returned one per line.
     '''
     parts = command.strip().lower().split()
     if not parts:
         return TEXT_EMPTY_COMMAND
 
-    cmd, *args = parts
-
-    # All TV interactions are guarded for thread-safety
-    with _tv_lock:
-        # Strict OFF gate: ONLY 'on' is accepted while TV is OFF
-        if not tv.is_on() and cmd != 'on':
-            return TEXT_TV_OFF
+    if parts[0] == BATCH_COMMAND:
+        commands = split_batch(command)
+        if not commands:
+            return TEXT_EMPTY_BATCH
+        return '\n'.join(handle_batch(commands, session))
 
-        spec = COMMANDS.get(cmd)
-        if spec is None:
-            return TEXT_UNKNOWN.format(cmd=cmd)
+    admin = ADMIN_COMMANDS.get(parts[0])
+    if admin is not None:
+        return admin(session, parts[1:])
 
+    spec = SESSION_COMMANDS.get(parts[0])
+    if spec is not None:
         expected_args, handler = spec
-        if len(args) != expected_args:
-            return err_wrong_args(cmd, expected_args, len(args))
+        if len(parts) - 1 != expected_args:
+            return err_wrong_args(parts[0], expected_args, len(parts) - 1)
+        return handler(session if session is not None else Session(), parts[1:])
+
+    target, lock = resolve(session)
+    if len(parts) == 1 and parts[0] in READ_COMMANDS:
+        return read(target, parts[0], COMMANDS[parts[0]][1])
+    if forward is not None:
+        return forward(command.strip(), _tv_id(session))
+
+    # All TV changes are guarded by the target TV's own lock
+    with locked(lock, TV_LOCK):
+        return _dispatch(parts, target)
+
+
+
+def forwarded(command):
+    '''
+    True if handle_command() on a replication follower would send
+    'command' to the leader (anything that is not a read, session or
+    admin command); mirrors its routing without running anything.
+    '''
+    parts = command.strip().lower().split()
+    if not parts:
+        return False
+    if parts[0] == BATCH_COMMAND:
+        return bool(split_batch(command))
+    if parts[0] in ADMIN_COMMANDS or parts[0] in SESSION_COMMANDS:
+        return False
+    return not (len(parts) == 1 and parts[0] in READ_COMMANDS)
+
+def handle_batch(commands, session=None):
+    '''
+    Run several commands atomically and return all their responses.
+
+    - Every command is parsed before the lock is taken, then the whole
+      list runs under a single acquisition of the target TV's lock, so
+      other remotes can never interleave between the steps.
+    - Each command is validated on its own: a failing step returns its
+      error and the batch continues with the next one.
+    '''
+    if forward is not None:
+        command = f'{BATCH_COMMAND} {BATCH_SEPARATOR.join(commands)}'
+        return forward(command, _tv_id(session)).split('\n')
+    parsed = [command.strip().lower().split() for command in commands]
+    target, lock = resolve(session)
+    with locked(lock, TV_LOCK):
+        return [_dispatch(parts, target) for parts in parsed]
+
+
+# ---------------------------------------------------------------------
+#  Precompiled raw-bytes dispatch (wire fast path)
+# ---------------------------------------------------------------------
+# Exact command line -> (gated, handler, read) for zero-arg commands,
+# and command name -> (gated, handler, read) for one-arg commands.
+# 'gated' is False only for 'on', the one command accepted while the TV
+# is OFF; 'read' is the command name for READ_COMMANDS, else None.
+_RAW_EXACT = {}
+_RAW_ONE_ARG = {}
+_NO_ARGS = ()
+
+
+def compile_commands():
+    '''
+    Rebuild the raw-bytes dispatch tables from COMMANDS.
+
+    Call again after adding entries to COMMANDS at runtime.
+    '''
+    _RAW_EXACT.clear()
+    _RAW_ONE_ARG.clear()
+    for name, (expected_args, handler) in COMMANDS.items():
+        entry = (name != 'on', handler, name if name in READ_COMMANDS else None)
+        if expected_args == 0:
+            _RAW_EXACT[name.encode()] = entry
+        elif expected_args == 1:
+            _RAW_ONE_ARG[name.encode()] = entry
+
+
+def handle_raw(raw, session=None):
+    '''
+    Dispatch one stripped command line straight from the socket (bytes).
+
+    - A zero-arg command in canonical (lowercase) form is resolved with a
+      single dict lookup; no decode, lowercase, split or list is built.
+      Read-only ones are then answered lock-free by read().
+    - A one-arg command with a numeric argument ('set_ch 3') only needs
+      one partition and no lowercasing.
+    - Anything else (mixed case, extra or non-numeric args, batch,
+      session commands, errors) falls back to handle_command() for the
+      full checks, so both paths always answer the same.
+    '''
+    entry = _RAW_EXACT.get(raw)
+    if entry is not None:
+        args = _NO_ARGS
+    else:
+        name, sep, arg = raw.partition(b' ')
+        entry = _RAW_ONE_ARG.get(name) if sep else None
+        if entry is None or not arg.isdigit():
+            return handle_command(raw.decode(errors='replace'), session)
+        args = (arg.decode(),)
+
+    gated, handler, reads = entry
+    target, lock = (tv, _tv_lock) if session is None else registry.entry(session.tv_id)
+    if reads is not None:
+        return read(target, reads, handler)
+    if forward is not None:
+        return forward(raw.decode(errors='replace'), _tv_id(session))
+    with locked(lock, TV_LOCK):
+        if gated and not target.is_on():
+            return TEXT_TV_OFF
+        return handler(target, args)
+
 
-        return handler(args)
+compile_commands()
@@ -0,0 +1,346 @@
+"""
+Smart TV State Journal
+======================
+
+Optional write-ahead journal that makes TV state survive restarts.
+
+Every state change ('on', 'off', 'set_ch <n>') is appended to a journal
+segment as one line:
+
+    <crc32> <seq> <tv_id> <op> <value>
+
+Group commit:
+    Appends only go to an in-memory buffer; a background thread writes
+    and fsyncs the whole batch every 'interval' seconds, so one fsync
+    covers every change made in that window. The batch is taken from
+    the buffer and then written outside the append lock, so commands
+    (and the asyncio event loop) never wait for an fsync.
+
+    Acknowledgements are not durable: a command is answered as soon as
+    its change is buffered, and a crash can lose the changes of the last
+    window even though their remotes were told they succeeded. With
+    interval 0 each change is written and fsynced before the command
+    returns (durable but slow).
+
+Snapshots:
+    After 'snapshot_every' records the thread writes a compact snapshot
+    of every TV (atomically, via rename), starts a new segment and
+    deletes the old ones. Startup loads the snapshot and replays only
+    the short tail after it, so restart time does not grow with uptime.
+
+    The snapshot is taken while commands keep running, so it may already
+    contain some changes from the tail. Every record is an absolute
+    state ('on', 'off', 'set_ch 5'), so replaying them again is harmless.
+
+Usage:
+    python3 server.py --journal ./state
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import json
+import os
+import threading
+import zlib
+from typing import Optional
+from config import JOURNAL_COMMIT_INTERVAL, JOURNAL_SNAPSHOT_EVERY
+from logic.registry import TVRegistry
+
+SNAPSHOT_FILE = 'snapshot.json'
+SEGMENT_PREFIX = 'journal-'
+SEGMENT_SUFFIX = '.log'
+
+# Journaled operations and how to replay them on a TV
+_REPLAY = {
+    'on':     lambda tv, value: tv.turn_on(),
+    'off':    lambda tv, value: tv.turn_off(),
+    'set_ch': lambda tv, value: tv.set_channel(value),
+}
+
+
+class JournaledTV:
+    """
+    Wraps a TV so every state change is appended to the journal.
+
+    Keeps the SmartTV method API (like FleetTV and SharedTV), so it can
+    be registered in place of the TV it wraps. Changes are journaled
+    while the caller still holds the TV's lock, so per-TV record order
+    always matches the order the changes were applied.
+    """
+
+    __slots__ = ('_tv', '_id', '_journal')
+
+    def __init__(self, tv, tv_id: str, journal: 'Journal') -> None:
+        self._tv = tv
+        self._id = tv_id
+        self._journal = journal
+
+    def turn_on(self) -> None:
+        self._tv.turn_on()
+        self._journal.append(self._id, 'on')
+
+    def turn_off(self) -> None:
+        self._tv.turn_off()
+        self._journal.append(self._id, 'off')
+
+    def set_channel(self, n: int) -> None:
+        self._tv.set_channel(n)
+        self._journal.append(self._id, 'set_ch', n)
+
+    def is_on(self) -> bool:
+        return self._tv.is_on()
+
+    def get_channel_count(self) -> int:
+        return self._tv.get_channel_count()
+
+    def get_channel(self) -> int:
+        return self._tv.get_channel()
+
+    @property
+    def catalog(self):
+        return getattr(self._tv, 'catalog', None)
+
+    def snapshot(self):
+        return self._tv.snapshot()
+
+
+class Journal:
+    """
+    Append-only journal segments plus periodic snapshots in one directory.
+    """
+
+    def __init__(self, directory: str, interval: float = JOURNAL_COMMIT_INTERVAL,
+                 snapshot_every: int = JOURNAL_SNAPSHOT_EVERY) -> None:
+        """
+        Args:
+            directory (str): Where segments and the snapshot live (created if needed).
+            interval (float): Group-commit window in seconds (0 = fsync every change).
+            snapshot_every (int): Records between snapshots.
+
+        Raises:
+            ValueError: If interval is negative or snapshot_every is not positive.
+        """
+        if interval < 0:
+            raise ValueError('Commit interval must not be negative')
+        if snapshot_every < 1:
+            raise ValueError('Snapshot interval must be at least 1 record')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self._registry: Optional[TVRegistry] = None
+        self._buffer: list[str] = []
+        self._since_snapshot = 0
+        self._file = None
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stopping = False
+
+    # -----------------------------------------------------------------
+    #  Startup
+    # -----------------------------------------------------------------
+    def recover(self, registry: TVRegistry) -> int:
+        """
+        Restore TV state: load the snapshot, then replay the tail.
+
+        TVs that appear in the journal but not in the registry are added.
+        A channel a TV no longer has (e.g. the catalog shrank) is skipped
+        with a warning instead of failing startup.
+
+        Returns:
+            int: Number of tail records replayed.
+        """
+        last = 0
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                snap = json.load(f)
+            last = snap['seq']
+            for tv_id, (power, channel) in snap['tvs'].items():
+                tv = registry.ensure(tv_id)
+                tv.turn_on() if power else tv.turn_off()
+                _replay(tv, tv_id, 'set_ch', channel)
+
+        replayed = 0
+        self.seq = last
+        for _, path in self._segments():
+            for seq, tv_id, op, value in _read_segment(path):
+                self.seq = max(self.seq, seq)
+                if seq <= last:
+                    continue
+                if _replay(registry.ensure(tv_id), tv_id, op, value):
+                    replayed += 1
+        return replayed
+
+    def install(self, registry: TVRegistry) -> None:
+        """
+        Journal every change to the registry's TVs from now on and start
+        the group-commit thread. Call after recover().
+        """
+        self._registry = registry
+        for tv_id in registry.ids():
+            tv, lock = registry.entry(tv_id)
+            if not isinstance(tv, JournaledTV):
+                registry.replace(tv_id, JournaledTV(tv, tv_id, self))
+        with self._io_lock:
+            self._open_segment(self.seq + 1)
+        if self.interval:
+            self._flusher = threading.Thread(target=self._run, name='journal', daemon=True)
+            self._flusher.start()
+
+    # -----------------------------------------------------------------
+    #  Appending
+    # -----------------------------------------------------------------
+    def append(self, tv_id: str, op: str, value: int = 0) -> None:
+        """
+        Record one state change (called with the TV's lock held).
+        """
+        with self._cond:
+            self.seq += 1
+            body = f'{self.seq} {tv_id} {op} {value}'
+            self._buffer.append(f'{zlib.crc32(body.encode()):08x} {body}\n')
+            self._since_snapshot += 1
+            due = self._since_snapshot >= self.snapshot_every
+            if self.interval and due:
+                self._cond.notify()
+        if not self.interval:
+            self._commit()
+            if due:
+                self.snapshot()
+
+    def flush(self) -> None:
+        """
+        Write and fsync everything appended so far.
+        """
+        self._commit()
+
+    def snapshot(self) -> None:
+        """
+        Write a snapshot of every TV and drop the segments it covers.
+        """
+        with self._io_lock:
+            with self._cond:
+                data = self._take()
+                seq = self.seq
+                self._since_snapshot = 0
+            self._write(data)
+            self._open_segment(seq + 1)
+        state = {}
+        for tv_id in self._registry.ids():
+            snap = self._registry.get(tv_id).snapshot()
+            state[tv_id] = [int(snap.is_on()), snap.get_channel()]
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'seq': seq, 'tvs': state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        for start, old in self._segments():
+            if start <= seq:
+                os.remove(old)
+
+    def close(self) -> None:
+        """
+        Stop the commit thread and leave a final snapshot (empty tail).
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._registry is not None:
+            self.snapshot()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # -----------------------------------------------------------------
+    #  Internals
+    # -----------------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.interval)
+                stopping = self._stopping
+            self._commit()
+            if stopping:
+                return
+            if self._since_snapshot >= self.snapshot_every:
+                self.snapshot()
+
+    def _commit(self) -> None:
+        # One write + one fsync for the whole batch. Only taking the batch
+        # holds self._cond; self._io_lock (taken first) keeps batches in
+        # seq order in the segment.
+        with self._io_lock:
+            if self._file is None:
+                return
+            with self._cond:
+                data = self._take()
+            self._write(data)
+
+    def _take(self) -> str:
+        # Caller holds self._cond: empty the buffer
+        data = ''.join(self._buffer)
+        self._buffer = []
+        return data
+
+    def _write(self, data: str) -> None:
+        # Caller holds self._io_lock
+        if data and self._file is not None:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _open_segment(self, start: int) -> None:
+        # Caller holds self._io_lock
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f'{SEGMENT_PREFIX}{start:012d}{SEGMENT_SUFFIX}')
+        self._file = open(path, 'a')
+
+    def _segments(self) -> list[tuple[int, str]]:
+        out = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                start = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                out.append((start, os.path.join(self.directory, name)))
+        return sorted(out)
+
+
+def _replay(tv, tv_id: str, op: str, value: int) -> bool:
+    """
+    Apply one record; False if it was skipped (channel out of range).
+    """
+    try:
+        _REPLAY[op](tv, value)
+    except ValueError:
+        print(f'Journal: skipped {op} {value} on TV {tv_id} '
+              f'(valid channels: 1-{tv.get_channel_count()})')
+        return False
+    return True
+
+
+def _read_segment(path: str) -> list[tuple[int, str, str, int]]:
+    """
+    Parse a segment, stopping at the first torn or corrupt line.
+    """
+    out = []
+    with open(path) as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            crc, _, body = line.rstrip('\n').partition(' ')
+            if f'{zlib.crc32(body.encode()):08x}' != crc:
+                break
+            seq, tv_id, op, value = body.split(' ')
+            if op not in _REPLAY:
+                break
+            out.append((int(seq), tv_id, op, int(value)))
+    return out
@@ -0,0 +1,102 @@
+"""
+Smart TV Connection Lifecycle
+=============================
+
+Limits that keep per-connection resources bounded, shared by all
+server engines:
+
+    - Idle timeout: a remote that sends nothing for 'idle_timeout'
+      seconds is told so and disconnected. Remotes that are quiet on
+      purpose (e.g. only waiting for notices) keep the connection alive
+      with 'ping' (answered 'PONG'; binary opcode 'ping').
+    - Admission: at most 'max_connections' remotes are served at once.
+      Further remotes are accepted, sent a one-line rejection and closed
+      right away, so they fail fast instead of hanging in the backlog.
+    - Listen backlog: how many not-yet-accepted connections the kernel
+      queues for us during an accept burst.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import threading
+from typing import Optional
+from config import IDLE_TIMEOUT, LISTEN_BACKLOG, MAX_CONNECTIONS
+
+# Runtime settings (defaults from config.py, overridable via configure())
+idle_timeout = IDLE_TIMEOUT
+max_connections = MAX_CONNECTIONS
+listen_backlog = LISTEN_BACKLOG
+
+_active = 0
+_active_lock = threading.Lock()
+
+
+def configure(idle: Optional[float] = None, max_conns: Optional[int] = None,
+              backlog: Optional[int] = None) -> None:
+    """
+    Override the lifecycle settings.
+
+    Args:
+        idle (float | None): Idle timeout in seconds (0 = never time out).
+        max_conns (int | None): Maximum concurrent remotes (0 = unlimited).
+        backlog (int | None): Listen backlog for sockets created from now on.
+
+    Raises:
+        ValueError: If a value is negative (or the backlog is not positive).
+
+    Returns:
+        None
+    """
+    global idle_timeout, max_connections, listen_backlog
+    if idle is not None:
+        if idle < 0:
+            raise ValueError('Idle timeout must not be negative')
+        idle_timeout = idle
+    if max_conns is not None:
+        if max_conns < 0:
+            raise ValueError('Connection limit must not be negative')
+        max_connections = max_conns
+    if backlog is not None:
+        if backlog < 1:
+            raise ValueError('Listen backlog must be at least 1')
+        listen_backlog = backlog
+
+
+def timeout() -> Optional[float]:
+    """
+    The idle timeout as a socket/asyncio timeout (None = wait forever).
+    """
+    return idle_timeout or None
+
+
+def admit() -> bool:
+    """
+    Reserve a connection slot; every True must be paired with release().
+
+    Returns:
+        bool: False if the server is full.
+    """
+    global _active
+    with _active_lock:
+        if max_connections and _active >= max_connections:
+            return False
+        _active += 1
+        return True
+
+
+def release() -> None:
+    """
+    Free a slot reserved by admit().
+    """
+    global _active
+    with _active_lock:
+        _active -= 1
+
+
+def active() -> int:
+    """
+    Returns:
+        int: Connections currently holding a slot.
+    """
+    return _active
@@ -0,0 +1,172 @@
+"""
+Smart TV Channel Catalog
+========================
+
+This module defines ChannelCatalog, an immutable channel lineup with
+names and optional metadata, sized for lineups of 100k+ channels.
+
+Memory layout (no per-channel Python objects):
+    - names / metadata: one UTF-8 blob each plus an array of offsets
+      (channel n is blob[offsets[n - 1]:offsets[n]])
+    - name index: every lowercased name, sorted, in one more blob with
+      its own offsets, plus the channel number at each sorted position
+
+Lookups bisect the sorted index, so a name or prefix lookup costs
+O(log n) slice comparisons, and find()/page() only decode the entries
+they return.
+
+File format (UTF-8), one channel per line, numbered from 1 in order:
+    <name>[<TAB><metadata>]
+Blank lines and lines starting with '#' are skipped.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+# Channel = (number, name, metadata)
+Channel = tuple[int, str, str]
+
+
+def _pack(items: Iterable[bytes]) -> tuple[bytes, array]:
+    offsets = array('I', [0])
+    chunks = []
+    total = 0
+    for item in items:
+        chunks.append(item)
+        total += len(item)
+        offsets.append(total)
+    return b''.join(chunks), offsets
+
+
+class ChannelCatalog:
+    """
+    Immutable lineup: channel numbers 1..len(catalog) with names and metadata.
+
+    Safe to share between TVs and threads (nothing changes after init).
+    """
+
+    __slots__ = ('_names', '_name_offsets', '_meta', '_meta_offsets',
+                 '_keys', '_key_offsets', '_order')
+
+    def __init__(self, entries: Iterable[tuple[str, str]]) -> None:
+        """
+        Args:
+            entries (Iterable[tuple[str, str]]): (name, metadata) per
+                channel, in channel-number order.
+
+        Raises:
+            ValueError: If a name is empty.
+        """
+        names: list[str] = []
+        meta: list[str] = []
+        for name, info in entries:
+            name = name.strip()
+            if not name:
+                raise ValueError(f'Channel {len(names) + 1} has no name')
+            names.append(name)
+            meta.append(info)
+        self._names, self._name_offsets = _pack(n.encode() for n in names)
+        self._meta, self._meta_offsets = _pack(m.encode() for m in meta)
+
+        keys = [n.lower().encode() for n in names]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._keys, self._key_offsets = _pack(keys[i] for i in order)
+        self._order = array('I', (i + 1 for i in order))
+
+    @classmethod
+    def load(cls, path: str) -> 'ChannelCatalog':
+        """
+        Read a catalog file (see the module docstring for the format).
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If a line has an empty name.
+        """
+        def entries():
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.rstrip('\r\n')
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    name, _, info = line.partition('\t')
+                    yield name, info.strip()
+        return cls(entries())
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    # -----------------------------------------------------------------
+    #  Lookups by number
+    # -----------------------------------------------------------------
+    def name(self, number: int) -> str:
+        """
+        Raises:
+            IndexError: If the number is not in 1..len(catalog).
+        """
+        if not (1 <= number <= len(self)):
+            raise IndexError('Channel out of range')
+        off = self._name_offsets
+        return self._names[off[number - 1]:off[number]].decode()
+
+    def metadata(self, number: int) -> str:
+        """
+        Raises:
+            IndexError: If the number is not in 1..len(catalog).
+        """
+        if not (1 <= number <= len(self)):
+            raise IndexError('Channel out of range')
+        off = self._meta_offsets
+        return self._meta[off[number - 1]:off[number]].decode()
+
+    def page(self, start: int, count: int) -> list[Channel]:
+        """
+        Up to 'count' channels starting at number 'start' (only those are decoded).
+        """
+        stop = min(len(self), start + count - 1)
+        return [(n, self.name(n), self.metadata(n)) for n in range(max(1, start), stop + 1)]
+
+    # -----------------------------------------------------------------
+    #  Lookups by name (case-insensitive)
+    # -----------------------------------------------------------------
+    def _key(self, pos: int) -> bytes:
+        off = self._key_offsets
+        return self._keys[off[pos]:off[pos + 1]]
+
+    def _bounds(self, prefix: bytes) -> tuple[int, int]:
+        # Sorted positions [lo, hi) whose key starts with 'prefix'
+        positions = range(len(self))
+        lo = bisect_left(positions, prefix, key=self._key)
+        hi = bisect_left(positions, prefix + b'\xff', lo, key=self._key) if prefix else len(self)
+        return lo, hi
+
+    def lookup(self, name: str) -> Optional[int]:
+        """
+        The number of the channel called 'name' (lowest number on duplicates).
+
+        Returns:
+            int | None: The channel number, or None if there is none.
+        """
+        key = name.strip().lower().encode()
+        pos = bisect_left(range(len(self)), key, key=self._key)
+        if pos < len(self) and self._key(pos) == key:
+            return self._order[pos]
+        return None
+
+    def count_prefix(self, prefix: str) -> int:
+        """
+        Number of channels whose name starts with 'prefix'.
+        """
+        lo, hi = self._bounds(prefix.lower().encode())
+        return hi - lo
+
+    def find(self, prefix: str, limit: int) -> list[Channel]:
+        """
+        Up to 'limit' channels whose name starts with 'prefix', by name.
+        """
+        lo, hi = self._bounds(prefix.lower().encode())
+        numbers = self._order[lo:min(hi, lo + limit)]
+        return [(n, self.name(n), self.metadata(n)) for n in numbers]
@@ -0,0 +1,252 @@
+"""
+Smart TV Fleet Store
+====================
+
+This module defines TVFleet, a compact store for very many TVs.
+Instead of one SmartTV object per device, the power state, channel
+count and current channel of every TV live in three contiguous arrays
+(5 bytes per TV), and bulk operations run as slice or big-integer
+operations at C speed instead of Python loops.
+
+FleetTV is a lightweight view of one TV in a fleet that keeps the
+SmartTV method API, so it can be registered anywhere a SmartTV is
+expected (e.g. TVRegistry.add(tv_id, fleet.view(i))).
+
+Selections accepted by the bulk operations:
+    - None:            every TV in the fleet
+    - range / slice:   a contiguous id range (step 1)
+    - bytes-like mask: one byte per TV, non-zero selects it
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import sys
+from array import array
+from itertools import compress
+from typing import Union
+from logic.tv import TVState
+
+Selection = Union[None, range, slice, bytes, bytearray, memoryview]
+
+# Typecode for channel numbers/counts (unsigned 16 bit: up to 65535 channels)
+_CH_TYPE = 'H'
+_CH_MAX = 0xFFFF
+
+
+class FleetTV:
+    """
+    View of a single TV inside a TVFleet with the SmartTV method API.
+
+    Holds only a reference to the fleet and an index (no per-TV state).
+    """
+
+    __slots__ = ('_fleet', '_i')
+
+    def __init__(self, fleet: 'TVFleet', i: int) -> None:
+        self._fleet = fleet
+        self._i = i
+
+    # Power controls
+    def turn_on(self) -> None:
+        """
+        Turns the TV on.
+        """
+        self._fleet._power[self._i] = 1
+
+    def turn_off(self) -> None:
+        """
+        Turns the TV off.
+        """
+        self._fleet._power[self._i] = 0
+
+    # Query
+    def is_on(self) -> bool:
+        """
+        Returns:
+            bool: True if TV is ON, False if OFF.
+        """
+        return self._fleet._power[self._i] != 0
+
+    # Channel methods
+    def get_channel_count(self) -> int:
+        """
+        Returns:
+            int: Number of channels.
+        """
+        return self._fleet._channels[self._i]
+
+    def get_channel(self) -> int:
+        """
+        Returns:
+            int: Current channel index (1-based).
+        """
+        return self._fleet._current[self._i]
+
+    def set_channel(self, n: int) -> None:
+        """
+        Sets the TV to a specific channel.
+
+        Raises:
+            ValueError: If the channel number is out of range.
+        """
+        if not (1 <= n <= self._fleet._channels[self._i]):
+            raise ValueError('Channel out of range')
+        self._fleet._current[self._i] = n
+
+    # Snapshots
+    def snapshot(self) -> TVState:
+        """
+        Gets the TV's state as an immutable snapshot, read from the arrays.
+
+        The fleet keeps no per-TV versions, so every call builds a fresh
+        snapshot (nothing is memoized across calls).
+        """
+        fleet, i = self._fleet, self._i
+        return TVState(fleet._power[i] != 0, fleet._channels[i], fleet._current[i])
+
+
+class TVFleet:
+    """
+    Array-backed state for 'size' TVs with ids 0..size-1.
+
+    Behavior (per TV, same as SmartTV):
+        - Starts OFF on channel 1 with 'channels' available channels
+        - Channel changes must stay within 1..channel count
+    """
+
+    def __init__(self, size: int, channels: int = 10) -> None:
+        """
+        Initializes the fleet in the default state.
+
+        Args:
+            size (int): Number of TVs.
+            channels (int): Channel count of every TV (default: 10).
+
+        Raises:
+            ValueError: If size is negative or channels is out of range.
+        """
+        if size < 0:
+            raise ValueError('Fleet size must be non-negative')
+        if not (1 <= channels <= _CH_MAX):
+            raise ValueError(f'Channel count must be 1-{_CH_MAX}')
+        self._size = size
+        self._power = bytearray(size)
+        self._channels = array(_CH_TYPE, [channels]) * size
+        self._current = array(_CH_TYPE, [1]) * size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def view(self, i: int) -> FleetTV:
+        """
+        Gets a SmartTV-compatible view of TV 'i'.
+
+        Raises:
+            IndexError: If 'i' is not a valid id.
+        """
+        if not (0 <= i < self._size):
+            raise IndexError('TV id out of range')
+        return FleetTV(self, i)
+
+    __getitem__ = view
+
+    # -----------------------------------------------------------------
+    #  Bulk operations
+    # -----------------------------------------------------------------
+    def power_on(self, sel: Selection = None) -> None:
+        """
+        Turns every selected TV on.
+        """
+        self._set_power(sel, 1)
+
+    def power_off(self, sel: Selection = None) -> None:
+        """
+        Turns every selected TV off.
+        """
+        self._set_power(sel, 0)
+
+    def count_on(self, sel: Selection = None) -> int:
+        """
+        Returns:
+            int: Number of selected TVs that are ON.
+        """
+        s = self._slice(sel)
+        if s is not None:
+            return self._power.count(1, s.start, s.stop)
+        return sum(compress(self._power, self._mask(sel)))
+
+    def set_channel(self, n: int, sel: Selection = None) -> None:
+        """
+        Sets every selected TV to channel 'n' (all or nothing).
+
+        Raises:
+            ValueError: If 'n' is out of range for any selected TV.
+        """
+        self.validate_channel(n, sel)
+        s = self._slice(sel)
+        if s is not None:
+            self._current[s] = array(_CH_TYPE, [n]) * (s.stop - s.start)
+            return
+
+        # Blend with big-integer arithmetic: each TV owns a 16-bit lane
+        bits = bytes(self._mask(sel)).translate(_TO_BIT)
+        ones = int.from_bytes(array(_CH_TYPE, iter(bits)).tobytes(), sys.byteorder)
+        lanes = ones * _CH_MAX
+        current = int.from_bytes(self._current.tobytes(), sys.byteorder)
+        current = (current & ~lanes) | (ones * n)
+        width = self._current.itemsize * self._size
+        self._current[:] = array(_CH_TYPE, current.to_bytes(width, sys.byteorder))
+
+    def validate_channel(self, n: int, sel: Selection = None) -> None:
+        """
+        Checks that 'n' is a valid channel for every selected TV.
+
+        Raises:
+            ValueError: If the channel number is out of range.
+        """
+        if n < 1:
+            raise ValueError('Channel out of range')
+        s = self._slice(sel)
+        if s is not None:
+            if s.start == s.stop:
+                return
+            lowest = min(self._channels[s])
+        else:
+            lowest = min(compress(self._channels, self._mask(sel)), default=n)
+        if n > lowest:
+            raise ValueError('Channel out of range')
+
+    # -----------------------------------------------------------------
+    #  Selection helpers
+    # -----------------------------------------------------------------
+    def _set_power(self, sel: Selection, value: int) -> None:
+        s = self._slice(sel)
+        if s is not None:
+            self._power[s] = bytes([value]) * (s.stop - s.start)
+            return
+        bits = bytes(self._mask(sel)).translate(_TO_BIT)
+        mask = int.from_bytes(bits, 'little')
+        power = int.from_bytes(self._power, 'little')
+        power = power | mask if value else power & ~mask
+        self._power[:] = power.to_bytes(self._size, 'little')
+
+    def _slice(self, sel: Selection) -> slice | None:
+        # Normalize None/range/slice to a clamped step-1 slice; masks give None
+        if sel is None:
+            return slice(0, self._size)
+        if isinstance(sel, (range, slice)):
+            start, stop, step = slice(sel.start, sel.stop, sel.step).indices(self._size)
+            if step != 1:
+                raise ValueError('Only contiguous (step 1) ranges are supported')
+            return slice(start, max(start, stop))
+        return None
+
+    def _mask(self, sel: Selection) -> bytes | bytearray | memoryview:
+        if len(sel) != self._size:
+            raise ValueError('Mask length must match fleet size')
+        return sel
+
+
+# Byte translation table mapping mask bytes to 0/1 (0 -> 0, anything else -> 1)
+_TO_BIT = bytes([0]) + bytes([1]) * 255
@@ -0,0 +1,126 @@
+"""
+Smart TV Registry
+=================
+
+This module defines TVRegistry, a collection of SmartTV instances
+addressed by id. Every TV has its own lock, so commands against
+different TVs never contend with each other.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import threading
+from typing import Callable, Iterator
+from logic.tv import SmartTV
+
+
+class TVRegistry:
+    """
+    Registry of TVs keyed by id, each paired with its own lock.
+
+    Behavior:
+        - Lookups are a single dict access returning (tv, lock)
+        - Adding TVs is guarded; lookups are not (dict reads are atomic)
+    """
+
+    def __init__(self, factory: Callable[[], SmartTV] = SmartTV) -> None:
+        """
+        Initializes an empty registry.
+
+        Args:
+            factory (Callable): Builds a new TV for ensure() (default: SmartTV).
+        """
+        self._factory = factory
+        self._entries: dict[str, tuple[SmartTV, threading.RLock]] = {}
+        self._guard = threading.Lock()
+
+    def add(self, tv_id: str, tv: SmartTV | None = None, lock=None) -> SmartTV:
+        """
+        Registers a TV under 'tv_id'.
+
+        Args:
+            tv_id (str): The TV's id.
+            tv (SmartTV | None): Existing TV to register (default: a new one).
+            lock (RLock | None): Lock guarding it (default: a new threading.RLock;
+                pass a process-shared lock for TVs in shared memory).
+
+        Raises:
+            ValueError: If the id is already registered.
+
+        Returns:
+            SmartTV: The registered TV.
+        """
+        with self._guard:
+            if tv_id in self._entries:
+                raise ValueError(f'TV {tv_id!r} already registered')
+            tv = self._factory() if tv is None else tv
+            self._entries[tv_id] = (tv, threading.RLock() if lock is None else lock)
+            return tv
+
+    def ensure(self, tv_id: str) -> SmartTV:
+        """
+        Returns the TV for 'tv_id', registering a new one if needed.
+        """
+        with self._guard:
+            entry = self._entries.get(tv_id)
+            if entry is None:
+                entry = self._entries[tv_id] = (self._factory(), threading.RLock())
+            return entry[0]
+
+    def replace(self, tv_id: str, tv: SmartTV) -> None:
+        """
+        Swaps the TV registered under 'tv_id', keeping its lock
+        (used to wrap TVs, e.g. journal.JournaledTV).
+
+        Raises:
+            KeyError: If the id is unknown.
+        """
+        with self._guard:
+            self._entries[tv_id] = (tv, self._entries[tv_id][1])
+
+    def entry(self, tv_id: str) -> tuple[SmartTV, threading.RLock]:
+        """
+        Gets a TV together with the lock guarding it.
+
+        Raises:
+            KeyError: If the id is unknown.
+
+        Returns:
+            tuple: (tv, lock)
+        """
+        return self._entries[tv_id]
+
+    def get(self, tv_id: str) -> SmartTV:
+        """
+        Gets the TV registered under 'tv_id'.
+
+        Raises:
+            KeyError: If the id is unknown.
+        """
+        return self._entries[tv_id][0]
+
+    def lock(self, tv_id: str) -> threading.RLock:
+        """
+        Gets the lock guarding the TV registered under 'tv_id'.
+
+        Raises:
+            KeyError: If the id is unknown.
+        """
+        return self._entries[tv_id][1]
+
+    def ids(self) -> list[str]:
+        """
+        Returns:
+            list[str]: All registered ids, in registration order.
+        """
+        return list(self._entries)
+
+    def __contains__(self, tv_id: object) -> bool:
+        return tv_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids())
@@ -0,0 +1,209 @@
+"""
+Smart TV Shared-Memory Store
+============================
+
+This module defines SharedFleet, TV state kept in a shared-memory
+segment so several worker processes serve the same TVs. SharedTV is a
+view of one TV in the segment with the SmartTV method API, so it can be
+registered like any other TV (TVRegistry.add(tv_id, view, lock)).
+
+Every TV is one fixed-size record guarded by a sequence counter:
+    seq u32 | power u8 | pad | channel count u16 | current channel u16
+
+Updates:
+    - Writers hold the TV's process-shared lock (fleet.lock(i)); the
+      lock makes read-modify-write commands atomic across processes.
+    - Each write bumps 'seq' to odd, writes the fields, then bumps it to
+      even again (a seqlock). Readers never lock: snapshot() re-reads
+      until it sees the same even 'seq' before and after the fields.
+
+Locks are striped (at most LOCK_STRIPES) so a large fleet does not need
+one OS semaphore per TV.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+from logic.tv import TVState
+
+LOCK_STRIPES = 64
+
+_SEQ = struct.Struct('<I')
+_FIELDS = struct.Struct('<BxHH')
+_RECORD = struct.Struct('<IBxHH')
+_STRIDE = 16
+_SEQ_MASK = 0xFFFFFFFF
+
+
+class SharedTV:
+    """
+    View of one TV record in a SharedFleet with the SmartTV method API.
+
+    Mutators must be called with the TV's lock held (as handler.py does).
+    """
+
+    __slots__ = ('_buf', '_off', '_cached')
+
+    def __init__(self, fleet: 'SharedFleet', i: int) -> None:
+        self._buf = fleet.buf
+        self._off = i * _STRIDE
+        self._cached: Optional[TVState] = None
+
+    # Power controls
+    def turn_on(self) -> None:
+        """
+        Turns the TV on.
+        """
+        self._write(power=1)
+
+    def turn_off(self) -> None:
+        """
+        Turns the TV off.
+        """
+        self._write(power=0)
+
+    # Query
+    def is_on(self) -> bool:
+        """
+        Returns:
+            bool: True if TV is ON, False if OFF.
+        """
+        return self._fields()[0] != 0
+
+    # Channel methods
+    def get_channel_count(self) -> int:
+        """
+        Returns:
+            int: Number of channels.
+        """
+        return self._fields()[1]
+
+    def get_channel(self) -> int:
+        """
+        Returns:
+            int: Current channel index (1-based).
+        """
+        return self._fields()[2]
+
+    def set_channel(self, n: int) -> None:
+        """
+        Sets the TV to a specific channel.
+
+        Raises:
+            ValueError: If the channel number is out of range.
+        """
+        if not (1 <= n <= self.get_channel_count()):
+            raise ValueError('Channel out of range')
+        self._write(current=n)
+
+    # Snapshots
+    def snapshot(self) -> TVState:
+        """
+        Gets a consistent snapshot without locking (seqlock read).
+
+        The snapshot object is reused while the version is unchanged, so
+        responses memoized on it survive across polls in this process.
+        """
+        buf, off = self._buf, self._off
+        while True:
+            seq, power, channels, current = _RECORD.unpack_from(buf, off)
+            if not seq & 1 and _SEQ.unpack_from(buf, off)[0] == seq:
+                break
+        version = seq >> 1
+        cached = self._cached
+        if cached is None or cached.version != version:
+            cached = self._cached = TVState(power != 0, channels, current, version)
+        return cached
+
+    def _fields(self) -> tuple[int, int, int]:
+        return _FIELDS.unpack_from(self._buf, self._off + _SEQ.size)
+
+    def _write(self, power: Optional[int] = None, current: Optional[int] = None) -> None:
+        buf, off = self._buf, self._off
+        seq = _SEQ.unpack_from(buf, off)[0]
+        old_power, channels, old_current = self._fields()
+        _SEQ.pack_into(buf, off, (seq + 1) & _SEQ_MASK)
+        _FIELDS.pack_into(buf, off + _SEQ.size,
+                          old_power if power is None else power, channels,
+                          old_current if current is None else current)
+        _SEQ.pack_into(buf, off, (seq + 2) & _SEQ_MASK)
+
+
+class SharedFleet:
+    """
+    Shared-memory state for 'size' TVs with ids 0..size-1.
+
+    Behavior (per TV, same as SmartTV):
+        - Starts OFF on channel 1 with 'channels' available channels
+        - Channel changes must stay within 1..channel count
+    """
+
+    def __init__(self, size: int, channels: int = 10, locks: Optional[list] = None,
+                 name: Optional[str] = None) -> None:
+        """
+        Creates a new segment, or attaches to an existing one by name.
+
+        Args:
+            size (int): Number of TVs.
+            channels (int): Channel count of every TV (new segments only).
+            locks (list | None): Process-shared locks from the creator
+                (default: new multiprocessing RLocks).
+            name (str | None): Segment to attach to (default: create one).
+
+        Raises:
+            ValueError: If size is not positive.
+        """
+        if size < 1:
+            raise ValueError('Fleet size must be positive')
+        self.size = size
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size * _STRIDE)
+            for i in range(size):
+                _RECORD.pack_into(self._shm.buf, i * _STRIDE, 0, 0, channels, 1)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.buf = self._shm.buf
+        if locks is None:
+            locks = [multiprocessing.RLock() for _ in range(min(size, LOCK_STRIPES))]
+        self.locks = locks
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def view(self, i: int) -> SharedTV:
+        """
+        Gets a SmartTV-compatible view of TV 'i'.
+
+        Raises:
+            IndexError: If 'i' is not a valid id.
+        """
+        if not (0 <= i < self.size):
+            raise IndexError('TV id out of range')
+        return SharedTV(self, i)
+
+    __getitem__ = view
+
+    def lock(self, i: int):
+        """
+        Gets the process-shared lock guarding TV 'i'.
+        """
+        return self.locks[i % len(self.locks)]
+
+    def close(self) -> None:
+        """
+        Detaches from the segment (views must no longer be used).
+        """
+        self.buf = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Destroys the segment (creator only, after every worker has exited).
+        """
+        self._shm.unlink()
+
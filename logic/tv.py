@@ -6,10 +6,64 @@ This module defines the SmartTV class, which encapsulates the
 core logic of the simulated Smart TV. It is independent of
 networking and command handling.
 
+Every state change publishes a new immutable TVState snapshot, so
+readers can query a consistent view without taking the TV's lock.
+
+A TV can carry a ChannelCatalog (logic/catalog.py) with channel names;
+its channel count is then the size of the lineup.
+
 Author: dotDennis
 Course: IDATA2304
 """
 
+from typing import Optional
+from logic.catalog import ChannelCatalog
+
+
+class TVState:
+    """
+    Immutable snapshot of a TV's state at one version.
+
+    Offers the query half of the SmartTV API (is_on, get_channel,
+    get_channel_count), so read-only command handlers can run against
+    it directly. 'responses' is a memo for answers derived from this
+    snapshot and 'frames' one for the same answers encoded for the wire;
+    both are discarded together with the snapshot on the next state
+    change.
+    """
+
+    __slots__ = ('_is_on', '_channels', '_current_ch', 'version', 'responses', 'frames')
+
+    def __init__(self, is_on: bool, channels: int, current_ch: int, version: int = 0) -> None:
+        self._is_on = is_on
+        self._channels = channels
+        self._current_ch = current_ch
+        self.version = version
+        self.responses: dict[str, str] = {}
+        self.frames: dict[str, bytes] = {}
+
+    def is_on(self) -> bool:
+        """
+        Returns:
+            bool: True if TV is ON, False if OFF.
+        """
+        return self._is_on
+
+    def get_channel_count(self) -> int:
+        """
+        Returns:
+            int: Number of channels.
+        """
+        return self._channels
+
+    def get_channel(self) -> int:
+        """
+        Returns:
+            int: Current channel index (1-based).
+        """
+        return self._current_ch
+
+
 class SmartTV:
     """
     Minimal Smart TV model with ON/OFF state and channel support
@@ -21,18 +75,26 @@ class SmartTV:
         - Maintains current channel and number of available channels
     """
 
-    def __init__(self) -> None:
+    def __init__(self, catalog: Optional[ChannelCatalog] = None) -> None:
         """
         Initializes the Smart TV in the default state (OFF) with default channels.
 
+        Args:
+            catalog (ChannelCatalog | None): Named channel lineup (default: none).
+
         Attributes:
             - _is_on (bool): Power state, False by default.
-            - _channels (int): Number of available channels (default: 10).
+            - _channels (int): Number of available channels (default: 10,
+              or the catalog size).
             - _current_ch (int): Currently active channel (default: 1).
+            - catalog (ChannelCatalog | None): Channel names, if any.
+            - _state (TVState): Latest published snapshot (version 0).
         """
         self._is_on = False
-        self._channels = 10
+        self._channels = 10 if catalog is None else len(catalog)
         self._current_ch = 1
+        self.catalog = catalog
+        self._state = TVState(self._is_on, self._channels, self._current_ch)
 
     # Power controls
     def turn_on(self) -> None:
@@ -43,7 +105,8 @@ class SmartTV:
             None
         """
         self._is_on = True
-    
+        self._publish()
+
     def turn_off(self) -> None:
         """
         Turns the TV off.
@@ -52,6 +115,7 @@ class SmartTV:
             None
         """
         self._is_on = False
+        self._publish()
 
     # Query
     def is_on(self) -> bool:
@@ -97,4 +161,37 @@ class SmartTV:
         """
         if not (1 <= n <= self._channels):
             raise ValueError('Channel out of range')
-        self._current_ch = n
\ No newline at end of file
+        self._current_ch = n
+        self._publish()
+
+    def set_catalog(self, catalog: ChannelCatalog) -> None:
+        """
+        Switches to a new channel lineup; the channel count follows its
+        size and a current channel beyond it falls back to 1.
+
+        Raises:
+            ValueError: If the catalog is empty.
+        """
+        if not len(catalog):
+            raise ValueError('Channel catalog is empty')
+        self.catalog = catalog
+        self._channels = len(catalog)
+        if self._current_ch > self._channels:
+            self._current_ch = 1
+        self._publish()
+
+    # Snapshots
+    def snapshot(self) -> TVState:
+        """
+        Gets the latest published state (safe to call without the TV's lock).
+
+        Returns:
+            TVState: Immutable snapshot of the current state.
+        """
+        return self._state
+
+    def _publish(self) -> None:
+        # Writers are serialized by the TV's lock; swapping the reference
+        # is atomic, so readers see either the old or the new snapshot
+        self._state = TVState(self._is_on, self._channels, self._current_ch,
+                              self._state.version + 1)
\ No newline at end of file
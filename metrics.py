@@ -0,0 +1,423 @@
+"""
+Smart TV Metrics
+================
+
+Low-overhead, in-process instrumentation shared by all server engines.
+
+What is recorded:
+    - per-command execution time (histogram, labelled by command)
+    - time spent waiting for the TV locks and the clients-registry lock,
+      plus how often an acquisition was contended
+    - broadcast fan-out: time to enqueue a notice for every recipient
+      and the number of recipients
+    - connected-client gauge and total connections accepted
+
+Exposed through the 'stats' admin command (human summary) and
+'stats scrape' (plain-text exposition format, one sample per line,
+compatible with Prometheus-style scrapers).
+
+Overhead:
+    - Everything is guarded by the module-level 'enabled' flag; when it
+      is False the hot paths skip all timing and locked() hands back the
+      plain lock, so the cost is one flag check per call site.
+    - Updates are plain attribute increments, not locked: under the GIL
+      a lost update needs a thread switch mid-increment, which is rare
+      enough for monitoring and keeps instrumentation off the lock
+      paths it is measuring.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+from typing import Optional
+from config import METRICS_ENABLED
+
+# Runtime switch (default from config.py, overridable via configure())
+enabled = METRICS_ENABLED
+
+# Bucket upper bounds in seconds: 1us .. 10s, roughly 1-2.5-5 steps
+TIME_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Bucket upper bounds for recipient counts
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+
+
+def configure(enable: Optional[bool] = None) -> None:
+    """
+    Turn instrumentation on or off (call at startup, before serving).
+
+    Args:
+        enable (bool | None): New state; None leaves it unchanged.
+
+    Returns:
+        None
+    """
+    global enabled
+    if enable is not None:
+        enabled = bool(enable)
+
+
+# ---------------------------------------------------------------------
+#  Metric types
+# ---------------------------------------------------------------------
+class Counter:
+    """
+    Monotonically increasing count.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, n: int = 1) -> None:
+        self.value += n
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        return [f'{name}{labels} {self.value}']
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down (e.g. connected clients).
+    """
+
+    __slots__ = ()
+
+    def dec(self, n: int = 1) -> None:
+        self.value -= n
+
+    def set(self, value: int) -> None:
+        self.value = value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (cumulative counts are computed when rendered).
+    """
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple = TIME_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the q-quantile (None if empty,
+        inf if it fell past the last bucket).
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        inner = labels[1:-1] + ',' if labels else ''
+        out = []
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            out.append(f'{name}_bucket{{{inner}le="{bound:g}"}} {seen}')
+        out.append(f'{name}_bucket{{{inner}le="+Inf"}} {self.count}')
+        out.append(f'{name}_sum{labels} {self.sum:.9g}')
+        out.append(f'{name}_count{labels} {self.count}')
+        return out
+
+
+class Family:
+    """
+    A named metric with an optional label; one child metric per label value.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: type,
+                 label: Optional[str] = None, **options) -> None:
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label = label
+        self._options = options
+        self._children: dict[str, object] = {}
+        if label is None:
+            self._children[''] = kind(**options)
+
+    def labels(self, value: str):
+        """
+        Get (creating on first use) the child metric for a label value.
+        """
+        child = self._children.get(value)
+        if child is None:
+            child = self._children.setdefault(value, self.kind(**self._options))
+        return child
+
+    def child(self):
+        """
+        The single child of an unlabelled family.
+        """
+        return self._children['']
+
+    def items(self) -> list[tuple[str, object]]:
+        return sorted(self._children.items())
+
+    def render(self) -> list[str]:
+        type_name = {Counter: 'counter', Gauge: 'gauge', Histogram: 'histogram'}[self.kind]
+        out = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {type_name}']
+        for value, metric in self.items():
+            labels = f'{{{self.label}="{value}"}}' if self.label else ''
+            out.extend(metric.samples(self.name, labels))
+        return out
+
+    def remove(self, value: str) -> None:
+        """
+        Forget the child for a label value that is gone (e.g. a peer).
+        """
+        self._children.pop(value, None)
+
+    def reset(self) -> None:
+        # Re-initialize in place so held references (e.g. LockTimer) stay valid
+        for metric in self._children.values():
+            metric.__init__(**self._options)
+
+
+# ---------------------------------------------------------------------
+#  The metrics catalog
+# ---------------------------------------------------------------------
+COMMAND_SECONDS = Family('smarttv_command_seconds',
+                         'Time to execute one command.', Histogram, 'command')
+LOCK_WAIT_SECONDS = Family('smarttv_lock_wait_seconds',
+                           'Time spent waiting to acquire a lock.', Histogram, 'lock')
+LOCK_CONTENDED = Family('smarttv_lock_contended_total',
+                        'Lock acquisitions that had to wait.', Counter, 'lock')
+BROADCAST_SECONDS = Family('smarttv_broadcast_seconds',
+                           'Time to enqueue one notice for all its recipients.', Histogram)
+BROADCAST_RECIPIENTS = Family('smarttv_broadcast_recipients',
+                              'Recipients of one notice.', Histogram, bounds=COUNT_BUCKETS)
+NOTICES_QUEUED = Family('smarttv_notices_queued_total',
+                        'Notices handed to outbound queues.', Counter)
+CLIENTS = Family('smarttv_clients', 'Currently connected remotes.', Gauge)
+CONNECTIONS = Family('smarttv_connections_total', 'Remotes accepted since start.', Counter)
+DROPPED = Family('smarttv_connections_dropped_total',
+                 'Remotes closed by the server, by reason (rejected, idle).', Counter, 'reason')
+
+REJECTED = Family('smarttv_commands_rejected_total',
+                  'Commands refused by admission control, by reason (throttled, shed).',
+                  Counter, 'reason')
+UDP_DATAGRAMS = Family('smarttv_udp_datagrams_total',
+                       'UDP key presses, by outcome (applied, stale, malformed, rejected).',
+                       Counter, 'outcome')
+REPLICATION_LAG_CHANGES = Family('smarttv_replication_lag_changes',
+                                 'Changes a follower had not applied at the last heartbeat, '
+                                 'by peer.', Gauge, 'peer')
+REPLICATION_LAG_SECONDS = Family('smarttv_replication_lag_seconds',
+                                 'Round trip of the last heartbeat through the change stream, '
+                                 'by peer.', Gauge, 'peer')
+REPLICATION_EVENTS = Family('smarttv_replication_events_total',
+                            'Replication links synced, lost, or dropped for lagging.',
+                            Counter, 'event')
+
+FAMILIES = (COMMAND_SECONDS, LOCK_WAIT_SECONDS, LOCK_CONTENDED, BROADCAST_SECONDS,
+            BROADCAST_RECIPIENTS, NOTICES_QUEUED, CLIENTS, CONNECTIONS, DROPPED,
+            REJECTED, UDP_DATAGRAMS, REPLICATION_LAG_CHANGES, REPLICATION_LAG_SECONDS,
+            REPLICATION_EVENTS)
+
+
+class LockTimer:
+    """
+    Wait-time histogram and contention counter for one kind of lock.
+    """
+
+    __slots__ = ('name', 'wait', 'contended', 'acquirers')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.wait = LOCK_WAIT_SECONDS.labels(name)
+        self.contended = LOCK_CONTENDED.labels(name)
+        # lock -> its _TimedAcquire, built once: the wrapper holds no
+        # per-acquisition state, so threads can share it (TVs are never
+        # removed, so neither are their locks)
+        self.acquirers: dict = {}
+
+
+TV_LOCK = LockTimer('tv')
+CLIENTS_LOCK = LockTimer('clients')
+
+
+class _TimedAcquire:
+    __slots__ = ('_lock', '_timer')
+
+    def __init__(self, lock, timer: LockTimer) -> None:
+        self._lock = lock
+        self._timer = timer
+
+    def __enter__(self):
+        lock = self._lock
+        # Uncontended acquisitions skip the clock entirely
+        if lock.acquire(False):
+            wait = self._timer.wait
+            wait.counts[0] += 1
+            wait.count += 1
+            return lock
+        start = perf_counter()
+        lock.acquire()
+        timer = self._timer
+        timer.wait.observe(perf_counter() - start)
+        timer.contended.inc()
+        return lock
+
+    def __exit__(self, *exc) -> None:
+        self._lock.release()
+
+
+def locked(lock, timer: LockTimer):
+    """
+    Context manager acquiring 'lock', timing the wait when enabled.
+
+    Returns the lock itself when metrics are disabled, so 'with
+    locked(lock, TV_LOCK):' costs the same as 'with lock:' plus one call.
+    """
+    if not enabled:
+        return lock
+    acquire = timer.acquirers.get(lock)
+    if acquire is None:
+        acquire = timer.acquirers[lock] = _TimedAcquire(lock, timer)
+    return acquire
+
+
+# ---------------------------------------------------------------------
+#  Recording helpers used by the engines
+# ---------------------------------------------------------------------
+def observe_command(name: str, seconds: float) -> None:
+    COMMAND_SECONDS.labels(name).observe(seconds)
+
+
+def observe_broadcast(seconds: float, recipients: int) -> None:
+    BROADCAST_SECONDS.child().observe(seconds)
+    BROADCAST_RECIPIENTS.child().observe(recipients)
+    NOTICES_QUEUED.child().inc(recipients)
+
+
+def client_connected() -> None:
+    if enabled:
+        CLIENTS.child().inc()
+        CONNECTIONS.child().inc()
+
+
+def client_disconnected() -> None:
+    if enabled:
+        CLIENTS.child().dec()
+
+
+def connection_dropped(reason: str) -> None:
+    if enabled:
+        DROPPED.labels(reason).inc()
+
+
+def command_rejected(reason: str) -> None:
+    if enabled:
+        REJECTED.labels(reason).inc()
+
+
+def udp_datagram(outcome: str) -> None:
+    if enabled:
+        UDP_DATAGRAMS.labels(outcome).inc()
+
+
+def replication_lag(peer: str, changes: int, seconds: float) -> None:
+    if enabled:
+        REPLICATION_LAG_CHANGES.labels(peer).set(changes)
+        REPLICATION_LAG_SECONDS.labels(peer).set(seconds)
+
+
+def replication_peer_gone(peer: str) -> None:
+    REPLICATION_LAG_CHANGES.remove(peer)
+    REPLICATION_LAG_SECONDS.remove(peer)
+
+
+def replication_event(event: str) -> None:
+    if enabled:
+        REPLICATION_EVENTS.labels(event).inc()
+
+
+def reset() -> None:
+    """
+    Zero every metric (used by tests).
+    """
+    for family in FAMILIES:
+        family.reset()
+
+
+# ---------------------------------------------------------------------
+#  Output formats
+# ---------------------------------------------------------------------
+def render() -> str:
+    """
+    Every metric in the plain-text exposition format.
+    """
+    lines = []
+    for family in FAMILIES:
+        lines.extend(family.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _fmt_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return '-'
+    if value == float('inf'):
+        return '>10s'
+    if value < 1e-3:
+        return f'{value * 1e6:g}us'
+    if value < 1:
+        return f'{value * 1e3:g}ms'
+    return f'{value:g}s'
+
+
+def summary() -> str:
+    """
+    Short human-readable overview (percentiles are bucket upper bounds).
+    """
+    clients = CLIENTS.child().value
+    lines = [f'Clients: {clients} connected, {CONNECTIONS.child().value} since start']
+    dropped = ', '.join(f'{reason} {c.value}' for reason, c in DROPPED.items())
+    if dropped:
+        lines[0] += f' (dropped: {dropped})'
+    lines.append('Commands:     count      p50      p99     mean')
+    for name, h in COMMAND_SECONDS.items():
+        mean = h.sum / h.count if h.count else None
+        lines.append(f'  {name:<10} {h.count:>7} {_fmt_seconds(h.quantile(0.5)):>8} '
+                     f'{_fmt_seconds(h.quantile(0.99)):>8} {_fmt_seconds(mean):>8}')
+    rejected = ', '.join(f'{reason} {c.value}' for reason, c in REJECTED.items())
+    if rejected:
+        lines.append(f'Rejected commands: {rejected}')
+    presses = ', '.join(f'{outcome} {c.value}' for outcome, c in UDP_DATAGRAMS.items())
+    if presses:
+        lines.append(f'UDP presses: {presses}')
+    lags = ', '.join(f'{peer} {REPLICATION_LAG_CHANGES.labels(peer).value} change(s) '
+                     f'{_fmt_seconds(g.value)}' for peer, g in REPLICATION_LAG_SECONDS.items())
+    if lags:
+        lines.append(f'Replication lag: {lags}')
+    for timer in (TV_LOCK, CLIENTS_LOCK):
+        h = timer.wait
+        lines.append(f'Lock wait {timer.name}: {h.count} acquisitions, '
+                     f'{timer.contended.value} contended, p99 {_fmt_seconds(h.quantile(0.99))}')
+    b = BROADCAST_SECONDS.child()
+    r = BROADCAST_RECIPIENTS.child()
+    lines.append(f'Broadcasts: {b.count}, {NOTICES_QUEUED.child().value} notices queued, '
+                 f'p99 {_fmt_seconds(b.quantile(0.99))}, '
+                 f'max recipients <= {r.quantile(1.0) if r.count else "-"}')
+    return '\n'.join(lines)
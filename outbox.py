@@ -0,0 +1,229 @@
+"""
+Smart TV Outbound Queues
+========================
+
+Bounded per-client outbound queue shared by all server engines.
+
+Every connection owns one OutboundQueue drained by its own writer
+(a thread or an asyncio task), so a broadcast only has to enqueue and
+never waits on a slow remote's TCP window.
+
+Overflow policies (applied to notices only; direct replies are never
+dropped, the connection's own reader is throttled instead):
+    - 'drop_oldest': discard the oldest queued notice to make room.
+    - 'disconnect':  close the connection of a remote that cannot keep up.
+    - 'coalesce':    a notice replaces a still-queued notice with the same
+                     key (e.g. an older channel change); if the queue is
+                     still full, the oldest notice is dropped.
+
+Notice window (independent of the overflow policy):
+    With a window of W seconds, a receiver gets at most one notice per
+    key every W seconds. A notice arriving sooner is held back, a newer
+    one with the same key replaces it, and only the latest is released
+    once the window has passed. During rapid zapping, fan-out traffic
+    is therefore bounded by the window rate rather than the write rate.
+    Held notices are not flushed on close (they are stale by then).
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+from collections import deque
+from time import monotonic
+from typing import Optional
+from config import NOTICE_WINDOW, OUTBOUND_QUEUE_LIMIT, OUTBOUND_OVERFLOW_POLICY
+
+OVERFLOW_POLICIES = ('drop_oldest', 'disconnect', 'coalesce')
+
+# Runtime settings (defaults from config.py, overridable via configure())
+queue_limit = OUTBOUND_QUEUE_LIMIT
+overflow_policy = OUTBOUND_OVERFLOW_POLICY
+notice_window = NOTICE_WINDOW
+
+
+def configure(limit: Optional[int] = None, policy: Optional[str] = None,
+              window: Optional[float] = None) -> None:
+    """
+    Override the queue settings used by connections created from now on.
+
+    Args:
+        limit (int | None): Maximum number of queued notices per client.
+        policy (str | None): One of OVERFLOW_POLICIES.
+        window (float | None): Per-key notice window in seconds (0 = off).
+
+    Raises:
+        ValueError: If the limit, policy or window is invalid.
+
+    Returns:
+        None
+    """
+    global queue_limit, overflow_policy, notice_window
+    if limit is not None:
+        if limit < 1:
+            raise ValueError('Queue limit must be at least 1')
+        queue_limit = limit
+    if policy is not None:
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {policy!r}')
+        overflow_policy = policy
+    if window is not None:
+        if window < 0:
+            raise ValueError('Notice window must not be negative')
+        notice_window = window
+
+
+class OutboundQueue:
+    """
+    FIFO of pending outbound messages for one client (not thread-safe;
+    the owning connection serializes access).
+
+    Each entry is a mutable [data, key, is_notice] cell so a coalesced
+    notice can be replaced in place in O(1). Notices held back by the
+    notice window live in a separate key -> [data, release_at] table.
+    """
+
+    __slots__ = ('_items', '_keyed', '_notices', '_held', '_last',
+                 'limit', 'policy', 'window', 'dropped')
+
+    def __init__(self, limit: Optional[int] = None, policy: Optional[str] = None,
+                 window: Optional[float] = None) -> None:
+        self._items: deque[list] = deque()
+        self._keyed: dict[str, list] = {}
+        self._notices = 0
+        self._held: dict[str, list] = {}
+        self._last: dict[str, float] = {}
+        self.limit = queue_limit if limit is None else limit
+        self.policy = overflow_policy if policy is None else policy
+        self.window = notice_window if window is None else window
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def push_reply(self, data: bytes) -> None:
+        """
+        Queue a direct reply (never dropped).
+        """
+        self._items.append([data, None, False])
+
+    def push_notice(self, data: bytes, key: Optional[str] = None) -> bool:
+        """
+        Queue a notice, applying the overflow policy.
+
+        Args:
+            data (bytes): Encoded notice.
+            key (str | None): Coalescing key; notices with the same key
+                supersede each other under the 'coalesce' policy.
+
+        Returns:
+            bool: False if the client must be disconnected, else True.
+        """
+        if self.window and key is not None:
+            held = self._held.get(key)
+            if held is not None:
+                held[0] = data
+                self.dropped += 1
+                return True
+            now = monotonic()
+            last = self._last.get(key)
+            if last is not None and now - last < self.window:
+                self._held[key] = [data, last + self.window]
+                return True
+            self._last[key] = now
+
+        coalesce = self.policy == 'coalesce' and key is not None
+        if coalesce:
+            cell = self._keyed.get(key)
+            if cell is not None:
+                cell[0] = data
+                self.dropped += 1
+                return True
+
+        if self._notices >= self.limit:
+            if self.policy == 'disconnect':
+                return False
+            self._drop_oldest_notice()
+
+        cell = [data, key, True]
+        self._items.append(cell)
+        self._notices += 1
+        if coalesce:
+            self._keyed[key] = cell
+        return True
+
+    def due(self) -> bool:
+        """
+        Returns:
+            bool: True if pop_all() has something to send right now.
+        """
+        if self._items:
+            return True
+        if self._held:
+            now = monotonic()
+            return any(release_at <= now for _, release_at in self._held.values())
+        return False
+
+    def wait_time(self) -> Optional[float]:
+        """
+        Returns:
+            float | None: Seconds until the next held notice is released,
+            or None if nothing is held (wait for new messages).
+        """
+        if not self._held:
+            return None
+        release_at = min(release_at for _, release_at in self._held.values())
+        return max(0.0, release_at - monotonic())
+
+    def pop_all(self) -> bytes:
+        """
+        Remove every queued message (plus held notices whose window has
+        passed) and return them as one buffer.
+
+        Returns:
+            bytes: The concatenated messages, ready for a single send.
+        """
+        return b''.join(self.pop_chunks())
+
+    def pop_chunks(self) -> list[bytes]:
+        """
+        Like pop_all(), but return the messages as they were queued, for
+        a scatter/gather send (no copy into one buffer).
+
+        Returns:
+            list[bytes]: The messages in send order.
+        """
+        chunks = []
+        items = self._items
+        while items:
+            data, key, is_notice = items.popleft()
+            chunks.append(data)
+            if is_notice:
+                self._notices -= 1
+        self._keyed.clear()
+        if self._held:
+            now = monotonic()
+            for key, (data, release_at) in list(self._held.items()):
+                if release_at <= now:
+                    del self._held[key]
+                    self._last[key] = now
+                    chunks.append(data)
+        return chunks
+
+    def clear(self) -> None:
+        """
+        Discard everything still queued or held.
+        """
+        self._items.clear()
+        self._keyed.clear()
+        self._held.clear()
+        self._notices = 0
+
+    def _drop_oldest_notice(self) -> None:
+        for i, cell in enumerate(self._items):
+            if cell[2]:
+                del self._items[i]
+                self._notices -= 1
+                if cell[1] is not None and self._keyed.get(cell[1]) is cell:
+                    del self._keyed[cell[1]]
+                self.dropped += 1
+                return
@@ -0,0 +1,268 @@
+"""
+Smart TV Runtime Profiling
+==========================
+
+Opt-in profilers that are started and stopped on a live server with
+the 'profile' admin command, so a slow remote or command pattern can be
+examined without restarting the server (and losing its state and the
+reproduction).
+
+Modes:
+    - 'sample': a background thread records the Python stack of every
+      thread (scope 'all') or only of the thread serving the remote
+      that started it (scope 'self') every 'sample_interval' seconds.
+      Written as collapsed stacks ('frame;frame;frame count' per line),
+      the input format of flame-graph tools.
+    - 'trace': deterministic cProfile of the thread serving the remote
+      that started it; with the threaded engine that is exactly that
+      remote's handle_client thread, with asyncio it is the event loop
+      (every remote). Written as a pstats file. A trace can only be
+      stopped from the connection that started it, and is stopped and
+      written when that connection closes (see release()). There is no
+      trace of scope 'all': cProfile hooks one thread, so a whole-server
+      view comes from 'sample all'. A trace is stopped on the thread it
+      profiles (the engines run 'profile' on the connection's own
+      thread, or the event loop).
+
+Profiles are only written into the directory given with
+'server.py --profile-dir'; without it the command is refused, so a
+remote cannot make the server write files. While no profile runs the
+overhead is zero: nothing is hooked and no sampler thread exists.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import cProfile
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+
+MODES = ('sample', 'trace')
+SCOPES = ('all', 'self')
+_SUFFIX = {'sample': 'folded', 'trace': 'pstats'}
+
+# Runtime settings (defaults from config.py, overridable via configure())
+profile_dir: Optional[str] = PROFILE_DIR
+sample_interval = PROFILE_SAMPLE_INTERVAL
+
+_lock = threading.Lock()
+_current: Optional['Run'] = None
+_serial = itertools.count(1)
+
+
+def configure(directory: Optional[str] = None, interval: Optional[float] = None) -> None:
+    """
+    Enable profiling into 'directory' and/or change the sample interval.
+
+    Raises:
+        ValueError: If the interval is not positive.
+
+    Returns:
+        None
+    """
+    global profile_dir, sample_interval
+    if directory is not None:
+        profile_dir = directory
+    if interval is not None:
+        if interval <= 0:
+            raise ValueError('Sample interval must be positive')
+        sample_interval = interval
+
+
+def _collapse(frame) -> str:
+    # Root-first 'file:function' names joined by ';' (no spaces)
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """
+    Statistical profiler: periodic stack samples from a background thread.
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None) -> None:
+        """
+        Args:
+            interval (float): Seconds between samples.
+            thread_id (int | None): Only sample this thread (None = all threads).
+        """
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f'{stack} {count}\n')
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_id is not None and ident != self.thread_id):
+                    continue
+                self.stacks[_collapse(frame)] += 1
+            self.samples += 1
+
+
+class Tracer:
+    """
+    Deterministic profiler (cProfile) of the thread that starts it.
+    """
+
+    def __init__(self) -> None:
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        # Must run on the profiled thread (cProfile hooks are per thread)
+        self._profile.disable()
+
+    def write(self, path: str) -> None:
+        self._profile.dump_stats(path)
+
+
+class Run:
+    """
+    The profile currently running: its settings, its owner and its profiler.
+    """
+
+    __slots__ = ('mode', 'scope', 'owner', 'thread_id', 'started', 'profiler')
+
+    def __init__(self, mode: str, scope: str, owner: object = None) -> None:
+        self.mode = mode
+        self.scope = scope
+        self.owner = owner
+        self.thread_id = threading.get_ident()
+        self.started = time.monotonic()
+        if mode == 'trace':
+            self.profiler = Tracer()
+        else:
+            self.profiler = Sampler(sample_interval,
+                                    self.thread_id if scope == 'self' else None)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+def current() -> Optional[Run]:
+    """
+    Returns:
+        Run | None: The running profile, if any.
+    """
+    return _current
+
+
+def start(mode: str, scope: str, owner: object = None) -> bool:
+    """
+    Start a profile on behalf of the calling thread ('self' scope and
+    'trace' mode refer to it).
+
+    Args:
+        mode (str): 'sample' or 'trace'.
+        scope (str): 'all' or 'self'.
+        owner (object): Who started it (the remote's Session); only the
+            owner may stop a trace.
+
+    Raises:
+        ValueError: If the mode or scope is unknown, or a trace is
+            asked for scope 'all'.
+
+    Returns:
+        bool: False if a profile is already running.
+    """
+    global _current
+    if mode not in MODES or scope not in SCOPES or (mode == 'trace' and scope == 'all'):
+        raise ValueError(f'Unsupported profile {mode!r} with scope {scope!r}')
+    with _lock:
+        if _current is not None:
+            return False
+        run = Run(mode, scope, owner)
+        run.profiler.start()
+        _current = run
+        return True
+
+
+def stop(owner: object = None) -> Optional[str]:
+    """
+    Stop the running profile and write it to a new file in profile_dir.
+
+    Args:
+        owner (object): Who asks (the remote's Session).
+
+    Raises:
+        RuntimeError: If the running profile is a trace started by
+            another owner, or asked to stop from another thread than
+            the one it profiles (it is left running).
+        OSError: If the file cannot be written (the profile is discarded).
+
+    Returns:
+        str | None: The file written, or None if no profile was running.
+    """
+    global _current
+    with _lock:
+        run = _current
+        if run is None:
+            return None
+        if run.mode == 'trace' and run.owner is not owner:
+            raise RuntimeError('A trace must be stopped by the remote that started it')
+        if run.mode == 'trace' and run.thread_id != threading.get_ident():
+            # Disabling cProfile elsewhere would leave its hook installed
+            raise RuntimeError('A trace must be stopped on the thread it profiles')
+        _current = None
+    return _write(run)
+
+
+def release(owner: object) -> Optional[str]:
+    """
+    Stop and write the profile of an owner that is going away (its
+    connection closed), if it followed that owner's thread: a trace, or
+    a 'self' sample. Other profiles keep running for anyone to stop.
+
+    Returns:
+        str | None: The file written, or None if there was nothing to
+        stop or it could not be written (the profile is discarded).
+    """
+    global _current
+    with _lock:
+        run = _current
+        if run is None or run.owner is not owner or (run.mode, run.scope) == ('sample', 'all'):
+            return None
+        _current = None
+    try:
+        return _write(run)
+    except OSError:
+        return None
+
+
+def _write(run: Run) -> str:
+    # Stop the profiler and write it to a new file in profile_dir
+    run.profiler.stop()
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    name = f'profile-{stamp}-{os.getpid()}-{next(_serial)}.{_SUFFIX[run.mode]}'
+    path = os.path.join(profile_dir, name)
+    run.profiler.write(path)
+    return path
@@ -0,0 +1,387 @@
+"""
+Smart TV Wire Protocol
+======================
+
+Transport-independent framing shared by all server engines.
+
+Text framing (default):
+    - Every command is one line terminated by '\\n' ('\\r\\n' is accepted).
+    - A single read may carry many commands; they are executed in order
+      and their responses are written back in one coalesced send.
+    - Every response is terminated by exactly one '\\n'.
+    - Lines stay bytes until a command needs the slow path, so hot
+      commands go straight to handler.handle_raw().
+    - Replies are kept pre-encoded where they repeat: the fixed texts
+      (help, errors, confirmations) are framed once at import, and
+      answers to read-only commands are framed once per TV snapshot
+      (see handler.read_frame()), so they cost no encoding at all.
+
+Binary framing (negotiated per connection, see binproto.py) is selected
+by WireSession when the first byte a remote sends is the binary magic.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Optional
+import binproto
+import metrics
+import ratelimit
+import statestream
+from config import MAX_LINE_BYTES
+import handler
+from metrics import TV_LOCK, locked
+from handler import (ADMIN_COMMANDS, BATCH_COMMAND, COMMANDS, DEFAULT_TV_ID, READ_COMMANDS,
+                     SESSION_COMMANDS, TEXT_CHANNEL_SET, TEXT_EMPTY_BATCH, TEXT_OFF, TEXT_ON, Session,
+                     format_notice, forwarded, handle_batch, handle_raw, read_frame, split_batch)
+
+# ---------------------------------------------------------------------
+#  Connection-level texts
+# ---------------------------------------------------------------------
+TEXT_WELCOME = b"Welcome to the Smart TV server. Type 'ON' to begin.\n"
+TEXT_FAREWELL = b'Until next time!\n'
+TEXT_HANDLER_BUG = 'ERROR: Internal handler bug (no response)'
+TEXT_LINE_TOO_LONG = f'ERROR: Command too long (max {MAX_LINE_BYTES} bytes)'
+TEXT_THROTTLED = 'ERROR: Rate limit exceeded for {cls} commands. Slow down.'
+TEXT_BUSY = 'ERROR: Server busy. Try again later.'
+TEXT_SERVER_FULL = b'ERROR: Server is full. Try again later.\n'
+TEXT_IDLE_TIMEOUT = b'Disconnected: idle for too long (send \'ping\' to stay connected).\n'
+
+# Notice topics (see handler.NOTICE_TOPICS); the topic doubles as the
+# coalescing key in outbound queues (a newer notice supersedes an older
+# one on the same topic)
+CHANNEL_NOTICE_KEY = 'channel'
+POWER_NOTICE_KEY = 'power'
+_POWER_CHANGES = {TEXT_ON: 1, TEXT_OFF: 0}
+
+# A state change other remotes should hear about: (tv_id, topic, value, seq),
+# with the seq it was given in the state stream (see stamp())
+Notice = tuple[str, str, int, int]
+
+_UNLOCKED = nullcontext()
+
+# First byte of lines that need a closer look before the fast path
+_QUIT = b'quit'
+_BATCH_INITIALS = (b'b', b'B')
+
+
+class LineBuffer:
+    """
+    Per-connection receive buffer that splits a byte stream into command lines.
+
+    Partial lines are kept until their terminating newline arrives. A line
+    longer than 'max_line' is discarded up to its newline and reported as None.
+    """
+
+    __slots__ = ('_buf', '_max_line', '_discarding')
+
+    def __init__(self, max_line: int = MAX_LINE_BYTES) -> None:
+        self._buf = b''
+        self._max_line = max_line
+        self._discarding = False
+
+    def feed(self, data: bytes) -> list[Optional[bytes]]:
+        """
+        Append received bytes and return every complete line.
+
+        Args:
+            data (bytes): Bytes just read from the socket.
+
+        Returns:
+            list[bytes | None]: Stripped command lines in arrival order
+            (None marks a line that exceeded the size limit).
+        """
+        buf = self._buf + data if self._buf else data
+        if b'\n' not in data:
+            self._buf = buf
+            self._check_overflow()
+            return []
+
+        *lines, self._buf = buf.split(b'\n')
+        out: list[Optional[bytes]] = []
+        for raw in lines:
+            if self._discarding or len(raw) > self._max_line:
+                self._discarding = False
+                out.append(None)
+                continue
+            out.append(raw.strip())
+        self._check_overflow()
+        return out
+
+    def _check_overflow(self) -> None:
+        # Drop an unterminated line as soon as it can no longer be valid
+        if len(self._buf) > self._max_line:
+            self._buf = b''
+            self._discarding = True
+
+
+def _frame(response: str) -> bytes:
+    return (response.rstrip('\n') + '\n').encode()
+
+
+def _static_frames(*modules: dict) -> dict[str, bytes]:
+    # Every fixed reply text (TEXT_* without placeholders, HELP_TEXT) -> framed bytes
+    return {text: _frame(text)
+            for names in modules for name, text in names.items()
+            if (name.startswith('TEXT_') or name == 'HELP_TEXT')
+            and isinstance(text, str) and '{' not in text}
+
+
+_STATIC_FRAMES = _static_frames(vars(handler), dict(globals()))
+
+
+def frame_response(response: str) -> bytes:
+    """
+    Encode a handler response as one newline-terminated reply (fixed
+    texts come pre-encoded).
+    """
+    data = _STATIC_FRAMES.get(response)
+    if data is None:
+        data = _frame(response)
+    return data
+
+
+def channel_change(response: str) -> Optional[int]:
+    """
+    Detect a successful channel change from a handler response.
+
+    We infer success by the handler's success message format
+    ('Channel set to <n>' is only ever produced by 'set_ch').
+
+    Args:
+        response (str): The handler's response to a command.
+
+    Returns:
+        int | None: The new channel, or None if nothing changed.
+    """
+    if response.startswith(TEXT_CHANNEL_SET):
+        return int(response[len(TEXT_CHANNEL_SET):])
+    return None
+
+
+def power_change(response: str) -> Optional[int]:
+    """
+    Detect a successful power change from a handler response.
+
+    Returns:
+        int | None: 1 (switched ON), 0 (switched OFF) or None if nothing changed.
+    """
+    return _POWER_CHANGES.get(response)
+
+
+def command_label(raw: bytes) -> str:
+    """
+    Metrics label for a command line: its name if it is a known command,
+    otherwise 'other' (so arbitrary input cannot create new labels).
+    """
+    name = raw.split(None, 1)[0].lower().decode(errors='replace') if raw.strip() else ''
+    if name in COMMANDS or name in SESSION_COMMANDS or name in ADMIN_COMMANDS \
+            or name == BATCH_COMMAND:
+        return name
+    return 'other'
+
+
+def admission(raw: bytes, batch: Optional[list[str]]) -> tuple[str, int]:
+    """
+    Rate-limit class and cost of a command line (a batch costs one token
+    per sub-command, charged to its most expensive class).
+    """
+    if batch:
+        return ratelimit.heaviest(ratelimit.classify(c.split(None, 1)[0].lower())
+                                  for c in batch), len(batch)
+    return ratelimit.classify(command_label(raw)), 1
+
+
+def stamp(tv_id: str, topic: str, value: int) -> int:
+    """
+    Record a change in the state stream.
+
+    Called with the TV's lock still held from the change itself, so seqs
+    follow the order the changes were made in: the newest entry for a TV
+    and topic is its current value, however late the notices reach
+    publish().
+
+    Returns:
+        int: The change's seq.
+    """
+    return statestream.stream.record(tv_id, topic, value)
+
+
+def execute_lines(lines: list[Optional[bytes]], session: Optional[Session] = None,
+                  limiter: Optional[ratelimit.ClientLimiter] = None
+                  ) -> tuple[bytes, list[Notice], bool]:
+    """
+    Execute a run of pipelined commands in order.
+
+    Args:
+        lines (list[bytes | None]): Complete command lines from a LineBuffer.
+        session (Session | None): The connection's session (selected TV).
+        limiter (ClientLimiter | None): The connection's rate limits; over
+            the limit (or while the server sheds load) a command is
+            answered with an error instead of running.
+
+    Returns:
+        tuple:
+            - reply (bytes): All responses, coalesced for a single send.
+            - notices (list[Notice]): (tv_id, topic, value, seq) changes to
+              send to the other remotes subscribed to that topic on that TV,
+              already recorded in the state stream.
+            - close (bool): True if the client asked to 'quit'.
+    """
+    out: list[bytes] = []
+    notices: list[Notice] = []
+    timed = metrics.enabled
+    for raw in lines:
+        if raw is None:
+            out.append(frame_response(TEXT_LINE_TOO_LONG))
+            continue
+        if len(raw) == 4 and raw.lower() == _QUIT:
+            out.append(TEXT_FAREWELL)
+            return b''.join(out), notices, True
+
+        tv_id = session.tv_id if session is not None else DEFAULT_TV_ID
+        batch = split_batch(raw.decode(errors='replace')) if raw[:1] in _BATCH_INITIALS else None
+        measured = False
+        cls = None
+        if limiter is not None or ratelimit.latency_target:
+            cls, cost = admission(raw, batch)
+            if limiter is not None and not limiter.allow(cls, cost):
+                metrics.command_rejected('throttled')
+                out.append(frame_response(TEXT_THROTTLED.format(cls=cls)))
+                continue
+            measured = cls != 'read' and ratelimit.latency_target > 0
+            if measured and ratelimit.shedder.reject():
+                metrics.command_rejected('shed')
+                out.append(frame_response(TEXT_BUSY))
+                continue
+        if timed or measured:
+            start = perf_counter()
+        # A batch answers with one line per sub-command; check each step
+        # so changes inside the batch still produce notices
+        data = None if batch is not None else read_frame(raw, session, frame_response)
+        if data is not None:
+            responses = ()  # read-only: answered pre-encoded, changes nothing
+        else:
+            # A command that may change the TV keeps it locked until its
+            # changes are stamped; anything else (reads, session and admin
+            # commands) runs unlocked. A follower's changes are made by the
+            # leader and stamped as they are answered.
+            if cls is None and handler.forward is None:
+                cls = admission(raw, batch)[0]
+            guard = _UNLOCKED if handler.forward is not None or cls == 'read' else \
+                locked(handler.resolve(session)[1], TV_LOCK)
+            with guard:
+                if batch:
+                    responses = handle_batch(batch, session)
+                    response = '\n'.join(responses)
+                else:
+                    response = TEXT_EMPTY_BATCH if batch is not None else handle_raw(raw, session)
+                    responses = (response,)
+                for result in responses:
+                    try:
+                        channel = channel_change(result)
+                        if channel is not None:
+                            notices.append((tv_id, CHANNEL_NOTICE_KEY, channel,
+                                            stamp(tv_id, CHANNEL_NOTICE_KEY, channel)))
+                            continue
+                        power = power_change(result)
+                        if power is not None:
+                            notices.append((tv_id, POWER_NOTICE_KEY, power,
+                                            stamp(tv_id, POWER_NOTICE_KEY, power)))
+                    except Exception:
+                        # Best-effort only; ignore formatting errors
+                        pass
+        if timed or measured:
+            elapsed = perf_counter() - start
+            if timed:
+                metrics.observe_command(command_label(raw), elapsed)
+            if measured:
+                ratelimit.shedder.observe(elapsed)
+        if data is None:
+            if not isinstance(response, str):
+                response = TEXT_HANDLER_BUG
+            data = frame_response(response)
+        out.append(data)
+    return b''.join(out), notices, False
+
+
+class WireSession:
+    """
+    Per-connection protocol state: framing mode, receive buffer, the
+    handler Session (selected TV) and the rate limiter. Engines feed it
+    raw bytes and send back whatever it returns.
+    """
+
+    __slots__ = ('session', 'limiter', 'binary', '_lines', '_frames', '_started', '_greeting')
+
+    def __init__(self) -> None:
+        self.session = Session()
+        self.limiter = ratelimit.for_client()
+        self.binary = False
+        self._lines = LineBuffer()
+        self._frames: Optional[binproto.FrameDecoder] = None
+        self._started = False
+        self._greeting = b''
+
+    def receive(self, data: bytes) -> tuple[bytes, list[Notice], bool]:
+        """
+        Process bytes just read from the remote.
+
+        Args:
+            data (bytes): Received bytes.
+
+        Returns:
+            tuple:
+                - reply (bytes): Bytes to send back (may be empty).
+                - notices (list[Notice]): Changes to publish to other remotes.
+                - close (bool): True if the connection should be closed.
+        """
+        return self.execute(self.feed(data))
+
+    def feed(self, data: bytes) -> list:
+        """
+        Decode bytes just read into complete requests (lines or frames)
+        for execute(); receive() in two steps.
+        """
+        if not self._started:
+            self._started = True
+            # Negotiation: the very first byte decides the framing
+            if data[:1] == binproto.BINARY_MAGIC:
+                self.binary = True
+                self._frames = binproto.FrameDecoder()
+                self._greeting = binproto.hello()
+                data = data[1:]
+        return self._frames.feed(data) if self.binary else self._lines.feed(data)
+
+    def runs(self, requests: list) -> list[tuple[bool, list]]:
+        """
+        Split 'requests' into consecutive runs, each flagged True if its
+        requests may change a TV: on a replication follower, those wait
+        for the leader's answer.
+        """
+        out: list[tuple[bool, list]] = []
+        for request in requests:
+            if self.binary:
+                name = binproto.OPCODE_NAMES.get(request[0])
+                forwards = name in COMMANDS and name not in READ_COMMANDS
+            else:
+                forwards = request is not None and request.lower() != _QUIT \
+                    and forwarded(request.decode(errors='replace'))
+            if out and out[-1][0] == forwards:
+                out[-1][1].append(request)
+            else:
+                out.append((forwards, [request]))
+        return out
+
+    def execute(self, requests: list) -> tuple[bytes, list[Notice], bool]:
+        """
+        Run requests from feed(); returns what receive() does.
+        """
+        if self.binary:
+            reply, notices, close = binproto.execute_frames(requests, self.session, self.limiter)
+        else:
+            reply, notices, close = execute_lines(requests, self.session, self.limiter)
+        greeting, self._greeting = self._greeting, b''
+        return greeting + reply if greeting else reply, notices, close
@@ -0,0 +1,213 @@
+"""
+Smart TV Rate Limiting and Load Shedding
+========================================
+
+Admission control for commands, shared by all server engines and both
+wire protocols.
+
+Per-client token buckets:
+    Every connection gets one bucket per command class, refilled at
+    'rate' tokens per second up to 'burst'. A command that finds its
+    bucket empty is answered with a throttled error instead of running,
+    so one remote looping 'set_ch' cannot monopolize a TV's lock or
+    flood everyone else with notices. A batch costs one token per
+    sub-command, charged to its most expensive class.
+
+    Classes (COMMAND_CLASSES):
+        - 'read':      queries, 'ping', session and admin commands
+        - 'write':     'on' / 'off' (TV lock; notices to 'power' subscribers)
+        - 'broadcast': 'set_ch', 'set_ch_name' (TV lock; channel notice
+                       to every watcher)
+
+Global load shedding:
+    With a latency target, the service time of 'write' and 'broadcast'
+    commands (including the wait for the TV lock) is tracked server-wide.
+    While it exceeds the target, a growing share of those commands is
+    rejected as busy (never all of them, so recovery is still measured);
+    the share falls back to zero once latency is under the target again.
+    Reads are lock-free and never shed.
+
+Both are off by default (see config.py and 'server.py --rate/--latency-target').
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import random
+from time import monotonic
+from typing import Optional
+from config import LATENCY_TARGET, RATE_LIMITS
+
+COMMAND_CLASSES = ('read', 'write', 'broadcast')
+_CLASS_BY_COMMAND = {
+    'on':     'write',
+    'off':    'write',
+    'set_ch': 'broadcast',
+    'set_ch_name': 'broadcast',
+}
+_COST = {cls: i for i, cls in enumerate(COMMAND_CLASSES)}
+
+# Runtime settings (defaults from config.py, overridable via configure())
+rate_limits: dict[str, tuple[float, float]] = dict(RATE_LIMITS)
+latency_target = LATENCY_TARGET
+
+# Load-shedding tuning: how fast the rejected share moves, and its ceiling
+SHED_STEP = 0.05
+SHED_MAX = 0.9
+
+
+def configure(limits: Optional[dict[str, tuple[float, float]]] = None,
+              target: Optional[float] = None) -> None:
+    """
+    Override the admission settings used from now on.
+
+    Args:
+        limits (dict | None): class -> (tokens per second, burst); a rate
+            of 0 leaves that class unlimited. Classes not given keep
+            their current limit.
+        target (float | None): Latency target in seconds (0 = no shedding).
+
+    Raises:
+        ValueError: If a class is unknown or a value is invalid.
+
+    Returns:
+        None
+    """
+    global latency_target
+    if limits is not None:
+        for cls, (rate, burst) in limits.items():
+            if cls not in COMMAND_CLASSES:
+                raise ValueError(f'Unknown command class {cls!r}')
+            if rate < 0 or (rate and burst < 1):
+                raise ValueError('Rate must not be negative and burst must be at least 1')
+        rate_limits.update(limits)
+    if target is not None:
+        if target < 0:
+            raise ValueError('Latency target must not be negative')
+        latency_target = target
+        shedder.reset()
+
+
+def parse_limit(spec: str) -> tuple[str, tuple[float, float]]:
+    """
+    Parse a 'class=rate[/burst]' command-line value (burst defaults to rate).
+
+    Raises:
+        ValueError: If the value is malformed.
+    """
+    cls, sep, value = spec.partition('=')
+    if not sep:
+        raise ValueError(f'Expected class=rate[/burst], got {spec!r}')
+    rate, _, burst = value.partition('/')
+    return cls.strip(), (float(rate), float(burst) if burst else float(rate))
+
+
+def classify(name: str) -> str:
+    """
+    The class of a (lower-case) command name.
+    """
+    return _CLASS_BY_COMMAND.get(name, 'read')
+
+
+def heaviest(classes) -> str:
+    """
+    The most expensive of several classes (what a batch is charged as).
+    """
+    return max(classes, key=_COST.__getitem__, default='read')
+
+
+class TokenBucket:
+    """
+    Classic token bucket: 'rate' tokens per second, at most 'burst' saved up.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', '_stamp')
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._stamp = monotonic()
+
+    def take(self, n: int = 1) -> bool:
+        """
+        Take 'n' tokens if available (all or nothing).
+        """
+        now = monotonic()
+        tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if tokens < n:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - n
+        return True
+
+
+class ClientLimiter:
+    """
+    One connection's buckets, by command class (not thread-safe; each
+    connection executes its commands in order on one thread or task).
+    """
+
+    __slots__ = ('_buckets',)
+
+    def __init__(self, limits: dict[str, tuple[float, float]]) -> None:
+        self._buckets = {cls: TokenBucket(rate, burst)
+                         for cls, (rate, burst) in limits.items() if rate}
+
+    def allow(self, cls: str, n: int = 1) -> bool:
+        """
+        Charge 'n' commands of class 'cls'.
+
+        Returns:
+            bool: False if the client is over its limit (nothing charged).
+        """
+        bucket = self._buckets.get(cls)
+        return bucket is None or bucket.take(n)
+
+
+def for_client() -> Optional[ClientLimiter]:
+    """
+    A limiter for a new connection, or None if no class is limited.
+    """
+    if not any(rate for rate, _ in rate_limits.values()):
+        return None
+    return ClientLimiter(rate_limits)
+
+
+class LoadShedder:
+    """
+    Server-wide shedding of lock-taking commands driven by their latency.
+
+    observe() nudges the rejected share up by SHED_STEP for every command
+    slower than the target and down by SHED_STEP for every faster one.
+    Updates race benignly between threads (a lost nudge is harmless).
+    """
+
+    __slots__ = ('share', 'shed')
+
+    def __init__(self) -> None:
+        self.share = 0.0
+        self.shed = 0
+
+    def reset(self) -> None:
+        self.share = 0.0
+
+    def observe(self, seconds: float) -> None:
+        if seconds > latency_target:
+            self.share = min(SHED_MAX, self.share + SHED_STEP)
+        elif self.share:
+            self.share = max(0.0, self.share - SHED_STEP)
+
+    def reject(self) -> bool:
+        """
+        Returns:
+            bool: True if the next lock-taking command should be turned away.
+        """
+        if self.share and random.random() < self.share:
+            self.shed += 1
+            return True
+        return False
+
+
+shedder = LoadShedder()
@@ -0,0 +1,643 @@
+"""
+Smart TV Remote Library
+=======================
+
+Importable client API for automation, built on the binary protocol
+(binproto.py): every request carries a tag that the server echoes, so
+many commands can be in flight on one connection and each response is
+matched to its request. Notices arrive as their own frames and go to a
+separate callback, never mixed into responses.
+
+Flavors:
+    - Remote:           blocking API, one reader thread per connection
+    - AsyncRemote:      asyncio API, one reader task per connection
+    - RemotePool /
+      AsyncRemotePool:  N connections; commands for a TV always use the
+                        same connection, which selects the TV on demand
+    - UdpRemote:        fire-and-forget key presses over the UDP fast path
+
+Usage:
+    from remote import Remote
+
+    with Remote('127.0.0.1', 1238, on_notice=print) as tv:
+        tv.command('on')
+        futures = [tv.submit('set_ch', n) for n in range(1, 6)]   # pipelined
+        print([f.result().value for f in futures])
+        print(tv.command('get_ch'))
+
+    async with await AsyncRemote.open('127.0.0.1', 1238) as tv:
+        await tv.command('on')
+
+Commands are the server's command names ('on', 'get_ch', 'set_ch', ...);
+see binproto.OPCODES. command() returns the result (an int, or the text
+of 'help'/'version') and raises CommandError for a failed command.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import abc
+import asyncio
+import socket
+import threading
+import zlib
+from concurrent.futures import Future
+from typing import Callable, NamedTuple, Optional
+from binproto import (BINARY_MAGIC, OP_HELLO, OP_NOTICE, OPCODE_NAMES, OPCODES,
+                      PROTOCOL_VERSION, RESPONSE, ST_ALREADY, ST_OK, STATUS_NAMES,
+                      TOPIC_NAMES, TOPICS, ResponseDecoder, encode_request)
+from config import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_TV_ID
+from udp import encode_press
+
+# on_notice(tv_id, topic, value); tv_id is the TV the notice is about
+NoticeCallback = Callable[[str, str, int], None]
+
+_MAX_TAG = 0xFFFF
+_RECV_SIZE = 65536
+
+
+class Response(NamedTuple):
+    """
+    One decoded response.
+    """
+    command: str
+    status: int
+    value: int
+    text: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == ST_OK
+
+
+class CommandError(Exception):
+    """
+    A command was answered with a non-OK status.
+    """
+
+    def __init__(self, response: Response) -> None:
+        super().__init__(f'{response.command} failed: '
+                         f'{STATUS_NAMES.get(response.status, response.status)}')
+        self.response = response
+        self.status = response.status
+
+
+def _result(response: Response):
+    # command(): turn a response into its value, or raise
+    if response.status not in (ST_OK, ST_ALREADY):
+        raise CommandError(response)
+    return response.text if response.text is not None else response.value
+
+
+class _RemoteBase(abc.ABC):
+    """
+    Tag allocation and response routing shared by both flavors.
+    """
+
+    def __init__(self, on_notice: Optional[NoticeCallback]) -> None:
+        self.on_notice = on_notice
+        self.tv_id = DEFAULT_TV_ID       # confirmed by the server
+        # TV this connection will be on once earlier requests have run
+        # (None: a select failed, so it is on no TV until the next one)
+        self._target: Optional[str] = DEFAULT_TV_ID
+        self._pending: dict[int, tuple] = {}   # tag -> (future, selects sent before it)
+        self._selects = 0
+        self._failed = -1                      # number of the last select that failed
+        self._tag = 0
+        self._decoder = ResponseDecoder()
+        self._closed = False
+
+    def _frame(self, name: str, arg: int, future) -> bytes:
+        opcode = OPCODES[name]
+        if name == 'select':
+            self._selects += 1
+            self._target = str(arg)
+        for _ in range(_MAX_TAG):
+            self._tag = self._tag % _MAX_TAG + 1
+            if self._tag not in self._pending:
+                break
+        else:
+            raise RuntimeError('Too many requests in flight')
+        self._pending[self._tag] = (future, self._selects)
+        return encode_request(opcode, arg, self._tag)
+
+    def _frames(self, name: str, arg: int, tv_id: Optional[str], future) -> bytes:
+        # Prefix a select when the command targets another TV than the
+        # one this connection will be on once earlier requests have run.
+        # The server answers requests behind a failed select with
+        # ST_UNKNOWN_TV (they never run on another TV); once that select
+        # is answered, the next request selects again.
+        if self._failed == self._selects:
+            self._target = None
+        data = b''
+        if tv_id is not None and tv_id != self._target:
+            data = self._frame('select', int(tv_id), self._discard())
+        return data + self._frame(name, arg, future)
+
+    def _received(self, data: bytes) -> None:
+        for opcode, status, tag, value, payload in self._decoder.feed(data):
+            if opcode == OP_NOTICE:
+                if self.on_notice is not None:
+                    # The tag carries the TV the notice is about (0: not numeric)
+                    tv_id = str(tag) if tag else self.tv_id
+                    try:
+                        self.on_notice(tv_id, TOPIC_NAMES.get(status, str(status)), value)
+                    except Exception:
+                        pass
+                continue
+            entry = self._pending.pop(tag, None)
+            name = OPCODE_NAMES.get(opcode, str(opcode))
+            response = Response(name, status, value, payload.decode() if payload else None)
+            if name == 'select':
+                if status == ST_OK:
+                    self.tv_id = str(value)
+                elif entry is not None:
+                    self._failed = entry[1]
+            if entry is not None and not entry[0].done():
+                entry[0].set_result(response)
+
+    def _fail_all(self, exc: Exception) -> None:
+        self._closed = True
+        pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    @abc.abstractmethod
+    def _discard(self):
+        """
+        A fresh future of this flavor for a response nobody waits for.
+        """
+
+
+# ---------------------------------------------------------------------
+#  Blocking flavor
+# ---------------------------------------------------------------------
+class Remote(_RemoteBase):
+    """
+    Blocking connection to one server; safe to share between threads.
+
+    submit() never waits for the server, so any number of commands can
+    be pipelined; call() and command() wait for their own response only.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 on_notice: Optional[NoticeCallback] = None,
+                 timeout: Optional[float] = 10.0) -> None:
+        """
+        Connect and switch the connection to the binary protocol.
+
+        Args:
+            host (str): Server host.
+            port (int): Server port.
+            on_notice (callable | None): Called from the reader thread with
+                (tv_id, topic, value) for every notice; must not block.
+            timeout (float | None): Connect/handshake timeout in seconds.
+
+        Raises:
+            ConnectionError: If the server does not accept the binary protocol.
+        """
+        super().__init__(on_notice)
+        self._sock = socket.create_connection((host, port), timeout)
+        self._send_lock = threading.Lock()
+        try:
+            _handshake(self._sock.recv, self._sock.sendall)
+        except Exception:
+            self._sock.close()
+            raise
+        self._sock.settimeout(None)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def submit(self, name: str, arg: int = 0, tv_id: Optional[str] = None) -> Future:
+        """
+        Send one command without waiting for its response.
+
+        Args:
+            name (str): Command name (see binproto.OPCODES).
+            arg (int): Integer argument ('set_ch', 'select').
+            tv_id (str | None): Run it against this TV (selects it first
+                if needed; the selection sticks for later commands).
+
+        Returns:
+            Future: Resolves to the Response.
+        """
+        future = Future()
+        with self._send_lock:
+            if self._closed:
+                raise ConnectionError('Remote is closed')
+            data = self._frames(name, arg, tv_id, future)
+            self._sock.sendall(data)
+        return future
+
+    def call(self, name: str, arg: int = 0, tv_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> Response:
+        """
+        Send one command and wait for its Response.
+        """
+        return self.submit(name, arg, tv_id).result(timeout)
+
+    def command(self, name: str, arg: int = 0, tv_id: Optional[str] = None,
+                timeout: Optional[float] = None):
+        """
+        Send one command and return its result.
+
+        Raises:
+            CommandError: If the server answered with an error status.
+
+        Returns:
+            int | str: The value (channel, count, power 0/1) or the text.
+        """
+        return _result(self.call(name, arg, tv_id, timeout))
+
+    def select(self, tv_id: str) -> None:
+        """
+        Control TV 'tv_id' from this connection.
+
+        Raises:
+            CommandError: If the TV does not exist.
+        """
+        self.command('select', int(tv_id))
+
+    def ping(self) -> None:
+        """
+        Heartbeat: keeps an otherwise silent connection under the server's idle timeout.
+        """
+        self.command('ping')
+
+    def subscribe(self, topic: str) -> None:
+        """
+        Receive notices on 'topic' ('channel', 'power') for the selected TV.
+
+        Raises:
+            CommandError: If the topic is unknown.
+        """
+        self.command('subscribe', TOPICS.get(topic, -1))
+
+    def unsubscribe(self, topic: str) -> None:
+        """
+        Stop notices on 'topic'.
+
+        Raises:
+            CommandError: If the topic is unknown.
+        """
+        self.command('unsubscribe', TOPICS.get(topic, -1))
+
+    def close(self) -> None:
+        """
+        Say goodbye and close the connection (pending requests fail).
+        """
+        with self._send_lock:
+            if not self._closed:
+                try:
+                    self._sock.sendall(encode_request(OPCODES['quit']))
+                except OSError:
+                    pass
+                self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._reader.join(1.0)
+
+    def __enter__(self) -> 'Remote':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _discard(self) -> Future:
+        return Future()
+
+    def _read(self) -> None:
+        try:
+            while True:
+                data = self._sock.recv(_RECV_SIZE)
+                if not data:
+                    break
+                # Routing needs no lock: dict pop/set are atomic, and
+                # the notice callback may itself submit commands
+                self._received(data)
+        except OSError:
+            pass
+        with self._send_lock:
+            self._fail_all(ConnectionError('Connection closed'))
+
+
+def _handshake(recv: Callable[[int], bytes], send: Callable[[bytes], object]) -> None:
+    # Skip the text welcome line, then negotiate binary framing
+    line = b''
+    while not line.endswith(b'\n'):
+        chunk = recv(1)
+        if not chunk:
+            raise ConnectionError('Server closed the connection')
+        line += chunk
+    send(BINARY_MAGIC)
+    hello = b''
+    while len(hello) < RESPONSE.size:
+        chunk = recv(RESPONSE.size - len(hello))
+        if not chunk:
+            raise ConnectionError('Server closed the connection')
+        hello += chunk
+    opcode, status, _, version = RESPONSE.unpack(hello)
+    if opcode != OP_HELLO or status != ST_OK or version != PROTOCOL_VERSION:
+        raise ConnectionError('Server does not speak binary protocol '
+                              f'version {PROTOCOL_VERSION}')
+
+
+# ---------------------------------------------------------------------
+#  asyncio flavor
+# ---------------------------------------------------------------------
+class AsyncRemote(_RemoteBase):
+    """
+    asyncio connection to one server (use from a single event loop).
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 on_notice: Optional[NoticeCallback]) -> None:
+        super().__init__(on_notice)
+        self._writer = writer
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._read(reader))
+
+    @classmethod
+    async def open(cls, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                   on_notice: Optional[NoticeCallback] = None) -> 'AsyncRemote':
+        """
+        Connect and switch the connection to the binary protocol.
+
+        Raises:
+            ConnectionError: If the server does not accept the binary protocol.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            await reader.readline()
+            writer.write(BINARY_MAGIC)
+            hello = await reader.readexactly(RESPONSE.size)
+        except Exception:
+            writer.close()
+            raise
+        opcode, status, _, version = RESPONSE.unpack(hello)
+        if opcode != OP_HELLO or status != ST_OK or version != PROTOCOL_VERSION:
+            writer.close()
+            raise ConnectionError('Server does not speak binary protocol '
+                                  f'version {PROTOCOL_VERSION}')
+        return cls(reader, writer, on_notice)
+
+    def submit(self, name: str, arg: int = 0, tv_id: Optional[str] = None) -> asyncio.Future:
+        """
+        Send one command without waiting for its response.
+
+        Returns:
+            asyncio.Future: Resolves to the Response.
+        """
+        if self._closed:
+            raise ConnectionError('Remote is closed')
+        future = self._loop.create_future()
+        self._writer.write(self._frames(name, arg, tv_id, future))
+        return future
+
+    async def call(self, name: str, arg: int = 0, tv_id: Optional[str] = None) -> Response:
+        """
+        Send one command and wait for its Response.
+        """
+        future = self.submit(name, arg, tv_id)
+        await self._writer.drain()
+        return await future
+
+    async def command(self, name: str, arg: int = 0, tv_id: Optional[str] = None):
+        """
+        Send one command and return its result.
+
+        Raises:
+            CommandError: If the server answered with an error status.
+        """
+        return _result(await self.call(name, arg, tv_id))
+
+    async def select(self, tv_id: str) -> None:
+        """
+        Control TV 'tv_id' from this connection.
+
+        Raises:
+            CommandError: If the TV does not exist.
+        """
+        await self.command('select', int(tv_id))
+
+    async def ping(self) -> None:
+        """
+        Heartbeat: keeps an otherwise silent connection under the server's idle timeout.
+        """
+        await self.command('ping')
+
+    async def subscribe(self, topic: str) -> None:
+        """
+        Receive notices on 'topic' ('channel', 'power') for the selected TV.
+
+        Raises:
+            CommandError: If the topic is unknown.
+        """
+        await self.command('subscribe', TOPICS.get(topic, -1))
+
+    async def unsubscribe(self, topic: str) -> None:
+        """
+        Stop notices on 'topic'.
+
+        Raises:
+            CommandError: If the topic is unknown.
+        """
+        await self.command('unsubscribe', TOPICS.get(topic, -1))
+
+    async def close(self) -> None:
+        """
+        Say goodbye and close the connection (pending requests fail).
+        """
+        if not self._closed:
+            self._closed = True
+            self._writer.write(encode_request(OPCODES['quit']))
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
+        self._task.cancel()
+
+    async def __aenter__(self) -> 'AsyncRemote':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _discard(self) -> asyncio.Future:
+        return self._loop.create_future()
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                data = await reader.read(_RECV_SIZE)
+                if not data:
+                    break
+                self._received(data)
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._fail_all(ConnectionError('Connection closed'))
+
+
+# ---------------------------------------------------------------------
+#  Connection pools
+# ---------------------------------------------------------------------
+class _PoolBase:
+    """
+    Maps TV ids onto connections: a TV always uses the same connection,
+    so commands for one TV stay in order and selects are rare.
+    """
+
+    def __init__(self) -> None:
+        self.remotes: list = []
+        self._known: set[str] = set()
+
+    def remote_for(self, tv_id: str):
+        """
+        The connection that carries commands for 'tv_id'.
+        """
+        return self.remotes[zlib.crc32(tv_id.encode()) % len(self.remotes)]
+
+
+class RemotePool(_PoolBase):
+    """
+    N blocking connections for driving many TVs at high throughput.
+
+    An id is checked once with a synchronous select the first time it
+    is used; after that, switching TVs is pipelined with the command.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, size: int = 4,
+                 on_notice: Optional[NoticeCallback] = None) -> None:
+        super().__init__()
+        try:
+            for _ in range(size):
+                self.remotes.append(Remote(host, port, on_notice))
+        except Exception:
+            self.close()
+            raise
+
+    def submit(self, tv_id: str, name: str, arg: int = 0) -> Future:
+        """
+        Send one command for TV 'tv_id' without waiting.
+
+        Raises:
+            CommandError: If 'tv_id' does not exist (checked on first use).
+        """
+        remote = self.remote_for(tv_id)
+        if tv_id not in self._known:
+            remote.select(tv_id)
+            self._known.add(tv_id)
+        return remote.submit(name, arg, tv_id)
+
+    def command(self, tv_id: str, name: str, arg: int = 0, timeout: Optional[float] = None):
+        """
+        Send one command for TV 'tv_id' and return its result.
+        """
+        return _result(self.submit(tv_id, name, arg).result(timeout))
+
+    def close(self) -> None:
+        for remote in self.remotes:
+            remote.close()
+
+    def __enter__(self) -> 'RemotePool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class AsyncRemotePool(_PoolBase):
+    """
+    N asyncio connections for driving many TVs at high throughput.
+    """
+
+    @classmethod
+    async def open(cls, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, size: int = 4,
+                   on_notice: Optional[NoticeCallback] = None) -> 'AsyncRemotePool':
+        pool = cls()
+        try:
+            for _ in range(size):
+                pool.remotes.append(await AsyncRemote.open(host, port, on_notice))
+        except Exception:
+            await pool.close()
+            raise
+        return pool
+
+    async def submit(self, tv_id: str, name: str, arg: int = 0) -> asyncio.Future:
+        """
+        Send one command for TV 'tv_id'; returns the pending Response future.
+
+        Raises:
+            CommandError: If 'tv_id' does not exist (checked on first use).
+        """
+        remote = self.remote_for(tv_id)
+        if tv_id not in self._known:
+            await remote.select(tv_id)
+            self._known.add(tv_id)
+        return remote.submit(name, arg, tv_id)
+
+    async def command(self, tv_id: str, name: str, arg: int = 0):
+        """
+        Send one command for TV 'tv_id' and return its result.
+        """
+        return _result(await (await self.submit(tv_id, name, arg)))
+
+    async def close(self) -> None:
+        for remote in self.remotes:
+            await remote.close()
+
+    async def __aenter__(self) -> 'AsyncRemotePool':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class UdpRemote:
+    """
+    Fire-and-forget key presses over the server's UDP fast path
+    ('server.py --udp-port', see udp.py): no connection, no replies.
+
+    Presses are numbered, so the server drops any that arrive late.
+    Use a Remote (or notices) to learn the resulting state.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 tv_id: str = '') -> None:
+        """
+        Args:
+            host (str): Server host.
+            port (int): The server's UDP port.
+            tv_id (str): TV the presses are for ('' = the default TV).
+        """
+        self.tv_id = tv_id
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.connect((host, port))
+
+    def press(self, name: str, arg: int = 0) -> None:
+        """
+        Send one press ('on', 'off' or 'set_ch' with the channel as 'arg').
+
+        Raises:
+            KeyError: If the command cannot be sent over UDP.
+        """
+        with self._lock:
+            self._seq += 1
+            self._sock.send(encode_press(name, self._seq, arg, self.tv_id))
+
+    def close(self) -> None:
+        self._sock.close()
+
+    def __enter__(self) -> 'UdpRemote':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,519 @@
+"""
+Smart TV Replication
+====================
+
+Leader/follower replication of TV state, so reads scale past one node
+and followers keep answering them while the leader restarts.
+
+Roles:
+    - The leader ('server.py --replication-port PORT') serves remotes as
+      usual and accepts followers on a second port. Every change it
+      publishes is numbered in its state stream (statestream.py) and
+      shipped to each follower in seq order.
+    - A follower ('server.py --follow HOST:PORT') holds a copy of every
+      TV. Read-only commands ('status', 'get_ch', 'get_c', ...) are
+      answered from that copy; anything that may change a TV is sent to
+      the leader, which runs it and answers. Changes coming from the
+      leader are relayed to the follower's own subscribed remotes.
+
+Link (one TCP connection per follower, text lines):
+    leader -> follower
+        snapshot <seq> <n>            then n lines '<tv_id> <power> <channel>'
+        change <seq> <tv_id> <topic> <value> <own>
+        beat <t> <lag changes> <lag seconds>
+        reply <tag> <n>               then the n lines of the response
+    follower -> leader
+        write <tag> <tv_id> <command line>
+        ack <seq> <t>
+
+    - A new link starts with a snapshot of every TV at the current seq;
+      changes up to that seq are already in it and are skipped.
+    - A forwarded write is answered after the changes it made, so when
+      the follower returns the answer its copy already shows them (a
+      remote reads its own writes). 'own' marks those changes: the
+      follower's engine announces them itself, like any local change.
+    - Every REPLICATION_HEARTBEAT seconds the leader sends a beat with
+      its clock; the follower echoes it with the last seq it applied.
+      That gives the leader each follower's lag in changes and seconds,
+      which it reports in 'stats' and sends back with the next beat,
+      so the follower reports the same numbers.
+
+Bounds:
+    - The leader queues at most REPLICATION_MAX_LAG changes per follower.
+      A follower that falls further behind is dropped; it reconnects and
+      resyncs from a fresh snapshot.
+    - A follower that hears nothing for REPLICATION_TIMEOUT seconds
+      drops the link and reconnects. Cut off from its leader it keeps
+      answering reads from its last state (its reported lag keeps
+      growing) and answers writes with an error.
+
+Notes:
+    - Start followers with the same '--tvs' and '--channels' as the leader.
+    - Replication runs on its own threads with either engine; on the
+      asyncio engine, publishing and leader-side writes are handed to
+      the event loop, and a follower runs its remotes' commands off the
+      loop (see async_server.py and udp.py), so waiting for the leader
+      never stalls it.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import contextvars
+import itertools
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+import handler
+import metrics
+import statestream
+from config import REPLICATION_HEARTBEAT, REPLICATION_MAX_LAG, REPLICATION_TIMEOUT
+from handler import TEXT_LEADER_UNAVAILABLE, TEXT_UNKNOWN_TV, Session
+from protocol import CHANNEL_NOTICE_KEY, POWER_NOTICE_KEY, execute_lines, stamp
+from statestream import Change
+
+# publish(tv_id, topic, value, seq) of the engine serving remotes
+Publish = Callable[[str, str, int, int], None]
+# submit(fn, *args): run fn where the engine expects it (default: right away)
+Submit = Callable[..., None]
+
+# The follower link whose forwarded write is being run (leader side)
+_origin: contextvars.ContextVar[Optional['_Downstream']] = \
+    contextvars.ContextVar('replication_origin', default=None)
+
+
+def _call(fn: Callable[..., None], *args) -> None:
+    fn(*args)
+
+
+def parse_address(spec: str) -> tuple[str, int]:
+    """
+    Parse a 'HOST:PORT' leader address.
+
+    Raises:
+        ValueError: If it is not HOST:PORT with a numeric port.
+    """
+    host, sep, port = spec.rpartition(':')
+    if not sep or not host or not port.isdigit():
+        raise ValueError(f'Invalid leader address {spec!r} (expected HOST:PORT)')
+    return host, int(port)
+
+
+def _peer(addr) -> str:
+    return f'{addr[0]}:{addr[1]}'
+
+
+# ---------------------------------------------------------------------
+#  Leader
+# ---------------------------------------------------------------------
+class _Downstream:
+    """
+    Leader end of one follower link: an outbound line queue drained by a
+    writer thread. Pushing never blocks; past 'max_lag' queued lines the
+    follower is dropped.
+    """
+
+    def __init__(self, sock: socket.socket, max_lag: int) -> None:
+        self.sock = sock
+        self.peer = _peer(sock.getpeername())
+        self.lag = (0, 0.0)
+        self._max_lag = max_lag
+        self._queue: deque[bytes] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def push(self, line: str, first: bool = False) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._queue) >= self._max_lag:
+                metrics.replication_event('dropped')
+                print(f'Replication: dropping {self.peer} (more than {self._max_lag} behind)')
+                self.close()
+                return
+            if first:
+                self._queue.appendleft(line.encode())
+            else:
+                self._queue.append(line.encode())
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def drain(self) -> None:
+        # Writer thread body
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                data = b''.join(self._queue)
+                self._queue.clear()
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.close()
+                return
+
+
+class Leader:
+    """
+    Accepts followers on their own port and streams every change to them.
+    """
+
+    def __init__(self, host: str, port: int, publish: Publish, submit: Submit = _call,
+                 heartbeat: float = REPLICATION_HEARTBEAT,
+                 max_lag: int = REPLICATION_MAX_LAG) -> None:
+        """
+        Bind the replication port (0 picks a free one) and start serving it.
+
+        Args:
+            host (str): Address to bind.
+            port (int): Replication port.
+            publish (Publish): The engine's publish(), for forwarded writes.
+            submit (Submit): Runs forwarded writes on the engine's thread
+                (e.g. loop.call_soon_threadsafe for asyncio).
+            heartbeat (float): Seconds between beats.
+            max_lag (int): Queued lines per follower before it is dropped.
+        """
+        self._publish = publish
+        self._submit = submit
+        self._heartbeat = heartbeat
+        self._max_lag = max_lag
+        self._links: list[_Downstream] = []
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._stream = statestream.stream
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen()
+        self.address = self._sock.getsockname()
+        self._stream.watch(self._changed)
+        threading.Thread(target=self._accept, name='replication-accept', daemon=True).start()
+        threading.Thread(target=self._beat, name='replication-beat', daemon=True).start()
+
+    def followers(self) -> dict[str, tuple[int, float]]:
+        """
+        Lag of every connected follower at its last heartbeat.
+
+        Returns:
+            dict[str, tuple[int, float]]: peer -> (changes, seconds).
+        """
+        with self._lock:
+            return {link.peer: link.lag for link in self._links}
+
+    def close(self) -> None:
+        """
+        Stop accepting followers and drop the connected ones.
+        """
+        self._closing.set()
+        self._stream.unwatch(self._changed)
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        with self._lock:
+            links = list(self._links)
+        for link in links:
+            link.close()
+
+    def _changed(self, change: Change) -> None:
+        # Called by the state stream, in seq order, for every change
+        seq, tv_id, topic, value = change
+        origin = _origin.get()
+        with self._lock:
+            links = tuple(self._links)
+        for link in links:
+            link.push(f'change {seq} {tv_id} {topic} {value} {int(link is origin)}\n')
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            link = _Downstream(sock, self._max_lag)
+            # Watch first, then read the seq, then the state: every change
+            # is either in the snapshot or queued after it
+            with self._lock:
+                self._links.append(link)
+            seq = self._stream.seq
+            registry = handler.registry
+            rows = []
+            for tv_id in registry.ids():
+                snap = registry.get(tv_id).snapshot()
+                rows.append(f'{tv_id} {int(snap.is_on())} {snap.get_channel()}\n')
+            link.push(f'snapshot {seq} {len(rows)}\n{"".join(rows)}', first=True)
+            metrics.replication_event('synced')
+            print(f'Replication: follower {link.peer} synced at seq {seq}')
+            threading.Thread(target=link.drain, daemon=True).start()
+            threading.Thread(target=self._serve, args=(link,), daemon=True).start()
+
+    def _serve(self, link: _Downstream) -> None:
+        # Reader thread of one follower link
+        try:
+            with link.sock.makefile('rb') as lines:
+                for raw in lines:
+                    kind, _, rest = raw.decode(errors='replace').rstrip('\n').partition(' ')
+                    if kind == 'write':
+                        tag, tv_id, command = rest.split(' ', 2)
+                        self._submit(self._write, link, tag, tv_id, command)
+                    elif kind == 'ack':
+                        seq, sent = rest.split()
+                        link.lag = (max(0, self._stream.seq - int(seq)),
+                                    time.monotonic() - float(sent))
+                        metrics.replication_lag(link.peer, *link.lag)
+        except (OSError, ValueError):
+            pass
+        finally:
+            link.close()
+            link.sock.close()
+            with self._lock:
+                if link in self._links:
+                    self._links.remove(link)
+            metrics.replication_peer_gone(link.peer)
+            if not self._closing.is_set():
+                metrics.replication_event('lost')
+                print(f'Replication: follower {link.peer} disconnected')
+
+    def _write(self, link: _Downstream, tag: str, tv_id: str, command: str) -> None:
+        # Run a forwarded command like one from a local remote, then answer
+        token = _origin.set(link)
+        try:
+            if tv_id not in handler.registry:
+                reply = TEXT_UNKNOWN_TV.format(tv_id=tv_id)
+            else:
+                data, notices, _ = execute_lines([command.encode()], Session(tv_id))
+                for notice in notices:
+                    self._publish(*notice)
+                reply = data.decode().rstrip('\n')
+        finally:
+            _origin.reset(token)
+        lines = reply.split('\n')
+        link.push(f'reply {tag} {len(lines)}\n' + ''.join(f'{line}\n' for line in lines))
+
+    def _beat(self) -> None:
+        while not self._closing.wait(self._heartbeat):
+            with self._lock:
+                links = tuple(self._links)
+            now = time.monotonic()
+            for link in links:
+                changes, seconds = link.lag
+                link.push(f'beat {now:.6f} {changes} {seconds:.6f}\n')
+
+
+# ---------------------------------------------------------------------
+#  Follower
+# ---------------------------------------------------------------------
+class _Pending:
+    __slots__ = ('done', 'response')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.response: Optional[str] = None
+
+
+class _Upstream:
+    """
+    Follower end of the link: sends forwarded writes and acks, and
+    matches replies to the writes waiting for them by tag.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self._send_lock = threading.Lock()
+        self._tags = itertools.count(1)
+        self._pending: dict[str, _Pending] = {}
+        self._closed = False
+
+    def send(self, line: str) -> None:
+        with self._send_lock:
+            self.sock.sendall(line.encode())
+
+    def call(self, tv_id: str, command: str, timeout: float) -> Optional[str]:
+        """
+        Have the leader run 'command' on 'tv_id'.
+
+        Returns:
+            str | None: Its response, or None if the link failed or timed out.
+        """
+        tag = str(next(self._tags))
+        pending = self._pending[tag] = _Pending()
+        try:
+            if self._closed:
+                return None
+            self.send(f'write {tag} {tv_id} {command}\n')
+            pending.done.wait(timeout)
+            return pending.response
+        except OSError:
+            return None
+        finally:
+            self._pending.pop(tag, None)
+
+    def resolve(self, tag: str, response: str) -> None:
+        pending = self._pending.get(tag)
+        if pending is not None:
+            pending.response = response
+            pending.done.set()
+
+    def close(self) -> None:
+        self._closed = True
+        for pending in list(self._pending.values()):
+            pending.done.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class Follower:
+    """
+    Keeps the local TVs in step with a leader and forwards writes to it.
+
+    While running it is installed as handler.forward (see handler.use_leader).
+    """
+
+    def __init__(self, leader: tuple[str, int], publish: Publish, submit: Submit = _call,
+                 timeout: float = REPLICATION_TIMEOUT) -> None:
+        """
+        Start following (connects in the background, retrying until it can).
+
+        Args:
+            leader (tuple[str, int]): The leader's replication address.
+            publish (Publish): The engine's publish(), for relayed notices.
+            submit (Submit): Runs publish() on the engine's thread.
+            timeout (float): Leader silence before reconnecting; also the
+                longest a forwarded write waits for its answer.
+        """
+        self.leader = leader
+        self.seq: Optional[int] = None
+        self._publish = publish
+        self._submit = submit
+        self._timeout = timeout
+        self._link: Optional[_Upstream] = None
+        self._synced = threading.Event()
+        self._closing = threading.Event()
+        handler.use_leader(self.forward)
+        self._thread = threading.Thread(target=self._run, name='replication-follow', daemon=True)
+        self._thread.start()
+
+    def wait_synced(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the first snapshot from the leader is applied.
+        """
+        return self._synced.wait(timeout)
+
+    def forward(self, command: str, tv_id: str) -> str:
+        """
+        Run a command on the leader (installed as handler.forward).
+        """
+        link = self._link
+        response = link.call(tv_id, command, self._timeout) if link is not None else None
+        return TEXT_LEADER_UNAVAILABLE if response is None else response
+
+    def close(self) -> None:
+        """
+        Stop following and serve writes locally again.
+        """
+        self._closing.set()
+        handler.use_leader(None)
+        link = self._link
+        if link is not None:
+            link.close()
+        self._thread.join(self._timeout)
+
+    def _run(self) -> None:
+        peer = _peer(self.leader)
+        while not self._closing.is_set():
+            try:
+                sock = socket.create_connection(self.leader, timeout=self._timeout)
+            except OSError:
+                self._closing.wait(min(1.0, self._timeout))
+                continue
+            link = _Upstream(sock)
+            try:
+                self._follow(link, peer)
+            except (OSError, ValueError):
+                pass
+            finally:
+                self._link = None
+                self._synced.clear()
+                link.close()
+            metrics.replication_peer_gone(peer)
+            if not self._closing.is_set():
+                metrics.replication_event('lost')
+                print(f'Replication: lost leader {peer}, reconnecting')
+
+    def _follow(self, link: _Upstream, peer: str) -> None:
+        # Apply the link's snapshot, then its changes, until it breaks
+        with link.sock.makefile('rb') as stream:
+            def line() -> list[str]:
+                raw = stream.readline()
+                if not raw:
+                    raise OSError('leader closed the link')
+                return raw.decode().split()
+
+            kind, seq, count = line()
+            if kind != 'snapshot':
+                raise ValueError(f'expected a snapshot, got {kind!r}')
+            for _ in range(int(count)):
+                tv_id, power, channel = line()
+                self._apply(tv_id, POWER_NOTICE_KEY, int(power), True)
+                self._apply(tv_id, CHANNEL_NOTICE_KEY, int(channel), True)
+            self.seq = int(seq)
+            self._link = link
+            self._synced.set()
+            metrics.replication_event('synced')
+            print(f'Replication: following {peer} from seq {seq}')
+
+            while True:
+                kind, *fields = line()
+                if kind == 'change':
+                    seq, tv_id, topic, value, own = fields
+                    if int(seq) > self.seq:
+                        self._apply(tv_id, topic, int(value), own == '0')
+                        self.seq = int(seq)
+                elif kind == 'beat':
+                    sent, changes, seconds = fields
+                    link.send(f'ack {self.seq} {sent}\n')
+                    metrics.replication_lag(peer, int(changes), float(seconds))
+                elif kind == 'reply':
+                    tag, count = fields
+                    text = [stream.readline().decode().rstrip('\n') for _ in range(int(count))]
+                    link.resolve(tag, '\n'.join(text))
+
+    def _apply(self, tv_id: str, topic: str, value: int, relay: bool) -> None:
+        # Bring one TV in line with the leader; announce it if it changed
+        registry = handler.registry
+        tv = registry.ensure(tv_id)
+        with registry.lock(tv_id):
+            if topic == POWER_NOTICE_KEY:
+                changed = tv.is_on() != bool(value)
+                if changed:
+                    tv.turn_on() if value else tv.turn_off()
+            else:
+                changed = tv.get_channel() != value
+                if changed:
+                    try:
+                        tv.set_channel(value)
+                    except ValueError:
+                        print(f'Replication: channel {value} out of range on TV {tv_id} '
+                              '(start followers with the leader\'s --channels)')
+                        return
+            if not (changed and relay):
+                return
+            seq = stamp(tv_id, topic, value)
+        self._submit(self._publish, tv_id, topic, value, seq)
@@ -6,76 +6,256 @@ This server simulates a "Smart TV" that accepts simple text commands
 from a remote client over TCP sockets.
 
 Usage:
-    python3 server.py
+    python3 server.py [--engine {threads,asyncio}]
 
 Behavior:
-    - Binds to 127.0.0.1:1238 (change in code if needed)
-    - Accepts a single client connection
-    - Processes commands until the client disconnects or sends 'quit'
+    - Binds to 127.0.0.1:1238 by default (--host / --port)
+    - Serves many remotes at once, each until it disconnects or sends 'quit'
+    - Notifies remotes subscribed to a TV's topics when that TV changes
 
 Notes:
     - The server delegates command parsing/logic to 'handle_command()' in handler.py
+    - Commands are newline-framed and may be pipelined (see protocol.py);
+      machine remotes may negotiate compact binary frames (see binproto.py)
     - The server is restart-friendly via SO_REUSEADDR.
-    - Multi-client support are planned for a later part (threads?)
+    - Two engines are available: one thread per connection ('threads', default)
+      or a single event loop ('asyncio', see async_server.py).
+    - '--workers N' runs N processes on the same port (see cluster.py).
+    - '--journal DIR' keeps TV state across restarts (see journal.py).
+    - '--replication-port' / '--follow' replicate TV state to other
+      server processes (see replication.py).
 
 Author: dotDennis
 Course: IDATA2304
 """
 
+import argparse
 import socket
 import threading
+from time import perf_counter
 from typing import Optional, Tuple
-from config import DEFAULT_HOST, DEFAULT_PORT
-from handler import handle_command
+import binproto
+import cluster
+import metrics
+import outbox
+import profiling
+import ratelimit
+import replication
+import udp
+import handler
+import journal
+import lifecycle
+from config import (DEFAULT_HOST, DEFAULT_PORT, SERVER_ENGINE, RECV_BUFFER_SIZE, TV_COUNT,
+                    JOURNAL_COMMIT_INTERVAL, JOURNAL_SNAPSHOT_EVERY)
+from logic.catalog import ChannelCatalog
+from metrics import CLIENTS_LOCK, locked
+from outbox import OVERFLOW_POLICIES, OutboundQueue
+from protocol import (TEXT_IDLE_TIMEOUT, TEXT_SERVER_FULL, TEXT_WELCOME, WireSession, format_notice,
+                      stamp)
+from subscriptions import SubscriberIndex
+
+ENGINES = ('threads', 'asyncio')
+
+# Scatter/gather sends: platform support, and the most buffers per call
+_SCATTER_GATHER = hasattr(socket.socket, 'sendmsg')
+_IOV_MAX = 1024
 
 # ---------------------------------------------------------------------
-#  Connected clients registry (thread-safe)
+#  Per-client connection with its own outbound writer
 # ---------------------------------------------------------------------
-_clients: set[socket.socket] = set()
+def send_chunks(sock: socket.socket, chunks: list[bytes]) -> None:
+    """
+    Send every chunk, in order, with as few system calls as possible.
+
+    Uses scatter/gather sendmsg() where available, so queued replies and
+    notices go out without first being copied into one buffer; a partial
+    send resumes mid-chunk. Falls back to one sendall() elsewhere.
+    """
+    if not _SCATTER_GATHER:
+        sock.sendall(b''.join(chunks))
+        return
+    views = [memoryview(c) for c in chunks]
+    while views:
+        sent = sock.sendmsg(views[:_IOV_MAX])
+        # Drop what went out completely, trim the chunk cut in the middle
+        i = 0
+        while i < len(views) and sent >= len(views[i]):
+            sent -= len(views[i])
+            i += 1
+        del views[:i]
+        if sent:
+            views[0] = views[0][sent:]
+
+
+class Connection:
+    """
+    A connected remote: its socket, its protocol state (WireSession) and
+    a bounded outbound queue that a dedicated writer thread drains.
+
+    - send() queues a direct reply; the caller waits while the queue is
+      full, so a remote that stops reading only slows itself down.
+    - notify() queues a notice without ever blocking; overflow is handled
+      by the queue's policy (see outbox.py).
+    """
+
+    def __init__(self, sock: socket.socket, addr: Tuple[str, int]) -> None:
+        self.sock = sock
+        self.addr = addr
+        self.wire = WireSession()
+        self._queue = OutboundQueue()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._writer = threading.Thread(target=self._drain, daemon=True)
+        self._writer.start()
+
+    def send(self, data: bytes) -> bool:
+        """
+        Queue a direct reply for this client.
+
+        Returns:
+            bool: False if the connection is already closed.
+        """
+        with self._cond:
+            while len(self._queue) >= self._queue.limit and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return False
+            self._queue.push_reply(data)
+            self._cond.notify_all()
+            return True
+
+    def notify(self, data: bytes, key: Optional[str] = None) -> None:
+        """
+        Queue a notice for this client (O(1), never blocks).
+        """
+        with self._cond:
+            if self._closed:
+                return
+            if not self._queue.push_notice(data, key):
+                self._abort()
+                return
+            self._cond.notify_all()
+
+    def close(self, timeout: float = 1.0) -> None:
+        """
+        Flush what is already queued, then close the socket.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if threading.current_thread() is not self._writer:
+            self._writer.join(timeout)
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+    def _abort(self) -> None:
+        # Caller holds self._cond: drop the backlog and wake the reader
+        self._closed = True
+        self._queue.clear()
+        self._cond.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+
+    def _drain(self) -> None:
+        queue = self._queue
+        while True:
+            with self._cond:
+                # Sleep until something is queued or a held notice is due
+                while not self._closed and not queue.due():
+                    self._cond.wait(queue.wait_time())
+                chunks = queue.pop_chunks()
+                if not chunks:
+                    return
+                self._cond.notify_all()
+            try:
+                send_chunks(self.sock, chunks)
+            except Exception:
+                with self._cond:
+                    self._abort()
+                return
+
+
+# ---------------------------------------------------------------------
+#  Connected clients (thread-safe), indexed by (attached TV id, topic)
+# ---------------------------------------------------------------------
+_clients: SubscriberIndex[Connection] = SubscriberIndex()
 _clients_lock = threading.RLock()
 
 
-def _register_client(conn: socket.socket) -> None:
-    with _clients_lock:
-        _clients.add(conn)
+def _register_client(conn: Connection) -> None:
+    # (Re-)attach to the session's TV and topics
+    session = conn.wire.session
+    with locked(_clients_lock, CLIENTS_LOCK):
+        _clients.attach(conn, session.tv_id, session.topics)
 
 
-def _unregister_client(conn: socket.socket) -> None:
-    with _clients_lock:
-        if conn in _clients:
-            _clients.remove(conn)
+def _unregister_client(conn: Connection) -> None:
+    with locked(_clients_lock, CLIENTS_LOCK):
+        _clients.detach(conn)
 
 
-def broadcast(message: str, exclude: Optional[socket.socket] = None) -> None:
+def publish(tv_id: str, topic: str, value: int, seq: Optional[int] = None,
+            exclude: Optional[Connection] = None) -> None:
     """
-    Send a message to all connected clients except 'exclude'.
+    Queue a state-change notice for every remote subscribed to 'topic'
+    on 'tv_id' (found through the subscriber index, so uninterested
+    remotes are never touched).
+
+    A change made here was already numbered in the state stream while
+    its TV was locked (see protocol.stamp()) and comes with its 'seq';
+    one without (relayed from another worker) is numbered on arrival.
+    The notice is encoded once per form (binary, text, text with the
+    stream seq for remotes that resumed); each remote gets its form,
+    with the topic as its coalescing key.
     """
-    dead: list[socket.socket] = []
-    with _clients_lock:
-        for c in list(_clients):
-            if exclude is not None and c is exclude:
-                continue
-            try:
-                c.sendall(message.encode())
-            except Exception:
-                dead.append(c)
-        for d in dead:
-            try:
-                _clients.remove(d)
-                d.close()
-            except Exception:
-                pass
-
-
-def create_socket() -> socket.socket:
+    timed = metrics.enabled
+    if timed:
+        start = perf_counter()
+    if seq is None:
+        seq = stamp(tv_id, topic, value)
+    text = format_notice(topic, value).encode()
+    frame = binproto.encode_notice(topic, value, tv_id)
+    streamed = None
+    sent = 0
+    with locked(_clients_lock, CLIENTS_LOCK):
+        targets = _clients.subscribers(tv_id, topic)
+    for c in targets:
+        if c is exclude:
+            continue
+        if c.wire.binary:
+            data = frame
+        elif c.wire.session.stream:
+            if streamed is None:
+                streamed = format_notice(topic, value, seq).encode()
+            data = streamed
+        else:
+            data = text
+        c.notify(data, topic)
+        sent += 1
+    if timed:
+        metrics.observe_broadcast(perf_counter() - start, sent)
+
+
+def create_socket(reuse_port: bool = False) -> socket.socket:
     """
     Create a TCP/IP socket with IPv4 addressing.
 
+    Args:
+        reuse_port (bool): Also set SO_REUSEPORT, so several worker
+            processes can bind the same port and the kernel spreads
+            incoming connections across them.
+
     Returns:
         socket.socket: A TCP socket with SO_REUSEADDR set for restart-friendly behavior.
     """
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR,1)
+    if reuse_port:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     return s
 
 
@@ -105,7 +285,7 @@ def listen_for_connection(sock: socket.socket) -> None:
         None
 
     """
-    sock.listen()
+    sock.listen(lifecycle.listen_backlog)
     print(f'Server listening on {sock.getsockname()}')
 
 
@@ -124,21 +304,26 @@ def accept_connection(sock: socket.socket) -> tuple[socket.socket, tuple [str, i
     return sock.accept()
 
 
-def receive_command(conn) -> str | None:
+def receive_data(conn: socket.socket) -> bytes | None:
     """
-    Receive a command from the connected client.
+    Receive the next chunk of bytes from the connected client.
 
     Args:
         conn (socket.socket): Active client connection.
 
     Returns:
-        str | None: The decoded command string, or None if client closed.
+        bytes | None: The received bytes, or None if client closed.
+
+    Raises:
+        TimeoutError: If the socket's idle timeout expired.
     """
     try:
-        data = conn.recv(1024)
+        data = conn.recv(RECV_BUFFER_SIZE)
         if not data:
             return None
-        return data.decode(errors='replace').strip()
+        return data
+    except TimeoutError:
+        raise
     except Exception as e:
         print(f'Server Error: {e!r}')
         return None
@@ -158,81 +343,110 @@ def close_socket(sock: socket.socket) -> None:
     print('Server closed')
 
 
-def handle_client(conn: socket.socket, addr: Tuple[str, int]) -> None:
+def handle_client(sock: socket.socket, addr: Tuple[str, int]) -> None:
     """
     Per-connection handler running in its own thread.
-    Receives commands, sends responses, and triggers broadcasts on channel changes.
+    Receives commands, queues responses, and publishes notices on state changes.
+    A remote that stays silent for the idle timeout is told so and dropped.
     """
+    sock.settimeout(lifecycle.timeout())
+    conn = Connection(sock, addr)
+    session = conn.wire.session
+    _register_client(conn)
+    metrics.client_connected()
     try:
         print(f'Server connection established with {addr}')
-        conn.sendall(b"Welcome to the Smart TV server. Type 'ON' to begin.\n")
+        conn.send(TEXT_WELCOME)
         while True:
-            command = receive_command(conn)
-            if command is None:
+            data = receive_data(sock)
+            if data is None:
                 break
-            if command.lower() == 'quit':
-                conn.sendall(b'Until next time!\n')
-                break
-
-            response = handle_command(command)
-            if not isinstance(response, str):
-                response = 'ERROR: Internal handler bug (no response)'
 
-            # Send direct response to the requesting client
-            try:
-                conn.sendall(response.encode())
-            except Exception:
+            # Run every pipelined command in order, reply with a single send
+            attached, topics = session.tv_id, session.topics
+            reply, notices, done = conn.wire.receive(data)
+            if session.tv_id != attached or session.topics is not topics:
+                _register_client(conn)
+            if reply and not conn.send(reply):
                 break
 
-            # If the channel changed successfully, notify other clients asynchronously
-            # We infer success by the handler's success message format.
-            if command.lower().startswith('set_ch') and response.startswith('Channel set to '):
-                try:
-                    new_ch = response.split('Channel set to ', 1)[1]
-                    notice = f"[Notice] Channel changed to {new_ch}\n"
-                    broadcast(notice, exclude=conn)
-                except Exception:
-                    # Best-effort only; ignore formatting errors
-                    pass
+            # Notify clients subscribed to the changed topic on that TV
+            for tv_id, topic, value, seq in notices:
+                publish(tv_id, topic, value, seq, exclude=conn)
+                cluster.forward(tv_id, topic, value)
+            if done:
+                break
+    except TimeoutError:
+        metrics.connection_dropped('idle')
+        conn.send(TEXT_IDLE_TIMEOUT)
     except Exception as e:
         print(f'Client handler error for {addr}: {e!r}')
     finally:
         try:
             _unregister_client(conn)
+            metrics.client_disconnected()
+            # A trace follows this remote's thread: end it with the remote
+            path = profiling.release(session)
+            if path is not None:
+                print(f'Profile started by {addr} written to {path}')
         finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
+            conn.close()
+
+
+def _serve_admitted(sock: socket.socket, addr: Tuple[str, int]) -> None:
+    # Thread body for a remote that holds a connection slot
+    try:
+        handle_client(sock, addr)
+    finally:
+        lifecycle.release()
 
 
-def main() -> None:
+def reject(sock: socket.socket) -> None:
     """
-    Main entry point of the Smart TV server.
+    Turn away a remote because the server is full (never blocks the accept loop).
+    """
+    metrics.connection_dropped('rejected')
+    try:
+        sock.setblocking(False)
+        sock.send(TEXT_SERVER_FULL)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+def serve_threads(host: str, port: int, reuse_port: bool = False) -> None:
+    """
+    Run the thread-per-connection engine until interrupted.
 
     Behavior:
         - Creates a socket
-        - Binds to host/port (from config.py)
-        - Accepts a single client connection
-        - Receives and processes commands until the client disconnects or sends 'quit'
-        - Delegates command handling/parsing to handle_command() (from handle_command.py)
+        - Binds to host/port
+        - Accepts remotes (up to the connection limit), each served by its own thread
+          until it disconnects or sends 'quit'
+        - Delegates command handling/parsing to protocol.py and handler.py
         - Ensures proper closing of sockets on shutdown
 
+    Args:
+        host (str): The hostname or IP address to bind.
+        port (int): The port number to bind.
+        reuse_port (bool): Share the port with other workers (SO_REUSEPORT).
+
     Returns:
         None
     """
-    host = DEFAULT_HOST
-    port = DEFAULT_PORT
-    server_socket = create_socket()
+    server_socket = create_socket(reuse_port)
 
     try:
         bind_socket(server_socket, host, port)
         listen_for_connection(server_socket)
-        # Main accept loop: serve multiple clients concurrently
+        # Main accept loop: serve multiple clients concurrently, up to the limit
         while True:
             conn, addr = accept_connection(server_socket)
-            _register_client(conn)
-            t = threading.Thread(target=handle_client, args=(conn, addr), daemon=True)
+            if not lifecycle.admit():
+                reject(conn)
+                continue
+            t = threading.Thread(target=_serve_admitted, args=(conn, addr), daemon=True)
             t.start()
 
     except Exception as e:
@@ -245,5 +459,162 @@ def main() -> None:
             print(f'Error closing server socket: {e!r}')
 
 
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """
+    Parse the server command line.
+
+    Args:
+        argv (list[str] | None): Arguments to parse (defaults to sys.argv).
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description='Smart TV server')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--engine', choices=ENGINES, default=SERVER_ENGINE,
+                        help='connection engine (default: %(default)s)')
+    parser.add_argument('--queue-limit', type=int, default=outbox.queue_limit,
+                        help='max queued notices per client (default: %(default)s)')
+    parser.add_argument('--overflow', choices=OVERFLOW_POLICIES, default=outbox.overflow_policy,
+                        help='what to do when a client falls behind (default: %(default)s)')
+    parser.add_argument('--notice-window', type=float, default=outbox.notice_window,
+                        metavar='SECONDS',
+                        help='deliver at most one notice per topic per client in this '
+                             'window, latest wins (default: %(default)s = off)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes sharing the port via SO_REUSEPORT, with TV '
+                             'state in shared memory (default: %(default)s)')
+    parser.add_argument('--tvs', type=int, default=TV_COUNT,
+                        help="number of TVs served, with ids '1'..N (default: %(default)s)")
+    parser.add_argument('--no-metrics', dest='metrics', action='store_false',
+                        default=metrics.enabled,
+                        help="disable the built-in metrics ('stats' reports them)")
+    parser.add_argument('--idle-timeout', type=float, default=lifecycle.idle_timeout,
+                        metavar='SECONDS',
+                        help="drop remotes silent for this long; 'ping' keeps them alive "
+                             '(default: %(default)s, 0 = never)')
+    parser.add_argument('--max-connections', type=int, default=lifecycle.max_connections,
+                        help='concurrent remotes; more are rejected with a message '
+                             '(default: %(default)s, 0 = unlimited)')
+    parser.add_argument('--backlog', type=int, default=lifecycle.listen_backlog,
+                        help='listen backlog (default: %(default)s)')
+    parser.add_argument('--rate', action='append', default=[], metavar='CLASS=RATE[/BURST]',
+                        help='per-client token bucket for a command class (read, write, '
+                             'broadcast), e.g. broadcast=20/40; repeatable (default: off)')
+    parser.add_argument('--latency-target', type=float, default=ratelimit.latency_target,
+                        metavar='SECONDS',
+                        help='shed on/off/set_ch while they take longer than this '
+                             '(default: %(default)s = off)')
+    parser.add_argument('--channels', metavar='FILE',
+                        help="channel catalog, one name per line (enables 'find', "
+                             "'list' and 'set_ch_name')")
+    parser.add_argument('--journal', metavar='DIR',
+                        help='keep TV state across restarts in a write-ahead journal in DIR')
+    parser.add_argument('--journal-interval', type=float, default=JOURNAL_COMMIT_INTERVAL,
+                        metavar='SECONDS',
+                        help='group-commit window; 0 fsyncs every change (default: %(default)s)')
+    parser.add_argument('--snapshot-every', type=int, default=JOURNAL_SNAPSHOT_EVERY,
+                        metavar='RECORDS',
+                        help='journal records between snapshots (default: %(default)s)')
+    parser.add_argument('--udp-port', type=int, metavar='PORT',
+                        help='also take fire-and-forget key presses (on, off, set_ch) over UDP')
+    parser.add_argument('--replication-port', type=int, metavar='PORT',
+                        help='lead replication: stream state changes to followers on PORT')
+    parser.add_argument('--follow', metavar='HOST:PORT',
+                        help="follow the leader at HOST:PORT (its --replication-port): answer "
+                             "reads locally, forward changes to it")
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help="enable the 'profile' admin command, writing profiles to DIR")
+    parser.add_argument('--profile-interval', type=float, default=profiling.sample_interval,
+                        metavar='SECONDS',
+                        help='seconds between stack samples when profiling (default: %(default)s)')
+    args = parser.parse_args(argv)
+    if args.journal and args.workers > 1:
+        parser.error('--journal is not supported with --workers')
+    if args.channels and args.workers > 1:
+        parser.error('--channels is not supported with --workers')
+    if args.udp_port is not None and args.workers > 1:
+        parser.error('--udp-port is not supported with --workers')
+    if (args.replication_port is not None or args.follow) and args.workers > 1:
+        parser.error('replication is not supported with --workers')
+    if args.follow and args.replication_port is not None:
+        parser.error('--follow and --replication-port cannot be combined')
+    if args.follow and args.journal:
+        parser.error('--journal is not supported with --follow (the leader keeps the state)')
+    # Applied here so a bad --rate or interval is reported as a usage error
+    try:
+        args.rate = dict(ratelimit.parse_limit(spec) for spec in args.rate)
+        ratelimit.configure(limits=args.rate, target=args.latency_target)
+        profiling.configure(directory=args.profile_dir, interval=args.profile_interval)
+        if args.follow:
+            args.follow = replication.parse_address(args.follow)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main entry point of the Smart TV server.
+
+    Selects the connection engine at startup:
+        - 'threads': one daemon thread per accepted connection.
+        - 'asyncio': a single event loop built on asyncio.start_server.
+    With --workers N, N processes run that engine side by side (see cluster.py).
+
+    Returns:
+        None
+    """
+    args = parse_args(argv)
+    outbox.configure(limit=args.queue_limit, policy=args.overflow, window=args.notice_window)
+    metrics.configure(enable=args.metrics)
+    lifecycle.configure(idle=args.idle_timeout, max_conns=args.max_connections,
+                        backlog=args.backlog)
+    if args.workers > 1:
+        cluster.serve_workers(args)
+        return
+    for n in range(1, args.tvs + 1):
+        handler.registry.ensure(str(n))
+    if args.channels:
+        catalog = ChannelCatalog.load(args.channels)
+        handler.use_catalog(catalog)
+        print(f'Loaded {len(catalog)} channels from {args.channels}')
+    state = None
+    if args.journal:
+        state = journal.Journal(args.journal, args.journal_interval, args.snapshot_every)
+        replayed = state.recover(handler.registry)
+        state.install(handler.registry)
+        handler.use_registry(handler.registry)
+        print(f'Restored TV state from {args.journal} ({replayed} journal records replayed)')
+    presses = leader = follower = None
+    try:
+        if args.engine == 'asyncio':
+            # Imported lazily: async_server imports helpers from this module
+            import async_server
+            async_server.main(args.host, args.port, args.udp_port,
+                              args.replication_port, args.follow)
+        else:
+            if args.udp_port is not None:
+                presses = udp.Listener(args.host, args.udp_port, publish)
+                print(f'UDP key presses on {presses.address}')
+            if args.replication_port is not None:
+                leader = replication.Leader(args.host, args.replication_port, publish)
+                print(f'Replication leader on {leader.address}')
+            if args.follow:
+                follower = replication.Follower(args.follow, publish)
+            serve_threads(args.host, args.port)
+    finally:
+        # Stop every source of changes before the journal is closed
+        if presses is not None:
+            presses.close()
+        if leader is not None:
+            leader.close()
+        if follower is not None:
+            follower.close()
+        if state is not None:
+            state.close()
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,116 @@
+"""
+Smart TV State Stream
+=====================
+
+Sequence-numbered record of every state change, so a reconnecting
+remote can catch up with one 'resume <seq>' instead of polling.
+
+    - Every change gets the next sequence number while its TV is still
+      locked (see protocol.stamp()), so seqs follow the order changes
+      were made in; notices to remotes that resumed carry it, so they
+      always know the last seq they have seen.
+    - The most recent 'size' changes are kept in a ring. since(seq)
+      returns the changes after 'seq' while the ring still reaches
+      back that far, and None once it has moved past (the remote then
+      gets a full snapshot instead).
+    - Each process numbers its stream from a random starting point, so
+      a seq from another process (before a restart, or another
+      --workers process) is almost surely outside the ring and is
+      answered with a snapshot rather than with someone else's deltas.
+
+A replication leader (see replication.py) watch()es the stream and
+ships every change to its followers in seq order.
+
+Changes carry absolute values (new channel, new power state), so
+applying one twice is harmless; a remote may see a change both in its
+resume reply and as a notice.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import random
+import threading
+from collections import deque
+from itertools import islice
+from typing import Callable, Iterable, Optional
+from config import STATE_STREAM_SIZE
+
+# One recorded change: (seq, tv_id, topic, value)
+Change = tuple[int, str, str, int]
+
+
+class StateStream:
+    """
+    Thread-safe change counter plus a bounded ring of the latest changes.
+    """
+
+    def __init__(self, size: int = STATE_STREAM_SIZE, start: Optional[int] = None) -> None:
+        """
+        Args:
+            size (int): Changes kept for resume.
+            start (int | None): Seq before the first change (default: random).
+        """
+        self.seq = random.randrange(1 << 52) if start is None else start
+        self._ring: deque[Change] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._watchers: tuple[Callable[[Change], None], ...] = ()
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def record(self, tv_id: str, topic: str, value: int) -> int:
+        """
+        Append a change.
+
+        Returns:
+            int: Its sequence number.
+        """
+        with self._lock:
+            self.seq += 1
+            change = (self.seq, tv_id, topic, value)
+            self._ring.append(change)
+            for watcher in self._watchers:
+                watcher(change)
+            return self.seq
+
+    def watch(self, callback: Callable[[Change], None]) -> None:
+        """
+        Call 'callback(change)' for every change from now on, in seq order.
+
+        It runs with the stream's lock held, so it must not block.
+        """
+        with self._lock:
+            self._watchers += (callback,)
+
+    def unwatch(self, callback: Callable[[Change], None]) -> None:
+        with self._lock:
+            self._watchers = tuple(w for w in self._watchers if w != callback)
+
+    def since(self, seq: int, tv_id: Optional[str] = None,
+              topics: Optional[Iterable[str]] = None) -> Optional[list[Change]]:
+        """
+        The changes after 'seq', newest value per (TV, topic) only, in seq order.
+
+        Args:
+            seq (int): Last seq the remote has seen.
+            tv_id (str | None): Only changes to this TV (None = all TVs).
+            topics (Iterable[str] | None): Only these topics (None = all).
+
+        Returns:
+            list[Change] | None: The changes, or None if the ring no longer
+            reaches back to 'seq' (or 'seq' is not from this stream).
+        """
+        with self._lock:
+            first = self._ring[0][0] if self._ring else self.seq + 1
+            if not (first - 1 <= seq <= self.seq):
+                return None
+            missed = list(islice(self._ring, seq - first + 1, None))
+        latest: dict[tuple[str, str], Change] = {}
+        for change in missed:
+            if (tv_id is None or change[1] == tv_id) and (topics is None or change[2] in topics):
+                latest[change[1], change[2]] = change
+        return sorted(latest.values())
+
+
+stream = StateStream()
@@ -0,0 +1,79 @@
+"""
+Smart TV Subscriber Index
+=========================
+
+Maps (tv_id, topic) to the connections that want those notices, so
+publishing a change touches only interested remotes instead of every
+socket on the server.
+
+A connection is attached to one TV (its 'select'ed TV) with a set of
+topics (its 'subscribe'd topics); re-attaching moves it between keys.
+The index itself does no locking: the threaded engine guards it with
+its clients lock, the asyncio engine only touches it from the loop.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+from typing import Generic, Hashable, Iterable, Optional, TypeVar
+
+C = TypeVar('C', bound=Hashable)
+
+_EMPTY: tuple = ()
+
+
+class SubscriberIndex(Generic[C]):
+    """
+    Connections by (tv_id, topic), plus each connection's current attachment.
+    """
+
+    def __init__(self) -> None:
+        self._index: dict[tuple[str, str], set[C]] = {}
+        self._attached: dict[C, tuple[str, frozenset[str]]] = {}
+
+    def attach(self, conn: C, tv_id: str, topics: Iterable[str]) -> None:
+        """
+        Subscribe 'conn' to 'topics' on 'tv_id', replacing any earlier attachment.
+        """
+        self.detach(conn)
+        topics = frozenset(topics)
+        self._attached[conn] = (tv_id, topics)
+        for topic in topics:
+            self._index.setdefault((tv_id, topic), set()).add(conn)
+
+    def detach(self, conn: C) -> None:
+        """
+        Remove 'conn' from every key (no-op if it is not attached).
+        """
+        entry = self._attached.pop(conn, None)
+        if entry is None:
+            return
+        tv_id, topics = entry
+        for topic in topics:
+            key = (tv_id, topic)
+            members = self._index.get(key)
+            if members is not None:
+                members.discard(conn)
+                if not members:
+                    del self._index[key]
+
+    def subscribers(self, tv_id: str, topic: str) -> tuple[C, ...]:
+        """
+        Connections subscribed to 'topic' on 'tv_id' (a snapshot).
+        """
+        members = self._index.get((tv_id, topic))
+        return tuple(members) if members else _EMPTY
+
+    def attached(self, tv_id: Optional[str] = None) -> tuple[C, ...]:
+        """
+        Connections attached to 'tv_id' whatever their topics (every one if None).
+        """
+        if tv_id is None:
+            return tuple(self._attached)
+        return tuple(c for c, (t, _) in self._attached.items() if t == tv_id)
+
+    def __len__(self) -> int:
+        return len(self._attached)
+
+    def __contains__(self, conn: object) -> bool:
+        return conn in self._attached
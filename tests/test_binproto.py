@@ -0,0 +1,129 @@
+"""
+Unit tests for the binary protocol (binproto)
+=============================================
+
+These tests check frame decoding, negotiation from the first byte,
+status codes/values without string parsing, and that binary and text
+remotes share one port and see each other's notices.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import pytest
+import handler
+import async_server
+import binproto as bp
+from logic.registry import TVRegistry
+from protocol import WireSession
+
+
+@pytest.fixture(autouse=True)
+def fresh_tvs(monkeypatch):
+    """Give every test its own two TVs so state does not leak between tests."""
+    registry = TVRegistry()
+    registry.add('1')
+    registry.add('2')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+
+
+def _responses(reply):
+    return list(bp.RESPONSE.iter_unpack(reply))
+
+
+def test_frame_decoder_reassembles_partial_frames():
+    """Requests split across reads are only returned once complete."""
+    dec = bp.FrameDecoder()
+    frame = bp.encode_request(bp.OPCODES['set_ch'], 3, tag=7)
+    assert dec.feed(frame[:3]) == []
+    assert dec.feed(frame[3:] + frame[:1]) == [(bp.OPCODES['set_ch'], 7, 3)]
+
+
+def test_negotiation_and_status_codes():
+    """The magic byte switches the session to binary; results come back as codes."""
+    wire = WireSession()
+    op = bp.OPCODES
+    reply, notices, done = wire.receive(
+        bp.BINARY_MAGIC
+        + bp.encode_request(op['get_ch'], tag=1)
+        + bp.encode_request(op['on'], tag=2)
+        + bp.encode_request(op['on'], tag=3)
+        + bp.encode_request(op['set_ch'], 5, tag=4)
+        + bp.encode_request(op['set_ch'], 42, tag=5)
+        + bp.encode_request(op['get_c'], tag=6)
+        + bp.encode_request(0x7F, tag=7)
+    )
+    assert wire.binary and not done
+    assert _responses(reply) == [
+        (bp.OP_HELLO, bp.ST_OK, 0, bp.PROTOCOL_VERSION),
+        (op['get_ch'], bp.ST_TV_OFF, 1, 0),
+        (op['on'], bp.ST_OK, 2, 1),
+        (op['on'], bp.ST_ALREADY, 3, 1),
+        (op['set_ch'], bp.ST_OK, 4, 5),
+        (op['set_ch'], bp.ST_OUT_OF_RANGE, 5, 5),
+        (op['get_c'], bp.ST_OK, 6, 10),
+        (0x7F, bp.ST_UNKNOWN_COMMAND, 7, 0),
+    ]
+    assert [n[:3] for n in notices] == [('1', 'power', 1), ('1', 'channel', 5)]
+
+
+def test_text_results_carry_a_payload():
+    """'version' answers with the payload length followed by the text."""
+    wire = WireSession()
+    wire.receive(bp.BINARY_MAGIC + bp.encode_request(bp.OPCODES['on']))
+    reply, _, _ = wire.receive(bp.encode_request(bp.OPCODES['version'], tag=9))
+    opcode, status, tag, length = bp.RESPONSE.unpack_from(reply)
+    assert (opcode, status, tag) == (bp.OPCODES['version'], bp.ST_OK, 9)
+    assert reply[bp.RESPONSE.size:] == handler.cmd_version(None, ()).encode()
+    assert length == len(reply) - bp.RESPONSE.size
+
+
+def test_binary_and_text_remotes_share_the_port():
+    """A binary set_ch reaches text remotes as text and binary remotes as frames."""
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            conns = []
+            for _ in range(3):
+                r, w = await asyncio.open_connection('127.0.0.1', port)
+                assert b'Welcome' in await r.readline()
+                conns.append((r, w))
+            (rb, wb), (rb2, wb2), (rt, wt) = conns
+            for w in (wb, wb2):
+                w.write(bp.BINARY_MAGIC)
+            for r in (rb, rb2):
+                assert bp.RESPONSE.unpack(await r.readexactly(8))[0] == bp.OP_HELLO
+            wb.write(bp.encode_request(bp.OPCODES['on'], tag=1)
+                     + bp.encode_request(bp.OPCODES['set_ch'], 8, tag=2))
+            assert bp.RESPONSE.unpack(await rb.readexactly(8))[1] == bp.ST_OK
+            assert bp.RESPONSE.unpack(await rb.readexactly(8)) == (bp.OPCODES['set_ch'], bp.ST_OK, 2, 8)
+            assert await asyncio.wait_for(rt.readline(), 2) == b'[Notice] Channel changed to 8\n'
+            notice = bp.RESPONSE.unpack(await asyncio.wait_for(rb2.readexactly(8), 2))
+            assert notice == (bp.OP_NOTICE, bp.TOPICS['channel'], 1, 8)
+            for _, w in conns:
+                w.close()
+
+    asyncio.run(scenario())
+
+
+def test_subscribe_takes_a_topic_code():
+    """subscribe/unsubscribe carry the topic code; on/off produce power notices."""
+    wire = WireSession()
+    op = bp.OPCODES
+    reply, notices, _ = wire.receive(
+        bp.BINARY_MAGIC
+        + bp.encode_request(op['subscribe'], bp.TOPICS['power'], tag=1)
+        + bp.encode_request(op['unsubscribe'], 99, tag=2)
+        + bp.encode_request(op['on'], tag=3)
+    )
+    assert _responses(reply)[1:] == [
+        (op['subscribe'], bp.ST_OK, 1, bp.TOPICS['power']),
+        (op['unsubscribe'], bp.ST_BAD_ARGS, 2, 99),
+        (op['on'], bp.ST_OK, 3, 1),
+    ]
+    assert wire.session.topics == {'channel', 'power'}
+    assert [n[:3] for n in notices] == [('1', 'power', 1)]
@@ -0,0 +1,115 @@
+"""
+Unit tests for logic.catalog.ChannelCatalog
+===========================================
+
+These tests check loading, name/prefix lookups and paging of the
+channel catalog, and the 'find', 'list' and 'set_ch_name' commands.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import pytest
+import handler
+from handler import handle_command
+from logic.catalog import ChannelCatalog
+from logic.registry import TVRegistry
+from logic.tv import SmartTV
+
+LINEUP = [('NRK1', 'News'), ('NRK2', ''), ('TV 2', 'Sport'), ('BBC One', ''),
+          ('bbc two', ''), ('BBC One', 'HD'), ('Discovery', 'Docs')]
+
+
+@pytest.fixture
+def catalog():
+    return ChannelCatalog(LINEUP)
+
+
+@pytest.fixture
+def tv(monkeypatch, catalog):
+    """Serve one TV carrying the sample catalog, switched ON."""
+    registry = TVRegistry()
+    registry.add('1', SmartTV(catalog))
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+    handle_command('on')
+    return registry.get('1')
+
+
+def test_lookup_is_case_insensitive_and_prefers_lowest_number(catalog):
+    assert len(catalog) == 7
+    assert catalog.name(3) == 'TV 2' and catalog.metadata(3) == 'Sport'
+    assert catalog.lookup('bbc one') == 4
+    assert catalog.lookup('BBC TWO') == 5
+    assert catalog.lookup('BBC') is None
+    with pytest.raises(IndexError):
+        catalog.name(8)
+
+
+def test_find_and_page(catalog):
+    assert catalog.count_prefix('bbc') == 3
+    assert catalog.find('Bbc', 2) == [(4, 'BBC One', ''), (6, 'BBC One', 'HD')]
+    assert [n for n, _, _ in catalog.find('nrk', 10)] == [1, 2]
+    assert catalog.count_prefix('zz') == 0 and catalog.find('zz', 5) == []
+    assert catalog.count_prefix('') == 7
+    assert catalog.page(6, 5) == [(6, 'BBC One', 'HD'), (7, 'Discovery', 'Docs')]
+
+
+def test_load_skips_comments_and_reads_metadata(tmp_path):
+    path = tmp_path / 'lineup.txt'
+    path.write_text('# lineup\nNRK1\tNews\n\nØstlandet\n', encoding='utf-8')
+    catalog = ChannelCatalog.load(str(path))
+    assert len(catalog) == 2
+    assert catalog.metadata(1) == 'News'
+    assert catalog.lookup('østlandet') == 2
+
+
+def test_large_lineup_lookups():
+    """100k channels: lookups and pages touch only what they return."""
+    catalog = ChannelCatalog((f'Channel {n:06d}', '') for n in range(1, 100_001))
+    assert catalog.lookup('channel 054321') == 54321
+    assert catalog.count_prefix('channel 0999') == 100
+    assert catalog.page(99_999, 10)[-1][0] == 100_000
+
+
+def test_catalog_sets_channel_count(catalog):
+    tv = SmartTV(catalog)
+    assert tv.get_channel_count() == 7
+    plain = SmartTV()
+    plain.set_channel(9)
+    plain.set_catalog(catalog)
+    assert plain.get_channel() == 1 and plain.snapshot().get_channel_count() == 7
+
+
+def test_set_ch_name_command(tv):
+    assert handle_command('set_ch_name BBC One') == 'Channel set to 4'
+    assert tv.get_channel() == 4
+    assert handle_command('set_ch_name cnn') == "ERROR: No channel named 'cnn'."
+    assert 'expected at least 1' in handle_command('set_ch_name')
+
+
+def test_find_command(tv, monkeypatch):
+    assert handle_command('find bbc').split('\n') == [
+        "Found 3 channel(s) matching 'bbc'", '4 BBC One', '6 BBC One [HD]', '5 bbc two']
+    monkeypatch.setattr(handler, 'FIND_LIMIT', 1)
+    assert handle_command('find bbc').split('\n')[-1] == '... and 2 more'
+
+
+def test_list_command_pages(tv, monkeypatch):
+    monkeypatch.setattr(handler, 'CHANNEL_PAGE_SIZE', 3)
+    assert handle_command('list').split('\n') == [
+        'Channels 1-3 of 7 (page 1/3)', '1 NRK1 [News]', '2 NRK2', '3 TV 2 [Sport]']
+    assert handle_command('list 3').split('\n') == ['Channels 7-7 of 7 (page 3/3)', '7 Discovery [Docs]']
+    assert handle_command('list 4') == 'ERROR: Invalid page (valid: 1-3)'
+    assert 'expected 0-1' in handle_command('list 1 2')
+
+
+def test_commands_without_catalog(monkeypatch):
+    registry = TVRegistry()
+    registry.add('1')
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+    handle_command('on')
+    for cmd in ('find a', 'list', 'set_ch_name a'):
+        assert handle_command(cmd) == handler.TEXT_NO_CATALOG
@@ -0,0 +1,65 @@
+"""
+Unit tests for logic.fleet.TVFleet
+==================================
+
+These tests validate the array-backed fleet store: per-TV views keep
+the SmartTV behavior, and bulk operations on ranges and masks only
+touch the selected TVs.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import pytest
+from logic.fleet import TVFleet
+
+
+def test_view_behaves_like_smart_tv():
+    """A fleet view starts OFF on channel 1 and validates channel changes."""
+    fleet = TVFleet(4, channels=10)
+    tv = fleet.view(2)
+    assert tv.is_on() is False
+    assert tv.get_channel() == 1 and tv.get_channel_count() == 10
+    tv.turn_on()
+    tv.set_channel(7)
+    assert tv.is_on() and tv.get_channel() == 7
+    with pytest.raises(ValueError):
+        tv.set_channel(11)
+    assert fleet.view(1).is_on() is False
+
+
+def test_bulk_power_on_ranges_and_masks():
+    """Power operations only touch the selected TVs."""
+    fleet = TVFleet(8)
+    fleet.power_on(range(2, 5))
+    assert fleet.count_on() == 3
+    fleet.power_off(bytes([0, 0, 1, 0, 0, 0, 0, 0]))
+    assert [fleet[i].is_on() for i in range(8)] == [False, False, False, True, True, False, False, False]
+    fleet.power_on(bytes([255, 0, 0, 0, 0, 0, 0, 7]))
+    assert fleet.count_on() == 4
+    assert fleet.count_on(slice(0, 4)) == 2
+
+
+def test_bulk_set_channel_on_mask_keeps_other_lanes():
+    """Masked channel changes leave unselected TVs untouched."""
+    fleet = TVFleet(5)
+    fleet.set_channel(4, range(0, 5))
+    fleet.set_channel(9, bytes([1, 0, 3, 0, 1]))
+    assert [fleet[i].get_channel() for i in range(5)] == [9, 4, 9, 4, 9]
+
+
+def test_bulk_set_channel_is_all_or_nothing():
+    """An out-of-range channel for any selected TV rejects the whole operation."""
+    fleet = TVFleet(3)
+    with pytest.raises(ValueError):
+        fleet.set_channel(11)
+    with pytest.raises(ValueError):
+        fleet.set_channel(0, range(0, 1))
+    assert [fleet[i].get_channel() for i in range(3)] == [1, 1, 1]
+
+
+@pytest.mark.parametrize("bad", [range(0, 4, 2), bytes(2)])
+def test_bad_selections_rejected(bad):
+    """Strided ranges and masks of the wrong length are refused."""
+    with pytest.raises(ValueError):
+        TVFleet(4).power_on(bad)
@@ -0,0 +1,163 @@
+"""
+Unit tests for journal.Journal
+==============================
+
+These tests ensure that TV state written through the journal is
+restored after a restart, from the snapshot plus the journal tail.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import os
+import threading
+import pytest
+import journal as journal_module
+from journal import Journal, JournaledTV, SNAPSHOT_FILE
+from logic.catalog import ChannelCatalog
+from logic.registry import TVRegistry
+from logic.tv import SmartTV
+
+
+def restart(directory, **options):
+    """Recover a fresh registry from 'directory', like a restarted server."""
+    registry = TVRegistry()
+    journal = Journal(str(directory), **options)
+    replayed = journal.recover(registry)
+    return registry, journal, replayed
+
+
+def test_state_survives_restart(tmp_path):
+    """Changes are replayed onto fresh TVs, including TVs added at runtime."""
+    registry, journal, _ = restart(tmp_path, interval=0)
+    registry.add('1')
+    registry.add('kitchen')
+    journal.install(registry)
+    registry.get('1').turn_on()
+    registry.get('1').set_channel(7)
+    registry.get('kitchen').turn_on()
+    registry.get('kitchen').turn_off()
+
+    registry, _, replayed = restart(tmp_path)
+    assert replayed == 4
+    assert registry.get('1').is_on() and registry.get('1').get_channel() == 7
+    assert not registry.get('kitchen').is_on()
+
+
+def test_recover_into_smaller_catalog(tmp_path):
+    """Channels the new lineup lacks are skipped instead of aborting startup."""
+    registry, journal, _ = restart(tmp_path, interval=0, snapshot_every=3)
+    registry.add('1')
+    journal.install(registry)
+    tv = registry.get('1')
+    tv.turn_on()
+    tv.set_channel(9)
+    tv.set_channel(8)     # snapshot taken here (channel 8)
+    tv.set_channel(2)
+    tv.set_channel(7)
+
+    lineup = ChannelCatalog([('News', ''), ('Sport', ''), ('Kids', '')])
+    registry = TVRegistry(factory=lambda: SmartTV(lineup))
+    replayed = Journal(str(tmp_path)).recover(registry)
+    assert replayed == 1
+    assert registry.get('1').is_on() and registry.get('1').get_channel() == 2
+
+
+def test_install_wraps_tvs_and_keeps_locks(tmp_path):
+    """Installed TVs journal changes but keep the lock they were registered with."""
+    registry, journal, _ = restart(tmp_path, interval=0)
+    registry.add('1')
+    lock = registry.lock('1')
+    journal.install(registry)
+    assert isinstance(registry.get('1'), JournaledTV)
+    assert registry.lock('1') is lock
+
+
+def test_group_commit_flushes_in_background(tmp_path):
+    """With an interval, appends are buffered and reach disk on flush."""
+    registry, journal, _ = restart(tmp_path, interval=60)
+    registry.add('1')
+    journal.install(registry)
+    registry.get('1').turn_on()
+    assert restart(tmp_path)[2] == 0
+    journal.flush()
+    assert restart(tmp_path)[2] == 1
+    journal.close()
+
+
+def test_appends_do_not_wait_for_a_commit(tmp_path, monkeypatch):
+    """A change is buffered while the previous batch is still being fsynced."""
+    registry, journal, _ = restart(tmp_path, interval=60)
+    registry.add('1')
+    journal.install(registry)
+    syncing, release = threading.Event(), threading.Event()
+
+    def slow_fsync(fd):
+        syncing.set()
+        release.wait(5)
+
+    monkeypatch.setattr(journal_module.os, 'fsync', slow_fsync)
+    registry.get('1').turn_on()
+    committer = threading.Thread(target=journal.flush)
+    committer.start()
+    assert syncing.wait(5)
+    registry.get('1').set_channel(4)
+    assert committer.is_alive()
+    release.set()
+    committer.join()
+    journal.flush()
+    monkeypatch.undo()
+    assert restart(tmp_path)[2] == 2
+    journal.close()
+
+
+def test_snapshot_bounds_the_tail(tmp_path):
+    """After a snapshot only the records written since are replayed."""
+    registry, journal, _ = restart(tmp_path, interval=0, snapshot_every=5)
+    registry.add('1')
+    journal.install(registry)
+    tv = registry.get('1')
+    tv.turn_on()
+    for n in range(2, 9):
+        tv.set_channel(n)
+
+    registry, _, replayed = restart(tmp_path)
+    assert replayed == 3
+    assert registry.get('1').get_channel() == 8
+    segments = [n for n in os.listdir(tmp_path) if n.endswith('.log')]
+    assert len(segments) == 1
+
+
+def test_close_leaves_an_empty_tail(tmp_path):
+    """A clean shutdown snapshots everything, so restart replays nothing."""
+    registry, journal, _ = restart(tmp_path, interval=0.01)
+    registry.add('1')
+    journal.install(registry)
+    registry.get('1').turn_on()
+    journal.close()
+    assert os.path.exists(tmp_path / SNAPSHOT_FILE)
+
+    registry, journal, replayed = restart(tmp_path)
+    assert replayed == 0 and registry.get('1').is_on()
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    """A half-written or corrupt last record stops replay instead of failing."""
+    registry, journal, _ = restart(tmp_path, interval=0)
+    registry.add('1')
+    journal.install(registry)
+    registry.get('1').set_channel(4)
+    registry.get('1').set_channel(5)
+    (segment,) = [tmp_path / n for n in os.listdir(tmp_path) if n.endswith('.log')]
+    lines = segment.read_text().splitlines(keepends=True)
+    segment.write_text(lines[0] + lines[1].replace('set_ch 5', 'set_ch 6') + '0000')
+
+    registry, journal, replayed = restart(tmp_path)
+    assert replayed == 1 and registry.get('1').get_channel() == 4
+    assert journal.seq == 1
+
+
+@pytest.mark.parametrize("options", [{"interval": -1}, {"snapshot_every": 0}])
+def test_invalid_options(tmp_path, options):
+    with pytest.raises(ValueError):
+        Journal(str(tmp_path), **options)
@@ -0,0 +1,125 @@
+"""
+Unit tests for connection lifecycle limits
+==========================================
+
+These tests check idle timeouts, the 'ping' heartbeat and connection
+admission on both engines.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import socket
+import threading
+import time
+import pytest
+import async_server
+import binproto as bp
+import lifecycle
+import server
+from handler import handle_command
+from protocol import TEXT_IDLE_TIMEOUT, TEXT_SERVER_FULL, WireSession
+
+
+@pytest.fixture(autouse=True)
+def default_limits(monkeypatch):
+    """Every test starts with its own copy of the lifecycle settings."""
+    for name in ('idle_timeout', 'max_connections', 'listen_backlog', '_active'):
+        monkeypatch.setattr(lifecycle, name, getattr(lifecycle, name))
+
+
+async def _open(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    return reader, writer, await reader.readline()
+
+
+def test_configure_validates():
+    lifecycle.configure(idle=0, max_conns=0, backlog=5)
+    assert lifecycle.timeout() is None and lifecycle.listen_backlog == 5
+    for options in ({'idle': -1}, {'max_conns': -1}, {'backlog': 0}):
+        with pytest.raises(ValueError):
+            lifecycle.configure(**options)
+
+
+def test_admission_is_bounded():
+    """admit() hands out at most max_connections slots (0 = unlimited)."""
+    lifecycle.configure(max_conns=2)
+    assert lifecycle.admit() and lifecycle.admit()
+    assert not lifecycle.admit()
+    lifecycle.release()
+    assert lifecycle.admit() and lifecycle.active() == 2
+    lifecycle.configure(max_conns=0)
+    assert lifecycle.admit()
+
+
+def test_ping_works_while_tv_is_off():
+    """'ping' is a session command: never gated, text and binary."""
+    assert handle_command('ping') == 'PONG'
+    reply, _, _ = WireSession().receive(bp.BINARY_MAGIC + bp.encode_request(bp.OPCODES['ping'], 7, tag=3))
+    assert list(bp.RESPONSE.iter_unpack(reply))[1] == (bp.OPCODES['ping'], bp.ST_OK, 3, 7)
+
+
+def test_asyncio_rejects_over_the_limit():
+    """A remote over the limit gets one rejection line and EOF; slots are reused."""
+    lifecycle.configure(max_conns=1)
+
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            r1, w1, welcome = await _open(port)
+            assert b'Welcome' in welcome
+            r2, w2, line = await _open(port)
+            assert line == TEXT_SERVER_FULL
+            assert await r2.read() == b''
+            w1.write(b'quit\n')
+            await r1.read()
+            await asyncio.sleep(0.05)
+            _, w3, welcome = await _open(port)
+            assert b'Welcome' in welcome
+            for w in (w1, w2, w3):
+                w.close()
+
+    asyncio.run(scenario())
+
+
+def test_asyncio_idle_timeout_and_ping():
+    """Silent remotes are dropped with a message; pinging keeps a remote alive."""
+    lifecycle.configure(idle=0.2)
+
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            r1, w1, _ = await _open(port)
+            r2, w2, _ = await _open(port)
+            for _ in range(4):
+                await asyncio.sleep(0.1)
+                w2.write(b'ping\n')
+                assert await r2.readline() == b'PONG\n'
+            assert await asyncio.wait_for(r1.read(), 2) == TEXT_IDLE_TIMEOUT
+            for w in (w1, w2):
+                w.close()
+
+    asyncio.run(scenario())
+
+
+def test_threaded_idle_timeout():
+    """The threaded engine drops a silent remote with the same message."""
+    lifecycle.configure(idle=0.2)
+    srv, cli = socket.socketpair()
+    t = threading.Thread(target=server.handle_client, args=(srv, ('pair', 0)), daemon=True)
+    start = time.monotonic()
+    t.start()
+    try:
+        cli.settimeout(2)
+        data = b''
+        while not data.endswith(TEXT_IDLE_TIMEOUT):
+            chunk = cli.recv(4096)
+            assert chunk, 'closed without the idle message'
+            data += chunk
+        assert time.monotonic() - start >= 0.2
+    finally:
+        cli.close()
+        t.join(2)
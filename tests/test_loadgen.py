@@ -0,0 +1,56 @@
+"""
+Tests for the network load generator (benchmarks.loadgen)
+=========================================================
+
+These tests check mix parsing and statistics, and run a tiny load
+against an in-process asyncio server.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import pytest
+import handler
+import async_server
+from benchmarks import loadgen
+from logic.registry import TVRegistry
+
+
+@pytest.fixture(autouse=True)
+def fresh_tvs(monkeypatch):
+    """Give every test its own TV so state does not leak between tests."""
+    registry = TVRegistry()
+    registry.add('1')
+    monkeypatch.setattr(handler, 'registry', registry)
+
+
+def test_parse_mix_presets_and_custom():
+    """Presets resolve by name; custom mixes are cmd=weight pairs."""
+    assert loadgen.parse_mix('zap') == {'set_ch': 8, 'get_ch': 2}
+    assert loadgen.parse_mix('get_ch=3, status') == {'get_ch': 3, 'status': 1}
+    with pytest.raises(ValueError):
+        loadgen.parse_mix('get_ch=0')
+
+
+def test_summarize_percentiles():
+    """Percentiles use nearest rank and are reported in milliseconds."""
+    out = loadgen.summarize([i / 1000 for i in range(1, 1001)])
+    assert (out['count'], out['p50_ms'], out['p99_ms'], out['max_ms']) == (1000, 500.0, 990.0, 1000.0)
+    assert loadgen.summarize([])['p50_ms'] is None
+
+
+def test_small_zapping_run_reports_lag():
+    """A short zapping run produces latencies and broadcast lag samples."""
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            return await loadgen.run_load('127.0.0.1', port, remotes=4, tvs=1,
+                                          mix={'set_ch': 1}, duration=0.3, seed=1, channels=10)
+
+    result = asyncio.run(scenario())
+    assert result['commands'] > 0 and result['errors'] == 0
+    assert result['latency']['p50_ms'] is not None
+    assert result['broadcast_lag']['count'] > 0
+    assert result['connect']['count'] == 4
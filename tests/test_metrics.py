@@ -0,0 +1,115 @@
+"""
+Unit tests for the built-in metrics (metrics.py)
+================================================
+
+These tests check the histogram and exposition format, lock-wait
+timing, command timing on the wire path and the 'stats' admin command.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import threading
+import pytest
+import handler
+import metrics
+from handler import handle_command
+from logic.registry import TVRegistry
+from protocol import execute_lines
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    """Start every test with zeroed, enabled metrics and a fresh TV."""
+    registry = TVRegistry()
+    registry.add('1')
+    tv, lock = registry.entry('1')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', tv)
+    monkeypatch.setattr(handler, '_tv_lock', lock)
+    monkeypatch.setattr(metrics, 'enabled', True)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_buckets_and_quantiles():
+    """Observations land in the first bucket whose bound is >= the value."""
+    h = metrics.Histogram(bounds=(1, 10, 100))
+    for v in (0.5, 1, 5, 50, 500):
+        h.observe(v)
+    assert h.counts == [2, 1, 1, 1]
+    assert h.quantile(0.5) == 10
+    assert h.quantile(1.0) == float('inf')
+    assert metrics.Histogram().quantile(0.5) is None
+
+
+def test_render_exposition_format():
+    """Histograms render cumulative buckets, sum and count per label."""
+    metrics.observe_command('get_ch', 3e-6)
+    text = metrics.render()
+    assert '# TYPE smarttv_command_seconds histogram' in text
+    assert 'smarttv_command_seconds_bucket{command="get_ch",le="2.5e-06"} 0' in text
+    assert 'smarttv_command_seconds_bucket{command="get_ch",le="5e-06"} 1' in text
+    assert 'smarttv_command_seconds_count{command="get_ch"} 1' in text
+    assert 'smarttv_clients 0' in text
+
+
+def test_wire_commands_are_timed_by_name():
+    """Every executed line is counted under its command; junk becomes 'other'."""
+    execute_lines([b'on', b'get_ch', b'get_ch', b'set_ch 3', b'zzz'])
+    counts = {name: h.count for name, h in metrics.COMMAND_SECONDS.items() if h.count}
+    assert counts == {'on': 1, 'get_ch': 2, 'set_ch': 1, 'other': 1}
+    # get_ch is answered from a snapshot without taking the lock; 'on' and
+    # 'set_ch' take it twice (the wire layer holds it until the change is
+    # stamped, the handler takes it again inside)
+    assert metrics.TV_LOCK.wait.count == 5
+
+
+def test_reads_and_admin_lines_do_not_wait_for_the_tv_lock():
+    """Only lines that may change the TV wait while a writer holds its lock."""
+    handler._tv_lock.acquire()
+    try:
+        replies = []
+        t = threading.Thread(target=lambda: replies.append(
+            execute_lines([b'stats', b'STATUS', b'subscribe power', b'get_ch'])))
+        t.start()
+        t.join(2)
+        assert not t.is_alive()
+    finally:
+        handler._tv_lock.release()
+    assert replies[0][0].decode().splitlines()[-3:] == [
+        handler.TEXT_TV_OFF, 'Subscribed to power notices', handler.TEXT_TV_OFF]
+
+
+def test_contended_lock_wait_is_recorded():
+    """Waiting for a held TV lock is counted as contended with its duration."""
+    handler._tv_lock.acquire()
+    t = threading.Thread(target=handle_command, args=('on',))
+    t.start()
+    t.join(0.05)
+    handler._tv_lock.release()
+    t.join()
+    assert metrics.TV_LOCK.contended.value == 1
+    assert metrics.TV_LOCK.wait.sum >= 0.04
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    """With metrics off, locked() is the plain lock and nothing is recorded."""
+    monkeypatch.setattr(metrics, 'enabled', False)
+    lock = threading.Lock()
+    assert metrics.locked(lock, metrics.TV_LOCK) is lock
+    execute_lines([b'on', b'get_ch'])
+    assert all(h.count == 0 for _, h in metrics.COMMAND_SECONDS.items())
+    assert metrics.TV_LOCK.wait.count == 0
+    assert handle_command('stats') == handler.TEXT_METRICS_DISABLED
+
+
+def test_stats_command():
+    """'stats' works while the TV is OFF and cannot run inside a batch."""
+    execute_lines([b'get_ch'])
+    assert 'Clients: 0 connected' in handle_command('stats')
+    assert handle_command('stats scrape').startswith('# HELP smarttv_command_seconds')
+    assert handle_command('stats bogus') == handler.TEXT_STATS_USAGE
+    handle_command('on')
+    assert 'cannot be used inside a batch' in handle_command('batch status; stats')
@@ -0,0 +1,47 @@
+"""
+Tests for the microbenchmark suite (benchmarks.microbench)
+==========================================================
+
+These tests check the regression gate, that every suite produces its
+cases without disturbing the served TVs, and the baseline round trip.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import json
+import handler
+from benchmarks import microbench
+
+
+def test_regressions_use_the_threshold():
+    """Only cases slower than baseline * (1 + threshold) are reported."""
+    baseline = {'a': 100.0, 'b': 100.0, 'c': 0.0}
+    results = {'a': 120.0, 'b': 130.0, 'c': 5.0, 'new': 1.0}
+    slower = microbench.regressions(results, baseline, 0.25)
+    assert list(slower) == ['b'] and round(slower['b'], 2) == 0.3
+
+
+def test_every_suite_runs_in_isolation():
+    """All suites report their cases and leave the served registry alone."""
+    registry = handler.registry
+    results = microbench.run(20)
+    assert handler.registry is registry
+    suites = {case.split('.', 1)[0] for case in results}
+    assert suites == set(microbench.SUITES)
+    assert 'dispatch.handle_raw[get_ch]' in results
+    assert f'broadcast.publish[{microbench.BROADCAST_SIZES[-1]}]' in results
+    assert all(ns > 0 for ns in results.values())
+
+
+def test_saved_baseline_gates_a_slower_run(tmp_path):
+    """A stored baseline passes against itself and fails when a case slows down."""
+    path = tmp_path / 'baseline.json'
+    assert microbench.main(['--suite', 'tv', '--number', '50', '--save', str(path)]) == 0
+    stored = json.loads(path.read_text())
+    assert stored['threshold'] == microbench.DEFAULT_THRESHOLD
+    stored['results'] = {case: ns / 10 for case, ns in stored['results'].items()}
+    path.write_text(json.dumps(stored))
+    assert microbench.main(['--suite', 'tv', '--number', '50', '--check', str(path)]) == 1
+    assert microbench.main(['--suite', 'tv', '--number', '50', '--check', str(path),
+                            '--threshold', '1000']) == 0
@@ -0,0 +1,137 @@
+"""
+Unit tests for outbox.OutboundQueue
+===================================
+
+These tests check the bounded per-client queue and its overflow
+policies, and that a broadcast never waits on a slow receiver.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import socket
+import time
+import pytest
+import outbox
+import server
+from outbox import OutboundQueue, configure
+
+
+def test_replies_and_notices_keep_order():
+    """Queued messages are flushed in arrival order as one buffer."""
+    q = OutboundQueue(limit=4, policy='drop_oldest')
+    q.push_reply(b'a\n')
+    q.push_notice(b'n1\n')
+    q.push_reply(b'b\n')
+    assert q.pop_all() == b'a\nn1\nb\n'
+    assert len(q) == 0
+
+
+def test_drop_oldest_discards_oldest_notice_only():
+    """When full, the oldest notice goes; replies are never dropped."""
+    q = OutboundQueue(limit=2, policy='drop_oldest')
+    q.push_reply(b'r\n')
+    for i in range(4):
+        assert q.push_notice(f'n{i}\n'.encode())
+    assert q.pop_all() == b'r\nn2\nn3\n'
+    assert q.dropped == 2
+
+
+def test_disconnect_policy_reports_overflow():
+    """The 'disconnect' policy asks the caller to drop the client."""
+    q = OutboundQueue(limit=1, policy='disconnect')
+    assert q.push_notice(b'n1\n')
+    assert q.push_notice(b'n2\n') is False
+
+
+def test_coalesce_replaces_same_key_in_place():
+    """A newer keyed notice supersedes the queued one with the same key."""
+    q = OutboundQueue(limit=8, policy='coalesce')
+    q.push_notice(b'ch 1\n', key='channel')
+    q.push_notice(b'other\n')
+    q.push_notice(b'ch 2\n', key='channel')
+    assert q.pop_all() == b'ch 2\nother\n'
+    q.push_notice(b'ch 3\n', key='channel')
+    assert q.pop_all() == b'ch 3\n'
+
+
+def test_notice_window_delivers_only_latest(monkeypatch):
+    """Within the window only the newest notice per key is released, once it has passed."""
+    clock = [100.0]
+    monkeypatch.setattr(outbox, 'monotonic', lambda: clock[0])
+    q = OutboundQueue(limit=8, window=0.5)
+    q.push_notice(b'ch 1\n', key='channel')
+    assert q.pop_all() == b'ch 1\n'
+    for n in (2, 3, 4):
+        q.push_notice(f'ch {n}\n'.encode(), key='channel')
+    q.push_notice(b'power\n', key='power')
+    assert q.pop_all() == b'power\n'
+    assert q.wait_time() == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert q.due() and q.pop_all() == b'ch 4\n'
+    assert q.wait_time() is None and q.dropped == 2
+
+
+def test_notice_window_through_connection():
+    """A zapping storm reaches a window-limited remote as the first and last change."""
+    srv, cli = socket.socketpair()
+    conn = server.Connection(srv, ('pair', 0))
+    conn._queue.window = 0.1
+    try:
+        for n in range(1, 51):
+            conn.notify(f'ch {n}\n'.encode(), 'channel')
+        cli.settimeout(1.0)
+        received = b''
+        while not received.endswith(b'ch 50\n'):
+            received += cli.recv(4096)
+        assert received == b'ch 1\nch 50\n'
+    finally:
+        cli.close()
+        conn.close(timeout=0.1)
+
+
+def test_configure_rejects_unknown_policy():
+    """Only the documented policies are accepted."""
+    with pytest.raises(ValueError):
+        configure(policy='block')
+
+
+def test_notify_does_not_block_on_slow_reader():
+    """Notices to a remote that never reads are bounded and never stall the sender."""
+    srv, cli = socket.socketpair()
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    conn = server.Connection(srv, ('pair', 0))
+    try:
+        payload = b'x' * 1024
+        start = time.perf_counter()
+        for _ in range(5000):
+            conn.notify(payload)
+        assert time.perf_counter() - start < 1.0
+        assert len(conn._queue) <= conn._queue.limit
+    finally:
+        cli.close()
+        conn.close(timeout=0.1)
+
+
+def test_send_chunks_resumes_partial_sends():
+    """Scatter/gather sends deliver every chunk in order despite short writes."""
+    class ShortSocket:
+        def __init__(self):
+            self.data = b''
+
+        def sendmsg(self, buffers):
+            taken = b''.join(buffers)[:3]
+            self.data += taken
+            return len(taken)
+
+        def sendall(self, data):
+            self.data += data
+
+    sock = ShortSocket()
+    q = OutboundQueue(limit=4, policy='drop_oldest')
+    for msg in (b'hello\n', b'n\n', b'world\n'):
+        q.push_reply(msg)
+    chunks = q.pop_chunks()
+    assert chunks == [b'hello\n', b'n\n', b'world\n'] and len(q) == 0
+    server.send_chunks(sock, chunks)
+    assert sock.data == b'hello\nn\nworld\n'
@@ -0,0 +1,104 @@
+"""
+Unit tests for runtime profiling (the 'profile' admin command)
+==============================================================
+
+These tests check that profiling is refused unless a profile directory
+is configured, that both modes write their output format, and that a
+trace stays owned by the connection that started it.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import os
+import pstats
+import threading
+import time
+import pytest
+import async_server
+import handler
+import profiling
+from handler import Session, handle_command
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    """Profiling enabled into a temporary directory, nothing running."""
+    monkeypatch.setattr(profiling, 'profile_dir', str(tmp_path))
+    monkeypatch.setattr(profiling, 'sample_interval', 0.001)
+    monkeypatch.setattr(profiling, '_current', None)
+    return tmp_path
+
+
+def _busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        handle_command('status')
+
+
+def test_refused_without_profile_dir(monkeypatch):
+    monkeypatch.setattr(profiling, 'profile_dir', None)
+    assert handle_command('profile start') == handler.TEXT_PROFILING_DISABLED
+    assert profiling.current() is None
+
+
+def test_sample_profile_writes_collapsed_stacks(profile_dir):
+    """A sampling profile records stacks and writes one 'stack count' line each."""
+    assert handle_command('profile') == handler.TEXT_PROFILE_OFF
+    assert handle_command('profile start sample self') == 'Profiling started (sample, scope self)'
+    assert handle_command('profile start') == handler.TEXT_PROFILE_BUSY
+    _busy(0.05)
+    assert handle_command('profile').startswith('Profiling (sample, scope self)')
+    reply = handle_command('profile stop')
+    path = reply[len('Profile written to '):]
+    lines = open(path, encoding='utf-8').read().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('_busy' in line for line in lines)
+    assert handle_command('profile stop') == handler.TEXT_PROFILE_NOT_RUNNING
+
+
+def test_trace_writes_pstats_and_is_owned(profile_dir):
+    """A trace is stopped only from the session that started it and dumps pstats."""
+    session = Session()
+    assert handle_command('profile start trace all', session) == handler.TEXT_PROFILE_TRACE_SCOPE
+    assert handle_command('profile start trace', session) == 'Profiling started (trace, scope self)'
+    handle_command('status', session)
+    assert handle_command('profile stop', Session()) == handler.TEXT_PROFILE_NOT_OWNER
+    elsewhere = []
+    thread = threading.Thread(target=lambda: elsewhere.append(handle_command('profile stop', session)))
+    thread.start()
+    thread.join()
+    assert elsewhere == [handler.TEXT_PROFILE_NOT_OWNER]
+    path = handle_command('profile stop', session)[len('Profile written to '):]
+    functions = {name for _, _, name in pstats.Stats(path).stats}
+    assert 'handle_command' in functions
+
+
+def test_trace_ends_when_its_remote_disconnects(profile_dir):
+    """A remote that leaves while tracing does not keep the profiler busy."""
+    async def request(r, w, line):
+        w.write(line.encode() + b'\n')
+        return (await asyncio.wait_for(r.readline(), 2)).decode().rstrip('\n')
+
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            r1, w1 = await asyncio.open_connection('127.0.0.1', port)
+            r2, w2 = await asyncio.open_connection('127.0.0.1', port)
+            for r in (r1, r2):
+                await r.readline()
+            assert await request(r1, w1, 'profile start trace') == \
+                'Profiling started (trace, scope self)'
+            w1.close()
+            for _ in range(100):
+                if await request(r2, w2, 'profile') == handler.TEXT_PROFILE_OFF:
+                    break
+                await asyncio.sleep(0.01)
+            assert await request(r2, w2, 'profile start') == 'Profiling started (sample, scope all)'
+            assert (await request(r2, w2, 'profile stop')).startswith('Profile written to ')
+            w2.close()
+
+    asyncio.run(scenario())
+    assert sorted(name.rsplit('.', 1)[1] for name in os.listdir(profile_dir)) == ['folded', 'pstats']
@@ -0,0 +1,123 @@
+"""
+Unit tests for ratelimit (per-client token buckets + load shedding)
+==================================================================
+
+These tests check the token bucket, that over-limit commands are
+answered with a throttled error on both protocols, and that lock-taking
+commands are shed while latency exceeds the target.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import pytest
+import handler
+import binproto as bp
+import ratelimit
+from logic.registry import TVRegistry
+from protocol import TEXT_BUSY, WireSession, execute_lines
+from ratelimit import ClientLimiter, TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """Fresh TVs and default (off) admission settings for every test."""
+    registry = TVRegistry()
+    registry.add('1')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+    monkeypatch.setattr(ratelimit, 'rate_limits', dict(ratelimit.rate_limits))
+    monkeypatch.setattr(ratelimit, 'latency_target', 0.0)
+    monkeypatch.setattr(ratelimit, 'shedder', ratelimit.LoadShedder())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable monotonic clock for the token buckets."""
+    now = [100.0]
+    monkeypatch.setattr(ratelimit, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_token_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=10, burst=3)
+    assert all(bucket.take() for _ in range(3))
+    assert not bucket.take()
+    clock[0] += 0.25
+    assert bucket.take() and bucket.take() and not bucket.take()
+    clock[0] += 60
+    assert not bucket.take(4)
+    assert bucket.take(3)
+
+
+def test_over_limit_commands_are_throttled_per_class(clock):
+    """Only the exhausted class is throttled; a batch costs one token per command."""
+    limiter = ClientLimiter({'read': (0, 0), 'write': (1, 1), 'broadcast': (1, 3)})
+    lines = [b'on', b'set_ch 2', b'batch set_ch 3; set_ch 4', b'set_ch 5', b'get_ch', b'off']
+    reply, notices, _ = execute_lines(lines, limiter=limiter)
+    assert reply.decode().splitlines() == [
+        "TV switched ON. Type 'help' for available commands.",
+        'Channel set to 2',
+        'Channel set to 3', 'Channel set to 4',
+        'ERROR: Rate limit exceeded for broadcast commands. Slow down.',
+        '4',
+        'ERROR: Rate limit exceeded for write commands. Slow down.',
+    ]
+    assert [n[1:3] for n in notices] == [('power', 1), ('channel', 2), ('channel', 3), ('channel', 4)]
+
+
+def test_binary_frames_get_throttled_status(monkeypatch, clock):
+    ratelimit.configure(limits={'write': (1, 1)})
+    wire = WireSession()
+    reply, _, _ = wire.receive(bp.BINARY_MAGIC
+                               + bp.encode_request(bp.OPCODES['on'], tag=1)
+                               + bp.encode_request(bp.OPCODES['off'], tag=2)
+                               + bp.encode_request(bp.OPCODES['status'], tag=3))
+    assert [r[:3] for r in bp.RESPONSE.iter_unpack(reply)][1:] == [
+        (bp.OPCODES['on'], bp.ST_OK, 1),
+        (bp.OPCODES['off'], bp.ST_THROTTLED, 2),
+        (bp.OPCODES['status'], bp.ST_OK, 3),
+    ]
+
+
+def test_no_limiter_when_every_class_is_unlimited():
+    assert ratelimit.for_client() is None
+    ratelimit.configure(limits={'read': (100, 200)})
+    assert isinstance(ratelimit.for_client(), ClientLimiter)
+
+
+def test_load_shedding_follows_latency(monkeypatch):
+    """Slow lock-taking commands raise the shed share; reads are never shed."""
+    ratelimit.configure(target=0.001)
+    shedder = ratelimit.shedder
+    for _ in range(100):
+        shedder.observe(0.5)
+    assert shedder.share == ratelimit.SHED_MAX
+
+    monkeypatch.setattr(ratelimit.random, 'random', lambda: 0.0)
+    reply, notices, _ = execute_lines([b'on', b'status'])
+    assert reply.decode().splitlines() == [TEXT_BUSY, 'ERROR: TV is switched OFF. Turn it ON first.']
+    assert notices == [] and shedder.shed == 1
+
+    for _ in range(100):
+        shedder.observe(0.0)
+    assert shedder.share == 0.0
+    assert 'switched ON' in execute_lines([b'on'])[0].decode()
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("broadcast=20/40", ("broadcast", (20.0, 40.0))),
+    ("read=100", ("read", (100.0, 100.0))),
+])
+def test_parse_limit(spec, expected):
+    assert ratelimit.parse_limit(spec) == expected
+
+
+@pytest.mark.parametrize("options", [
+    {"limits": {"volume": (1, 1)}}, {"limits": {"read": (-1, 1)}},
+    {"limits": {"read": (5, 0)}}, {"target": -1},
+])
+def test_configure_validates(options):
+    with pytest.raises(ValueError):
+        ratelimit.configure(**options)
@@ -0,0 +1,46 @@
+"""
+Unit tests for logic.registry.TVRegistry
+========================================
+
+These tests validate that TVs are addressed by id and that every
+TV is guarded by its own lock.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import pytest
+from logic.registry import TVRegistry
+from logic.tv import SmartTV
+
+
+def test_add_and_lookup_by_id():
+    """Registered TVs are independent and found by id."""
+    reg = TVRegistry()
+    a = reg.add('a')
+    b = reg.add('b', SmartTV())
+    a.turn_on()
+    assert reg.get('a').is_on() is True
+    assert reg.get('b') is b and b.is_on() is False
+    assert reg.ids() == ['a', 'b'] and 'a' in reg and len(reg) == 2
+
+
+def test_duplicate_and_unknown_ids():
+    """Adding an id twice fails; unknown ids raise KeyError; ensure() is idempotent."""
+    reg = TVRegistry()
+    reg.add('a')
+    with pytest.raises(ValueError):
+        reg.add('a')
+    with pytest.raises(KeyError):
+        reg.get('zzz')
+    assert reg.ensure('a') is reg.get('a')
+
+
+def test_each_tv_has_its_own_lock():
+    """Locks are per TV, so different TVs never contend."""
+    reg = TVRegistry()
+    reg.add('a')
+    reg.add('b')
+    tv_a, lock_a = reg.entry('a')
+    assert tv_a is reg.get('a')
+    assert lock_a is reg.lock('a') and lock_a is not reg.lock('b')
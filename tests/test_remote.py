@@ -0,0 +1,151 @@
+"""
+Tests for the programmatic client library (remote.py)
+=====================================================
+
+These tests drive a real threaded server on a free localhost port with
+the blocking and asyncio clients, checking tag correlation, pipelining,
+the notice callback and the connection pool.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import threading
+import pytest
+import handler
+import server
+import async_server
+from binproto import encode_notice
+from logic.registry import TVRegistry
+from remote import AsyncRemote, AsyncRemotePool, CommandError, Remote, RemotePool
+
+
+@pytest.fixture(autouse=True)
+def fresh_tvs(monkeypatch):
+    """Give every test its own three TVs so state does not leak between tests."""
+    registry = TVRegistry()
+    for tv_id in ('1', '2', '3'):
+        registry.add(tv_id)
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+
+
+@pytest.fixture
+def port():
+    """A threaded server accepting connections in the background."""
+    listener = server.create_socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+
+    def accept_loop():
+        while True:
+            try:
+                conn, addr = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=server.handle_client, args=(conn, addr), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+def test_pipelined_commands_are_matched_by_tag(port):
+    """Many in-flight commands each resolve to their own response."""
+    with Remote('127.0.0.1', port) as tv:
+        assert tv.command('on') == 1
+        futures = [tv.submit('set_ch', n) for n in (3, 99, 5)]
+        futures.append(tv.submit('get_ch'))
+        responses = [f.result(5) for f in futures]
+        assert [r.value for r in responses if r.ok] == [3, 5, 5]
+        assert responses[1].command == 'set_ch' and not responses[1].ok
+        assert 'Supported commands' in tv.command('help')
+        with pytest.raises(CommandError):
+            tv.command('set_ch', 42)
+
+
+def test_notices_go_to_the_callback(port):
+    """Another remote's changes reach on_notice (per subscribed topic), not a response."""
+    seen = []
+    got = threading.Event()
+
+    def on_notice(tv_id, topic, value):
+        seen.append((tv_id, topic, value))
+        if topic == 'channel':
+            got.set()
+
+    with Remote('127.0.0.1', port, on_notice=on_notice) as watcher, \
+            Remote('127.0.0.1', port) as zapper:
+        watcher.subscribe('power')
+        with pytest.raises(CommandError):
+            watcher.subscribe('volume')
+        zapper.command('on')
+        assert zapper.command('set_ch', 6) == 6
+        assert got.wait(5)
+        assert watcher.command('get_ch') == 6
+    assert seen == [('1', 'power', 1), ('1', 'channel', 6)]
+
+
+def test_pool_drives_many_tvs(port):
+    """The pool routes each TV's commands and rejects unknown ids."""
+    with RemotePool('127.0.0.1', port, size=2) as pool:
+        for tv_id in ('1', '2', '3'):
+            pool.command(tv_id, 'on')
+        futures = {tv_id: pool.submit(tv_id, 'set_ch', int(tv_id) + 1) for tv_id in ('1', '2', '3')}
+        assert {t: f.result(5).value for t, f in futures.items()} == {'1': 2, '2': 3, '3': 4}
+        assert [pool.command(t, 'get_ch') for t in ('1', '2', '3')] == [2, 3, 4]
+        with pytest.raises(CommandError):
+            pool.command('9', 'get_ch')
+    assert handler.registry.get('3').get_channel() == 4
+
+
+
+def test_commands_behind_an_unknown_tv_do_not_run_on_the_previous_one(port):
+    """A failed pipelined select fails its command instead of falling back."""
+    with Remote('127.0.0.1', port) as tv:
+        tv.command('on')
+        response = tv.submit('set_ch', 7, tv_id='9').result(5)
+        assert response.command == 'set_ch' and not response.ok
+        assert handler.registry.get('1').get_channel() == 1
+        with pytest.raises(CommandError):
+            tv.command('get_ch')
+        assert tv.command('set_ch', 7, tv_id='1') == 7
+
+
+def test_notices_name_the_tv_they_are_about(port):
+    """A connection switched to another TV labels its notices with that TV."""
+    seen = []
+    got = threading.Event()
+
+    def on_notice(tv_id, topic, value):
+        seen.append((tv_id, topic, value))
+        got.set()
+
+    with Remote('127.0.0.1', port, on_notice=on_notice) as watcher, \
+            RemotePool('127.0.0.1', port, size=1) as pool:
+        watcher.select('2')
+        watcher.subscribe('power')
+        pool.command('2', 'on')
+        assert got.wait(5)
+        # A notice still in flight from before a switch names its own TV
+        watcher._received(encode_notice('channel', 4, '3'))
+    assert seen == [('2', 'power', 1), ('3', 'channel', 4)]
+
+def test_async_remote_and_pool():
+    """The asyncio flavor pipelines and pools the same way."""
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            async with await AsyncRemote.open('127.0.0.1', port) as tv:
+                await tv.command('on')
+                futures = [tv.submit('set_ch', n) for n in (2, 4)]
+                assert [(await f).value for f in futures] == [2, 4]
+            async with await AsyncRemotePool.open('127.0.0.1', port, size=2) as pool:
+                await pool.command('2', 'on')
+                assert await pool.command('2', 'set_ch', 9) == 9
+                assert await pool.command('1', 'get_ch') == 4
+
+    asyncio.run(scenario())
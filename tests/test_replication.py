@@ -0,0 +1,234 @@
+"""
+Tests for leader/follower replication
+=====================================
+
+These tests check the replication link (snapshot, ordered changes,
+forwarded writes, the lag bound) in-process, and a leader with two
+followers running as separate server processes on localhost.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import async_server
+import handler
+import protocol
+import statestream
+import udp
+from logic.registry import TVRegistry
+from replication import Leader, _Downstream, parse_address
+from statestream import StateStream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Fresh TVs and an empty stream (seq 100) for every test."""
+    registry = TVRegistry()
+    registry.add('1')
+    registry.add('2')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+    monkeypatch.setattr(statestream, 'stream', StateStream(size=16, start=100))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _ask(port, *commands):
+    # One short-lived text connection; one reply line per command
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        lines = sock.makefile('rb')
+        lines.readline()
+        replies = []
+        for command in commands:
+            sock.sendall(command.encode() + b'\n')
+            replies.append(lines.readline().decode().rstrip('\n'))
+        return replies
+
+
+def _stats(port):
+    # The multi-line 'stats' summary, ended by the answer to a 'ping'
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        lines = sock.makefile('rb')
+        lines.readline()
+        sock.sendall(b'stats\nping\n')
+        out = []
+        for line in lines:
+            if line == b'PONG\n':
+                break
+            out.append(line.decode())
+        return ''.join(out)
+
+
+def _until(check, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise AssertionError('condition not reached in time')
+
+
+def test_parse_address():
+    assert parse_address('127.0.0.1:1240') == ('127.0.0.1', 1240)
+    for bad in ('1240', 'host:', 'host:port'):
+        with pytest.raises(ValueError):
+            parse_address(bad)
+
+
+def test_link_streams_snapshot_changes_and_replies():
+    """A follower gets a snapshot, then every change; its own writes are marked."""
+    published = []
+    handler.registry.get('2').turn_on()
+    leader = Leader('127.0.0.1', 0, lambda *notice: published.append(notice), heartbeat=60)
+    try:
+        with socket.create_connection(leader.address, timeout=5) as sock:
+            lines = sock.makefile('rb')
+            read = lambda: lines.readline().decode().rstrip('\n')
+            assert [read() for _ in range(3)] == ['snapshot 100 2', '1 0 1', '2 1 1']
+            statestream.stream.record('2', 'channel', 4)
+            assert read() == 'change 101 2 channel 4 0'
+            sock.sendall(b'write 7 1 on\n')
+            assert read() == 'change 102 1 power 1 1'
+            assert read() == 'reply 7 1'
+            assert read() == handler.TEXT_ON
+            assert published == [('1', 'power', 1, 102)]
+    finally:
+        leader.close()
+
+
+def test_lagging_follower_is_dropped():
+    """Past the lag bound the leader gives up on a follower instead of buffering."""
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        client = socket.create_connection(server.getsockname())
+        sock, _ = server.accept()
+        link = _Downstream(sock, max_lag=2)
+        link.push('change 1 1 channel 2 0\n')
+        link.push('change 2 1 channel 3 0\n')
+        link.push('change 3 1 channel 4 0\n')
+        assert client.recv(10) == b''
+        client.close()
+        sock.close()
+
+
+def test_forwarded_writes_leave_the_event_loop_free(monkeypatch):
+    """On the asyncio engine a write waiting for the leader holds up no one else."""
+    answer = threading.Event()
+    forwarded = []
+
+    def forward(command, tv_id):
+        forwarded.append(command)
+        answer.wait(5)
+        return handler.TEXT_ON
+
+    monkeypatch.setattr(handler, 'forward', forward)
+
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        presses = await udp.start('127.0.0.1', 0, async_server.publish)
+        async with srv:
+            r1, w1 = await asyncio.open_connection('127.0.0.1', port)
+            r2, w2 = await asyncio.open_connection('127.0.0.1', port)
+            for r in (r1, r2):
+                await r.readline()
+            w1.write(b'on\n')
+            presses.sendto(udp.encode_press('off', 1), presses.get_extra_info('sockname'))
+            w2.write(b'status\n')
+            assert await asyncio.wait_for(r2.readline(), 2) == (handler.TEXT_TV_OFF + '\n').encode()
+            answer.set()
+            assert await asyncio.wait_for(r1.readline(), 2) == (handler.TEXT_ON + '\n').encode()
+            for w in (w1, w2):
+                w.close()
+        presses.close()
+        assert sorted(forwarded) == ['off', 'on']
+
+    asyncio.run(scenario())
+
+
+
+def test_follower_reads_stay_on_the_event_loop(monkeypatch):
+    """Only lines that go to the leader are handed to an executor thread,
+    also when they arrive pipelined with reads and admin commands."""
+    threads = {}
+    run = protocol.execute_lines
+
+    def execute_lines(lines, *args):
+        for line in lines:
+            threads[line] = threading.current_thread()
+        return run(lines, *args)
+
+    monkeypatch.setattr(handler, 'forward', lambda command, tv_id: handler.TEXT_ON)
+    monkeypatch.setattr(protocol, 'execute_lines', execute_lines)
+
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            await reader.readline()
+            writer.write(b'status\nlist 1\non\nstats\n')
+            await asyncio.wait_for(reader.readuntil(b'Clients'), 2)
+            writer.close()
+
+    asyncio.run(scenario())
+    main = threading.current_thread()
+    assert threads[b'status'] is main and threads[b'stats'] is main
+    assert threads[b'list 1'] is not main and threads[b'on'] is not main
+
+def test_followers_read_locally_and_forward_writes():
+    """A leader and two followers as separate processes on localhost."""
+    port, repl, f1, f2 = (_free_port() for _ in range(4))
+    base = [sys.executable, os.path.join(ROOT, 'server.py'), '--tvs', '2']
+    procs = [subprocess.Popen(base + ['--port', str(port), '--replication-port', str(repl)],
+                              cwd=ROOT, stdout=subprocess.DEVNULL)]
+    try:
+        _until(lambda: _ask(port, 'ping') == ['PONG'])
+        for p in (f1, f2):
+            procs.append(subprocess.Popen(
+                base + ['--port', str(p), '--follow', f'127.0.0.1:{repl}', '--engine', 'asyncio'],
+                cwd=ROOT, stdout=subprocess.DEVNULL))
+        for p in (f1, f2):
+            _until(lambda: 'Replication lag' in _stats(p))
+
+        # Remote B on follower 2 listens for power notices
+        with socket.create_connection(('127.0.0.1', f2), timeout=5) as b:
+            notices = b.makefile('rb')
+            notices.readline()
+            b.sendall(b'subscribe power\n')
+            notices.readline()
+
+            # A write on follower 1 runs on the leader and is read back at once
+            assert _ask(f1, 'on', 'status', 'set_ch 7', 'get_ch') == \
+                [handler.TEXT_ON, 'ON', 'Channel set to 7', '7']
+            assert notices.readline() == b'[Notice] TV switched ON\n'
+        assert _ask(port, 'get_ch') == ['7']
+        _until(lambda: _ask(f2, 'get_ch') == ['7'])
+        assert _ask(f2, 'select 2', 'status') == ['Selected TV 2', handler.TEXT_TV_OFF]
+        assert 'Replication lag: 127.0.0.1:' in _stats(port)
+
+        # Without its leader a follower still reads, but cannot write
+        procs[0].terminate()
+        procs[0].wait(5)
+        assert _ask(f1, 'get_ch', 'set_ch 2') == ['7', handler.TEXT_LEADER_UNAVAILABLE]
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait(5)
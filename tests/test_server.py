@@ -0,0 +1,163 @@
+"""
+Integration tests for the Smart TV server engines
+=================================================
+
+These tests start a real server on a free localhost port (or drive
+a connection handler over a socketpair) and talk to it over TCP,
+checking responses, framing and broadcast notices.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import socket
+import threading
+import pytest
+import handler
+import server
+import async_server
+from handler import Session
+from logic.registry import TVRegistry
+from protocol import LineBuffer, execute_lines, frame_response
+
+
+@pytest.fixture(autouse=True)
+def fresh_tvs(monkeypatch):
+    """Give every test its own two TVs so state does not leak between tests."""
+    registry = TVRegistry()
+    registry.add('1')
+    registry.add('2')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+
+
+def _read_lines(sock, n):
+    """Read exactly n newline-terminated lines from a blocking socket."""
+    data = b''
+    while data.count(b'\n') < n:
+        chunk = sock.recv(4096)
+        assert chunk, 'connection closed early'
+        data += chunk
+    return data.decode().splitlines()
+
+
+async def _open(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    welcome = await reader.readline()
+    assert b'Welcome' in welcome
+    return reader, writer
+
+
+async def _request(reader, writer, command):
+    writer.write(command.encode() + b'\n')
+    await writer.drain()
+    return (await reader.readline()).decode().rstrip('\n')
+
+
+def test_line_buffer_reassembles_split_commands():
+    """Commands split across reads are only returned once complete."""
+    buf = LineBuffer()
+    assert buf.feed(b'o') == []
+    assert buf.feed(b'n\r\nset_ch') == [b'on']
+    assert buf.feed(b' 3\nstatus\n') == [b'set_ch 3', b'status']
+
+
+def test_line_buffer_reports_overlong_lines():
+    """An overlong line is dropped up to its newline and reported once as None."""
+    buf = LineBuffer(max_line=8)
+    assert buf.feed(b'x' * 20) == []
+    assert buf.feed(b'yyy\nstatus\n') == [None, b'status']
+
+
+def test_threaded_engine_pipelines_commands():
+    """Several commands in one write are all answered, in order, in one reply."""
+    srv, cli = socket.socketpair()
+    t = threading.Thread(target=server.handle_client, args=(srv, ('pair', 0)), daemon=True)
+    t.start()
+    try:
+        assert 'Welcome' in _read_lines(cli, 1)[0]
+        cli.sendall(b'on\nset_ch 3\nstatus\nget_ch\nquit\n')
+        lines = _read_lines(cli, 5)
+        assert lines[1:] == ['Channel set to 3', 'ON', '3', 'Until next time!']
+    finally:
+        cli.close()
+        t.join(2)
+
+
+def test_asyncio_engine_commands_and_broadcast():
+    """The asyncio engine answers commands and notifies other remotes of channel changes."""
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            r1, w1 = await _open(port)
+            r2, w2 = await _open(port)
+            assert 'switched ON' in await _request(r1, w1, 'on')
+            assert await _request(r1, w1, 'set_ch 4') == 'Channel set to 4'
+            notice = await asyncio.wait_for(r2.readline(), 2)
+            assert notice == b'[Notice] Channel changed to 4\n'
+            assert await _request(r2, w2, 'get_ch') == '4'
+            w1.write(b'get_c\nquit\n')
+            assert await r1.readline() == b'10\n'
+            assert await r1.readline() == b'Until next time!\n'
+            for w in (w1, w2):
+                w.close()
+
+    asyncio.run(scenario())
+
+
+def test_batch_channel_changes_are_broadcast():
+    """A set_ch inside a batch still produces a channel notice."""
+    reply, notices, done = execute_lines([b'batch on; set_ch 7; get_ch'])
+    assert reply.decode().splitlines()[1:] == ['Channel set to 7', '7']
+    assert [n[:3] for n in notices] == [('1', 'power', 1), ('1', 'channel', 7)]
+    assert not done
+
+
+def test_select_switches_tv_and_scopes_notices():
+    """'select' moves a session to another TV; its notices carry that TV's id."""
+    session = Session()
+    reply, notices, _ = execute_lines([b'select 2', b'on', b'set_ch 5', b'select 9'], session)
+    lines = reply.decode().splitlines()
+    assert lines[0] == 'Selected TV 2'
+    assert "Unknown TV '9'" in lines[3]
+    assert session.tv_id == '2'
+    assert [n[:3] for n in notices] == [('2', 'power', 1), ('2', 'channel', 5)]
+    assert handler.registry.get('1').is_on() is False
+
+
+def test_asyncio_notices_only_reach_remotes_on_same_tv():
+    """A channel change on TV 2 is not announced to remotes watching TV 1."""
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            r1, w1 = await _open(port)
+            r2, w2 = await _open(port)
+            r3, w3 = await _open(port)
+            for r, w in ((r1, w1), (r2, w2)):
+                assert await _request(r, w, 'select 2') == 'Selected TV 2'
+            await _request(r1, w1, 'on')
+            await _request(r1, w1, 'set_ch 6')
+            assert await asyncio.wait_for(r2.readline(), 2) == b'[Notice] Channel changed to 6\n'
+            # r3 stayed on TV 1: its next line is the reply, not a notice
+            assert await _request(r3, w3, 'status') == 'ERROR: TV is switched OFF. Turn it ON first.'
+            for w in (w1, w2, w3):
+                w.close()
+
+    asyncio.run(scenario())
+
+
+def test_read_replies_are_encoded_once_per_state():
+    """Polling an unchanged TV reuses the encoded reply; a change re-encodes it."""
+    session = Session()
+    execute_lines([b'on', b'set_ch 4'], session)
+    first = handler.read_frame(b'get_ch', session, frame_response)
+    assert first == b'4\n'
+    assert handler.read_frame(b'get_ch', session, frame_response) is first
+    assert handler.read_frame(b'set_ch 4', session, frame_response) is None
+    execute_lines([b'set_ch 5'], session)
+    assert execute_lines([b'get_ch'], session)[0] == b'5\n'
+    assert frame_response(handler.HELP_TEXT) is frame_response(handler.HELP_TEXT)
@@ -0,0 +1,86 @@
+"""
+Unit tests for the multi-process building blocks
+================================================
+
+These tests check the shared-memory TV store (logic/shared.py) and the
+notice bus between workers (cluster.py).
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import multiprocessing
+import pytest
+import cluster
+from logic.shared import SharedFleet
+
+
+@pytest.fixture
+def fleet():
+    """A fresh shared-memory fleet, destroyed after the test."""
+    f = SharedFleet(3)
+    yield f
+    f.close()
+    f.unlink()
+
+
+def _zap(name, locks, channel):
+    # Runs in a child process: attach by name and change TV 2 under its lock
+    other = SharedFleet(3, locks=locks, name=name)
+    tv = other.view(1)
+    with other.lock(1):
+        tv.turn_on()
+        tv.set_channel(channel)
+    other.close()
+
+
+def test_shared_tv_behaves_like_smart_tv(fleet):
+    """Views keep the SmartTV API and rules."""
+    tv = fleet.view(0)
+    assert (tv.is_on(), tv.get_channel(), tv.get_channel_count()) == (False, 1, 10)
+    tv.turn_on()
+    tv.set_channel(4)
+    with pytest.raises(ValueError):
+        tv.set_channel(11)
+    assert (tv.is_on(), tv.get_channel()) == (True, 4)
+    assert fleet.view(1).is_on() is False
+
+
+def test_snapshots_are_versioned_and_reused(fleet):
+    """An unchanged TV returns the same snapshot; each write bumps the version."""
+    tv = fleet.view(0)
+    first = tv.snapshot()
+    assert tv.snapshot() is first
+    tv.turn_on()
+    second = tv.snapshot()
+    assert second.version == first.version + 1 and second.is_on()
+
+
+def test_changes_are_visible_across_processes(fleet):
+    """A write in another process shows up in this process' snapshot."""
+    child = multiprocessing.get_context().Process(target=_zap, args=(fleet.name, fleet.locks, 7))
+    child.start()
+    child.join(10)
+    snap = fleet.view(1).snapshot()
+    assert (snap.is_on(), snap.get_channel()) == (True, 7)
+
+
+def test_shared_registry_uses_fleet_locks(fleet):
+    """TV ids '1'..N map onto the fleet with its process-shared locks."""
+    registry = cluster.shared_registry(fleet)
+    assert registry.ids() == ['1', '2', '3']
+    assert registry.lock('2') is fleet.lock(1)
+
+
+def test_notice_bus_reaches_other_workers_only(tmp_path):
+    """A forwarded notice arrives at every peer, not at the sender."""
+    paths = [str(tmp_path / f'w{i}.sock') for i in range(3)]
+    buses = [cluster.NoticeBus(paths, i) for i in range(3)]
+    try:
+        buses[0].send('2', 'channel', 5)
+        assert buses[0].receive() == []
+        assert buses[1].receive() == [('2', 'channel', 5)]
+        assert buses[2].receive() == [('2', 'channel', 5)]
+    finally:
+        for b in buses:
+            b.close()
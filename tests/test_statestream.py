@@ -0,0 +1,110 @@
+"""
+Unit tests for the state stream and 'resume <seq>'
+==================================================
+
+These tests check the change ring (deltas, coalescing, falling back to
+a snapshot) and that a reconnecting remote catches up with one resume.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import pytest
+import handler
+import async_server
+import statestream
+from handler import Session
+from logic.registry import TVRegistry
+from protocol import execute_lines
+from statestream import StateStream
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Fresh TVs and an empty stream (seq 100) for every test."""
+    registry = TVRegistry()
+    registry.add('1')
+    registry.add('2')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+    monkeypatch.setattr(statestream, 'stream', StateStream(size=4, start=100))
+
+
+def test_since_returns_latest_change_per_key():
+    """Missed changes are filtered by TV/topic and coalesced to the newest value."""
+    s = StateStream(size=8, start=0)
+    for tv_id, topic, value in [('1', 'channel', 2), ('2', 'channel', 9),
+                                ('1', 'power', 1), ('1', 'channel', 3)]:
+        s.record(tv_id, topic, value)
+    assert s.since(0, '1', {'channel', 'power'}) == [(3, '1', 'power', 1), (4, '1', 'channel', 3)]
+    assert s.since(3, '1', {'channel'}) == [(4, '1', 'channel', 3)]
+    assert s.since(4) == []
+
+
+def test_since_gives_up_outside_the_ring():
+    """Seqs older than the ring, or never issued, ask for a snapshot."""
+    s = StateStream(size=2, start=10)
+    assert s.since(10) == []
+    for value in (1, 2, 3):
+        s.record('1', 'channel', value)
+    assert len(s) == 2
+    assert s.since(10) is None
+    assert s.since(11) == [(13, '1', 'channel', 3)]
+    assert s.since(14) is None
+
+
+def test_changes_are_stamped_with_their_own_values():
+    """Each change in a batch is recorded with the value it set, in order."""
+    _, notices, _ = execute_lines([b'on', b'batch set_ch 3; set_ch 4'])
+    assert notices == [('1', 'power', 1, 101), ('1', 'channel', 3, 102),
+                       ('1', 'channel', 4, 103)]
+    assert statestream.stream.since(100) == [(101, '1', 'power', 1), (103, '1', 'channel', 4)]
+
+
+def test_resume_falls_back_to_a_snapshot():
+    """An unknown seq is answered with the TV's full state at the current seq."""
+    session = Session()
+    reply, _, _ = execute_lines([b'on', b'set_ch 6', b'resume 3', b'resume x'], session)
+    lines = reply.decode().splitlines()
+    assert lines[2] == 'Snapshot at seq 102: TV 1 is ON, channel 6'
+    assert lines[3] == handler.TEXT_INVALID_SEQ
+    assert session.stream
+
+
+def test_reconnect_resumes_with_missed_deltas():
+    """A remote that was away gets only what changed, then seq-tagged notices."""
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            r1, w1 = await asyncio.open_connection('127.0.0.1', port)
+            r2, w2 = await asyncio.open_connection('127.0.0.1', port)
+            await r1.readline()
+            await r2.readline()
+            w2.write(b'subscribe power\nresume 100\n')
+            assert await r2.readline() == b'Subscribed to power notices\n'
+            assert await r2.readline() == b'Resumed at seq 100 (0 change(s) missed)\n'
+            w1.write(b'on\n')
+            await r1.readline()
+            assert await asyncio.wait_for(r2.readline(), 2) == \
+                b'[Notice] TV switched ON (seq 101)\n'
+            w2.close()
+
+            # While remote 2 is away: three changes, two to the same topic
+            w1.write(b'set_ch 4\nset_ch 5\noff\n')
+            for _ in range(3):
+                await r1.readline()
+            r2, w2 = await asyncio.open_connection('127.0.0.1', port)
+            await r2.readline()
+            w2.write(b'subscribe power\nresume 101\n')
+            await r2.readline()
+            lines = [await asyncio.wait_for(r2.readline(), 2) for _ in range(3)]
+            assert lines == [b'Resumed at seq 104 (2 change(s) missed)\n',
+                             b'[Notice] Channel changed to 5 (seq 103)\n',
+                             b'[Notice] TV switched OFF (seq 104)\n']
+            for w in (w1, w2):
+                w.close()
+
+    asyncio.run(scenario())
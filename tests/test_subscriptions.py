@@ -0,0 +1,97 @@
+"""
+Unit tests for topic subscriptions
+==================================
+
+These tests check the subscriber index, the subscribe/unsubscribe
+session commands and that engines only notify subscribed remotes.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import pytest
+import handler
+import async_server
+from handler import DEFAULT_TOPICS, Session, handle_command
+from logic.registry import TVRegistry
+from subscriptions import SubscriberIndex
+
+
+@pytest.fixture(autouse=True)
+def fresh_tvs(monkeypatch):
+    """Give every test its own two TVs so state does not leak between tests."""
+    registry = TVRegistry()
+    registry.add('1')
+    registry.add('2')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+
+
+def test_index_routes_by_tv_and_topic():
+    """Subscribers are found per (tv, topic); re-attaching moves a connection."""
+    index = SubscriberIndex()
+    index.attach('a', '1', {'channel', 'power'})
+    index.attach('b', '1', {'channel'})
+    index.attach('c', '2', {'power'})
+    assert sorted(index.subscribers('1', 'channel')) == ['a', 'b']
+    assert index.subscribers('1', 'power') == ('a',)
+    assert index.subscribers('2', 'channel') == ()
+
+    index.attach('a', '2', {'channel'})
+    assert index.subscribers('1', 'power') == ()
+    assert index.subscribers('2', 'channel') == ('a',)
+    assert sorted(index.attached('2')) == ['a', 'c']
+
+    index.detach('a')
+    index.detach('a')
+    assert 'a' not in index and len(index) == 2
+
+
+def test_subscribe_commands_update_the_session():
+    """subscribe/unsubscribe replace the session's topic set and validate names."""
+    session = Session()
+    assert session.topics == DEFAULT_TOPICS
+    before = session.topics
+    assert handle_command('SUBSCRIBE power', session) == 'Subscribed to power notices'
+    assert session.topics == {'channel', 'power'} and session.topics is not before
+    assert handle_command('unsubscribe channel', session) == 'Unsubscribed from channel notices'
+    assert session.topics == {'power'}
+    assert "Unknown topic 'volume'" in handle_command('subscribe volume', session)
+    assert 'expected 1 argument' in handle_command('subscribe', session)
+    assert 'cannot be used inside a batch' in handle_command('batch on; subscribe power', session)
+
+
+def test_asyncio_power_notices_reach_only_subscribers():
+    """on/off are announced on 'power' to subscribers only; unsubscribing stops notices."""
+    async def request(reader, writer, command):
+        writer.write(command.encode() + b'\n')
+        await writer.drain()
+        return (await reader.readline()).decode().rstrip('\n')
+
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            conns = []
+            for _ in range(3):
+                r, w = await asyncio.open_connection('127.0.0.1', port)
+                assert b'Welcome' in await r.readline()
+                conns.append((r, w))
+            (r1, w1), (r2, w2), (r3, w3) = conns
+            assert await request(r2, w2, 'subscribe power') == 'Subscribed to power notices'
+            assert await request(r3, w3, 'unsubscribe channel') == 'Unsubscribed from channel notices'
+
+            await request(r1, w1, 'on')
+            assert await asyncio.wait_for(r2.readline(), 2) == b'[Notice] TV switched ON\n'
+            await request(r1, w1, 'set_ch 3')
+            assert await asyncio.wait_for(r2.readline(), 2) == b'[Notice] Channel changed to 3\n'
+            await request(r1, w1, 'off')
+            assert await asyncio.wait_for(r2.readline(), 2) == b'[Notice] TV switched OFF\n'
+            # r3 has no topics left: its next line is the reply, not a notice
+            assert await request(r3, w3, 'status') == 'ERROR: TV is switched OFF. Turn it ON first.'
+            for _, w in conns:
+                w.close()
+
+    asyncio.run(scenario())
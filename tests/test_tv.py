@@ -48,4 +48,15 @@ def test_set_channel_out_of_range_raises(bad):
     """Setting a channel outside 1–10 should raise ValueError."""
     tv = SmartTV()
     with pytest.raises(ValueError):
-        tv.set_channel(bad)
\ No newline at end of file
+        tv.set_channel(bad)
+
+def test_state_changes_publish_new_snapshots():
+    """Every change publishes a new versioned snapshot; old ones stay as they were."""
+    tv = SmartTV()
+    before = tv.snapshot()
+    tv.turn_on()
+    tv.set_channel(4)
+    after = tv.snapshot()
+    assert (before.is_on(), before.get_channel(), before.version) == (False, 1, 0)
+    assert (after.is_on(), after.get_channel(), after.version) == (True, 4, 2)
+    assert after.get_channel_count() == tv.get_channel_count()
@@ -0,0 +1,110 @@
+"""
+Unit tests for the UDP key press fast path
+==========================================
+
+These tests check datagram decoding, that late or repeated presses are
+dropped by their sequence number, that each sender is rate limited, and
+that presses reach TCP remotes as notices on both engines.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import time
+import pytest
+import handler
+import async_server
+import ratelimit
+import udp
+from logic.registry import TVRegistry
+from remote import UdpRemote
+from udp import FastPath, encode_press
+
+
+@pytest.fixture(autouse=True)
+def fresh_tvs(monkeypatch):
+    """Give every test its own two TVs so state does not leak between tests."""
+    registry = TVRegistry()
+    registry.add('1')
+    registry.add('2')
+    monkeypatch.setattr(handler, 'registry', registry)
+    monkeypatch.setattr(handler, 'tv', registry.get('1'))
+    monkeypatch.setattr(handler, '_tv_lock', registry.lock('1'))
+
+
+def test_seq_comparison_wraps_around():
+    assert udp.newer(2, 1) and not udp.newer(1, 2) and not udp.newer(5, 5)
+    assert udp.newer(3, 0xFFFFFFFF)
+
+
+def test_stale_and_malformed_presses_are_dropped():
+    """Only presses newer than the sender's last one change the TV."""
+    published = []
+    fast = FastPath(lambda *notice: published.append(notice))
+    sender = ('10.0.0.5', 4000)
+    assert fast.received(encode_press('on', 1), sender)
+    assert fast.received(encode_press('set_ch', 3, 7), sender)
+    assert not fast.received(encode_press('set_ch', 2, 4), sender)      # reordered
+    assert not fast.received(encode_press('set_ch', 3, 7), sender)      # duplicate
+    assert fast.received(encode_press('set_ch', 1, 5), ('10.0.0.6', 4000))
+    assert fast.received(encode_press('set_ch', 1, 9, '2'), sender)     # seqs are per TV
+    assert not fast.received(b'\xb2\x08', sender)
+    assert not fast.received(encode_press('on', 9, tv_id='99'), sender)
+    with pytest.raises(KeyError):
+        encode_press('get_ch', 1)
+    assert handler.registry.get('1').get_channel() == 5
+    assert [n[:3] for n in published] == [('1', 'power', 1), ('1', 'channel', 7), ('1', 'channel', 5)]
+
+
+def test_presses_are_rate_limited_per_sender(monkeypatch):
+    """Each sender has its own buckets, like a connection; excess presses are dropped."""
+    monkeypatch.setattr(ratelimit, 'rate_limits', {'read': (0, 0), 'write': (0, 0),
+                                                   'broadcast': (0.001, 2)})
+    published = []
+    fast = FastPath(lambda *notice: published.append(notice))
+    one, two = ('10.0.0.5', 4000), ('10.0.0.6', 4000)
+    assert fast.received(encode_press('on', 1), one)
+    assert fast.received(encode_press('set_ch', 2, 3), one)
+    assert fast.received(encode_press('set_ch', 3, 4), one)
+    assert not fast.received(encode_press('set_ch', 4, 5), one)         # over the limit
+    assert fast.received(encode_press('set_ch', 1, 6), two)
+    assert handler.registry.get('1').get_channel() == 6
+    assert [n[2] for n in published] == [1, 3, 4, 6]
+
+
+def test_presses_reach_tcp_remotes_asyncio():
+    """A UDP set_ch is announced to subscribed TCP remotes."""
+    async def scenario():
+        srv = await async_server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        presses = await udp.start('127.0.0.1', 0, async_server.publish)
+        udp_port = presses.get_extra_info('sockname')[1]
+        async with srv:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            await reader.readline()
+            with UdpRemote('127.0.0.1', udp_port) as keys:
+                keys.press('on')
+                keys.press('set_ch', 6)
+                notice = await asyncio.wait_for(reader.readline(), 2)
+            assert notice == b'[Notice] Channel changed to 6\n'
+            writer.close()
+        presses.close()
+
+    asyncio.run(scenario())
+
+
+def test_presses_on_threaded_engine():
+    """The UDP thread applies presses to the shared TVs."""
+    presses = udp.Listener('127.0.0.1', 0, lambda *notice: None)
+    try:
+        with UdpRemote('127.0.0.1', presses.address[1], tv_id='2') as keys:
+            keys.press('on')
+            keys.press('set_ch', 8)
+            tv = handler.registry.get('2')
+            deadline = time.monotonic() + 2
+            while tv.get_channel() != 8 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        assert tv.is_on() and tv.get_channel() == 8
+    finally:
+        presses.close()
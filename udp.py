@@ -0,0 +1,242 @@
+"""
+Smart TV UDP Fast Path
+======================
+
+Optional fire-and-forget listener for key presses, beside the TCP
+server ('server.py --udp-port PORT'). A press is one datagram with no
+connection, handshake or reply, so zapping costs one packet instead of
+a TCP round trip. Delivery is not guaranteed; for zapping only the
+latest press matters.
+
+Datagram (network byte order):
+    magic u8 | opcode u8 | seq u32 | arg i32 | tv_id (ASCII, rest of datagram)
+
+    - 'opcode' is a binproto opcode of a state-changing command
+      ('on', 'off', 'set_ch'); anything else is ignored.
+    - 'seq' increases by one per press from a sender. A press whose seq
+      is not newer than the last one applied from that sender (address
+      and TV) arrived late or twice and is dropped. Seqs compare with
+      wrap-around, so a long-lived sender can roll over 2^32.
+    - An empty 'tv_id' means the default TV.
+
+Accepted presses run through protocol.execute_lines(), exactly like
+the same command on a connection (metrics, the TV lock, load shedding),
+and their changes are published to subscribed remotes. Each sender
+address gets its own rate limits, like a connection (--rate);
+a press over them is dropped. Sender state (last seq, rate limits) is
+kept for the UDP_MAX_SENDERS most recent senders.
+
+Author: dotDennis
+Course: IDATA2304
+"""
+
+import asyncio
+import socket
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+import handler
+import metrics
+import ratelimit
+from binproto import OPCODES
+from config import DEFAULT_TV_ID, UDP_MAX_SENDERS
+from handler import Session
+from protocol import TEXT_BUSY, TEXT_THROTTLED, execute_lines, frame_response
+from ratelimit import ClientLimiter
+
+UDP_MAGIC = 0xB2
+DATAGRAM = struct.Struct('>BBIi')
+MAX_DATAGRAM = 512
+
+# Opcode -> command line; set_ch takes the datagram's 'arg'
+_COMMANDS = {
+    OPCODES['on']:     b'on',
+    OPCODES['off']:    b'off',
+    OPCODES['set_ch']: b'set_ch %d',
+}
+_TAKES_ARG = frozenset((OPCODES['set_ch'],))
+_SEQ_MOD = 1 << 32
+_SEQ_HALF = 1 << 31
+# Replies of a press turned away by admission control (throttled or shed)
+_REJECTED = (TEXT_THROTTLED.partition('{')[0].encode(), frame_response(TEXT_BUSY))
+
+# publish(tv_id, topic, value, seq) of the engine serving TCP remotes
+Publish = Callable[[str, str, int, int], None]
+
+
+def encode_press(command: str, seq: int, arg: int = 0, tv_id: str = '') -> bytes:
+    """
+    Encode one key press datagram.
+
+    Raises:
+        KeyError: If 'command' is not allowed over UDP.
+    """
+    opcode = OPCODES[command]
+    if opcode not in _COMMANDS:
+        raise KeyError(command)
+    return DATAGRAM.pack(UDP_MAGIC, opcode, seq % _SEQ_MOD, arg) + tv_id.encode()
+
+
+def newer(seq: int, last: int) -> bool:
+    """
+    True if 'seq' comes after 'last' (serial number arithmetic mod 2^32).
+    """
+    return 0 < (seq - last) % _SEQ_MOD < _SEQ_HALF
+
+
+class FastPath:
+    """
+    Decodes, de-duplicates and executes key press datagrams.
+
+    Not thread-safe: each engine feeds it from one thread (the UDP
+    thread, or the event loop; on a replication follower, the asyncio
+    engine's UDP thread).
+    """
+
+    def __init__(self, publish: Publish, max_senders: int = UDP_MAX_SENDERS) -> None:
+        self._publish = publish
+        self._max_senders = max_senders
+        self._last: OrderedDict[tuple, int] = OrderedDict()
+        self._limits: OrderedDict[tuple, ClientLimiter] = OrderedDict()
+
+    def received(self, data: bytes, addr) -> bool:
+        """
+        Handle one datagram from 'addr'.
+
+        Returns:
+            bool: True if the press was applied.
+        """
+        if len(data) < DATAGRAM.size or data[0] != UDP_MAGIC:
+            metrics.udp_datagram('malformed')
+            return False
+        _, opcode, seq, arg = DATAGRAM.unpack_from(data)
+        command = _COMMANDS.get(opcode)
+        tv_id = data[DATAGRAM.size:].decode(errors='replace') or DEFAULT_TV_ID
+        if command is None or tv_id not in handler.registry:
+            metrics.udp_datagram('malformed')
+            return False
+
+        key = (addr, tv_id)
+        last = self._last.get(key)
+        if last is not None and not newer(seq, last):
+            metrics.udp_datagram('stale')
+            return False
+        self._last[key] = seq
+        self._last.move_to_end(key)
+        if len(self._last) > self._max_senders:
+            self._last.popitem(last=False)
+
+        raw = command % arg if opcode in _TAKES_ARG else command
+        reply, notices, _ = execute_lines([raw], Session(tv_id), self._limiter(addr))
+        if reply.startswith(_REJECTED):
+            metrics.udp_datagram('rejected')
+            return False
+        for notice in notices:
+            self._publish(*notice)
+        metrics.udp_datagram('applied')
+        return True
+
+    def _limiter(self, addr) -> Optional[ClientLimiter]:
+        # The sender's rate limits (None while no class is limited)
+        limiter = self._limits.get(addr)
+        if limiter is not None:
+            self._limits.move_to_end(addr)
+            return limiter
+        limiter = ratelimit.for_client()
+        if limiter is not None:
+            self._limits[addr] = limiter
+            if len(self._limits) > self._max_senders:
+                self._limits.popitem(last=False)
+        return limiter
+
+
+class Listener:
+    """
+    UDP socket plus a daemon thread handling its presses (threaded engine).
+    """
+
+    def __init__(self, host: str, port: int, publish: Publish) -> None:
+        """
+        Bind the socket (port 0 picks a free one) and start the thread.
+        """
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self.address = self._sock.getsockname()
+        self._fast = FastPath(publish)
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='udp-fast-path', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop the thread and close the socket.
+        """
+        self._closing = True
+        # A blocked recvfrom() is not woken by close(); send it one datagram
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as waker:
+            waker.sendto(b'', self.address)
+        self._thread.join(1.0)
+        self._sock.close()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                data, addr = self._sock.recvfrom(MAX_DATAGRAM)
+            except OSError:
+                return
+            if self._closing:
+                return
+            try:
+                self._fast.received(data, addr)
+            except Exception as e:
+                print(f'UDP press failed: {e!r}')
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, loop: asyncio.AbstractEventLoop, publish: Publish) -> None:
+        self._loop = loop
+        self._publish = publish
+        self._fast = FastPath(self._publish_on_loop)
+        # Replication follower: presses wait for the leader, so they run
+        # in order on one thread of their own instead of on the loop
+        self._follower: Optional[ThreadPoolExecutor] = None
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if handler.forward is None:
+            self._received(data, addr)
+            return
+        if self._follower is None:
+            self._follower = ThreadPoolExecutor(1, thread_name_prefix='udp-follower')
+        self._follower.submit(self._received, data, addr)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self._follower is not None:
+            self._follower.shutdown(wait=False)
+
+    def _received(self, data: bytes, addr) -> None:
+        try:
+            self._fast.received(data, addr)
+        except Exception as e:
+            print(f'UDP press failed: {e!r}')
+
+    def _publish_on_loop(self, *notice) -> None:
+        if self._follower is None:
+            self._publish(*notice)
+        else:
+            self._loop.call_soon_threadsafe(self._publish, *notice)
+
+
+async def start(host: str, port: int, publish: Publish) -> asyncio.DatagramTransport:
+    """
+    Bind the UDP socket on the running event loop (asyncio engine).
+
+    Returns:
+        asyncio.DatagramTransport: Close it to stop.
+    """
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _Protocol(loop, publish), local_addr=(host, port))
+    return transport
+